@@ -8,3 +8,29 @@ CHECK_NEW_AUDIO = True # Проверять наличие новых аудио
 TELEGRAM_MAX_MESSAGE_LENGTH = 4096 # Maximum character length for Telegram messages
 DEFAULT_WORD_SET = "base_min.json" # Default word set to use if a user has no active set configured
 AUTO_RESET_STATS_MONTHLY = True # Automatically reset user statistics (rank, scores) on the 1st of every month at 00:01
+DB_READER_CONNECTIONS = 3 # Количество соединений SQLite для чтения в пуле (плюс одно соединение для записи)
+DB_PERFORMANCE_PROFILE = "balanced" # Профиль PRAGMA для SQLite: safe, balanced или fast (все используют WAL)
+DB_CHECKPOINT_INTERVAL_SECONDS = 60 # Как часто проверять, не пора ли сделать чекпоинт WAL
+DB_CHECKPOINT_IDLE_SECONDS = 30 # Чекпоинт WAL выполняется, только если столько секунд не было записей в БД
+GAME_STATS_FLUSH_INTERVAL_SECONDS = 0.5 # Как часто записывать накопленные ответы в играх в БД одной транзакцией
+GAME_STATS_FLUSH_MAX_EVENTS = 100 # Записать буфер ответов досрочно, если накопилось столько ответов
+LAST_ACTIVE_FLUSH_INTERVAL_SECONDS = 30 # Как часто записывать в БД время последней активности пользователей (хранится в памяти)
+USER_STATS_CACHE_SIZE = 1000 # Сколько снимков статистики пользователей держать в памяти (LRU)
+ADMIN_STATS_PAGE_SIZE = 10 # Сколько пользователей показывать на одной странице /stats
+SEASON_COMPACT_AFTER_DAYS = 7 # Через сколько дней после окончания сезона его результаты сворачиваются в итоги по пользователям
+ANSWER_EVENTS_BATCH_SIZE = 500 # Сколько событий ответов записывать в answer_events одной транзакцией
+ANSWER_EVENTS_FLUSH_INTERVAL_SECONDS = 2 # Сколько ждать, пока наберется пачка событий ответов
+ANSWER_EVENTS_QUEUE_SIZE = 20000 # Максимум событий в очереди на запись; лишние отбрасываются, ответ ученика не задерживается
+ANSWER_EVENTS_RETENTION_DAYS = 90 # Сколько дней хранить отдельные ответы; старые сворачиваются в итоги по словам
+ANSWER_EVENTS_MAX_ROWS = 2000000 # Верхняя граница размера answer_events независимо от возраста событий
+ANALYTICS_SNAPSHOT_ENABLED = True # Админские отчеты читают копию БД (снимок), а не рабочую базу
+ANALYTICS_SNAPSHOT_INTERVAL_SECONDS = 600 # Как часто обновлять снимок БД для админских отчетов
+WORD_SET_CACHE_MAX_WORDS = 200000 # Сколько слов (суммарно по всем словарям) держать в кэше разобранных файлов
+WORD_SET_WRITE_COALESCE_SECONDS = 0.2 # Правки одного словаря, пришедшие за это время, записываются в файл одной записью
+WORD_SET_COMPILED_ENABLED = True # Читать словари из компилированных файлов (data/words/compiled), если они не устарели
+WORD_SET_REGISTRY_TTL_SECONDS = 3600 # Сколько хранить старую версию словаря для начатых игр и тестов, если к ней не обращались
+WORD_SET_WATCH_INTERVAL_SECONDS = 2 # Как часто проверять data/words на добавленные, измененные и удаленные словари
+WORD_IMPORT_PROGRESS_INTERVAL_SECONDS = 3 # Как часто обновлять сообщение о прогрессе /import_words
+QUIZ_DIFFICULTY = "normal" # Варианты ответа в тесте и играх с выбором перевода: "normal" - случайные, "hard" - похожие на правильный
+HARD_DISTRACTORS_PER_WORD = 8 # Сколько похожих переводов хранить для каждого слова в индексе трудных вариантов
+HARD_DISTRACTORS_SYNC_MAX_WORDS = 1000 # Индекс словаря до такого размера строится сразу, больших - в фоне (до готовности варианты случайные)
@@ -1,23 +1,405 @@
 import aiosqlite
+import asyncio
+import sqlite3
+import copy
 import datetime
-from typing import Dict, Any
+import logging
+import math
+import os
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable
+
+import config
 
 DATABASE_NAME = 'data/db/bot_data.db'
+ANALYTICS_SNAPSHOT_NAME = 'data/db/analytics_snapshot.db'
 
-async def init_db():
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        with open('migrations/init.sql', 'r') as f:
-            sql_script = f.read()
-        await db.executescript(sql_script)
-        await db.commit()
+logger = logging.getLogger(__name__)
+
+# Профили производительности SQLite: набор PRAGMA, применяемых к каждому соединению при открытии.
+# Выбирается через DB_PERFORMANCE_PROFILE в config.py.
+DB_PERFORMANCE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000, # отрицательное значение - размер в КиБ
+        "mmap_size": 0,
+        "busy_timeout": 10000,
+        "temp_store": "DEFAULT",
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,
+        "mmap_size": 128 * 1024 * 1024,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+}
+
+async def _register_sql_functions(connection: aiosqlite.Connection):
+    """Функции Python, которые используют запросы бота (соединения пула и снимка analytics_snapshot)."""
+    # Встроенная UPPER() в SQLite меняет регистр только у латиницы, а имена и классы пишут кириллицей
+    await connection.create_function("py_upper", 1, lambda value: value.upper() if isinstance(value, str) else value, deterministic=True)
+
+
+class DatabasePool:
+    """Долгоживущие соединения с SQLite: одно для записи и несколько для чтения.
+
+    SQLite допускает только одного писателя, поэтому все изменения идут через
+    единственное соединение под asyncio.Lock, а запросы на чтение разбирают
+    соединения из очереди. Пул открывается один раз в main() и закрывается при остановке бота.
+    """
+
+    def __init__(self, db_path: str, reader_count: int = 3, pragmas: Dict[str, Any] | None = None):
+        self.db_path = db_path
+        self.reader_count = max(1, reader_count)
+        self.pragmas = pragmas or {}
+        self._writer: aiosqlite.Connection | None = None
+        self._writer_lock = asyncio.Lock()
+        self._readers: asyncio.Queue | None = None
+        self._all_readers: list[aiosqlite.Connection] = []
+        self._open_lock = asyncio.Lock()
+        self.last_write_at = time.monotonic()
+        self.checkpoint_stats: Dict[str, Any] = {
+            "count": 0,
+            "total_ms": 0.0,
+            "last_ms": None,
+            "last_mode": None,
+            "last_result": None, # (busy, страниц в WAL, перенесено страниц)
+            "last_at": None,
+            "wal_bytes_before": None,
+            "wal_bytes_after": None,
+        }
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        connection = await aiosqlite.connect(self.db_path)
+        connection.row_factory = aiosqlite.Row
+        for pragma, value in self.pragmas.items():
+            await connection.execute(f"PRAGMA {pragma} = {value}")
+        await _register_sql_functions(connection)
+        return connection
+
+    async def open(self):
+        """Открывает соединения пула. Повторный вызов ничего не делает."""
+        async with self._open_lock:
+            if self.is_open:
+                return
+            self._writer = await self._connect()
+            self._readers = asyncio.Queue()
+            for _ in range(self.reader_count):
+                reader = await self._connect()
+                self._all_readers.append(reader)
+                self._readers.put_nowait(reader)
+            logger.info(f"[DatabasePool] Opened {self.db_path}: 1 writer, {self.reader_count} readers")
+
+    async def close(self):
+        """Закрывает все соединения пула."""
+        async with self._open_lock:
+            if not self.is_open:
+                return
+            async with self._writer_lock:
+                await self._writer.close()
+                self._writer = None
+            for reader in self._all_readers:
+                await reader.close()
+            self._all_readers = []
+            self._readers = None
+            logger.info(f"[DatabasePool] Closed {self.db_path}")
+
+    @asynccontextmanager
+    async def writer(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Выдает соединение для записи. Коммит при успехе, откат при исключении."""
+        if not self.is_open:
+            await self.open()
+        async with self._writer_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+                self.last_write_at = time.monotonic()
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Выдает свободное соединение для чтения и возвращает его в очередь после использования."""
+        if not self.is_open:
+            await self.open()
+        readers = self._readers
+        connection = await readers.get()
+        try:
+            yield connection
+        finally:
+            readers.put_nowait(connection)
+
+    async def set_trace_callback(self, callback):
+        """Ставит trace-callback sqlite3 на все соединения пула (None - снимает). Используется в utils/db_benchmark.py."""
+        if not self.is_open:
+            await self.open()
+        for connection in [self._writer, *self._all_readers]:
+            await connection.set_trace_callback(callback)
+
+    def idle_seconds(self) -> float:
+        """Сколько секунд прошло с последней записи через пул."""
+        return time.monotonic() - self.last_write_at
+
+    def wal_size_bytes(self) -> int:
+        """Текущий размер файла WAL (0, если файла нет)."""
+        wal_path = f"{self.db_path}-wal"
+        return os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+
+    async def checkpoint(self, mode: str = "PASSIVE") -> Dict[str, Any]:
+        """Переносит страницы из WAL в основной файл БД и запоминает время выполнения."""
+        if not self.is_open:
+            await self.open()
+        wal_bytes_before = self.wal_size_bytes()
+        async with self._writer_lock:
+            started = time.perf_counter()
+            cursor = await self._writer.execute(f"PRAGMA wal_checkpoint({mode})")
+            row = await cursor.fetchone()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self.checkpoint_stats
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["last_ms"] = elapsed_ms
+        stats["last_mode"] = mode
+        stats["last_result"] = tuple(row) if row else None
+        stats["last_at"] = datetime.datetime.now().isoformat()
+        stats["wal_bytes_before"] = wal_bytes_before
+        stats["wal_bytes_after"] = self.wal_size_bytes()
+        return dict(stats)
+
+
+db_pool = DatabasePool(
+    DATABASE_NAME,
+    reader_count=config.DB_READER_CONNECTIONS,
+    pragmas=DB_PERFORMANCE_PROFILES.get(config.DB_PERFORMANCE_PROFILE, DB_PERFORMANCE_PROFILES["balanced"]),
+)
+
+class AnalyticsSnapshot:
+    """Копия БД только для чтения, на которой выполняются тяжелые админские отчеты.
+
+    refresh() копирует рабочую базу через online backup API SQLite в отдельном потоке:
+    копирование идет одним шагом внутри одной читающей транзакции, поэтому снимок
+    согласован, а в режиме WAL запись ответов учеников при этом не блокируется.
+    Копия пишется во временный файл и атомарно заменяет предыдущий снимок.
+    """
+
+    def __init__(self, source_path: str, snapshot_path: str, max_age_seconds: float):
+        self.source_path = source_path
+        self.snapshot_path = snapshot_path
+        self.max_age_seconds = max_age_seconds
+        self.refreshed_at: datetime.datetime | None = None
+        self._refresh_lock = asyncio.Lock()
+        # Рейтинг по данным снимка (места в отчетах) и (refreshed_at, season_id), для которых он построен
+        self._leaderboard: Leaderboard | None = None
+        self._leaderboard_key: tuple | None = None
+        self.stats: Dict[str, Any] = {
+            "refreshes": 0,
+            "failures": 0,
+            "last_ms": None,
+            "size_bytes": None,
+        }
+
+    def _backup(self):
+        temp_path = f"{self.snapshot_path}.tmp"
+        source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target)
+                # Снимок читается как обычный файл, без -wal рядом
+                target.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                target.close()
+        finally:
+            source.close()
+        os.replace(temp_path, self.snapshot_path)
+
+    async def refresh(self):
+        async with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._backup)
+            except Exception:
+                self.stats["failures"] += 1
+                raise
+            self.refreshed_at = datetime.datetime.now()
+            self.stats["refreshes"] += 1
+            self.stats["last_ms"] = (time.perf_counter() - started) * 1000
+            self.stats["size_bytes"] = os.path.getsize(self.snapshot_path)
+        logger.info(f"[AnalyticsSnapshot] Refreshed {self.snapshot_path} in {self.stats['last_ms']:.1f} ms")
+
+    def is_stale(self) -> bool:
+        if self.refreshed_at is None or not os.path.exists(self.snapshot_path):
+            return True
+        return (datetime.datetime.now() - self.refreshed_at).total_seconds() > self.max_age_seconds
+
+    @asynccontextmanager
+    async def reader(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Соединение со снимком (обновляется, если он устарел). Без ANALYTICS_SNAPSHOT_ENABLED - обычное соединение пула."""
+        if not config.ANALYTICS_SNAPSHOT_ENABLED:
+            async with db_pool.reader() as db:
+                yield db
+            return
+        if self.is_stale():
+            await self.refresh()
+        connection = await aiosqlite.connect(f"file:{self.snapshot_path}?mode=ro", uri=True)
+        connection.row_factory = aiosqlite.Row
+        try:
+            await _register_sql_functions(connection)
+            yield connection
+        finally:
+            await connection.close()
+
+    async def leaderboard(self, db: aiosqlite.Connection) -> "Leaderboard":
+        """Рейтинг по данным снимка: места строк, прочитанных из снимка, совпадают с их порядком.
+
+        Строится один раз на обновление снимка (O(n log n) в памяти), db - соединение из reader().
+        """
+        key = (self.refreshed_at, current_season_id)
+        if self._leaderboard is None or self._leaderboard_key != key:
+            cursor = await db.execute(SNAPSHOT_SCORES_QUERY, {"season_id": current_season_id})
+            snapshot_leaderboard = Leaderboard()
+            snapshot_leaderboard.load({row['user_id']: row['overall_score'] for row in await cursor.fetchall()})
+            self._leaderboard, self._leaderboard_key = snapshot_leaderboard, key
+        return self._leaderboard
+
+
+analytics_snapshot = AnalyticsSnapshot(DATABASE_NAME, ANALYTICS_SNAPSHOT_NAME, config.ANALYTICS_SNAPSHOT_INTERVAL_SECONDS)
 
-        # Dynamically add new columns if they don't exist
-        await _add_column_if_not_exists(db, "users", "first_name", "TEXT")
-        await _add_column_if_not_exists(db, "users", "last_name", "TEXT")
-        await _add_column_if_not_exists(db, "users", "username", "TEXT")
-        await _add_column_if_not_exists(db, "users", "mute_until", "TEXT")
-        await _add_column_if_not_exists(db, "games_stats", "word_set_name", "TEXT NOT NULL DEFAULT 'default'")
-        await _add_column_if_not_exists(db, "results", "word_set_name", "TEXT NOT NULL DEFAULT 'default'")
+async def refresh_analytics_snapshot():
+    await analytics_snapshot.refresh()
+
+async def open_db_pool():
+    await db_pool.open()
+
+async def close_db_pool():
+    await game_stats_buffer.stop()
+    await activity_tracker.stop()
+    await answer_event_log.stop()
+    await db_pool.close()
+
+async def checkpoint_wal(mode: str = "PASSIVE") -> Dict[str, Any]:
+    return await db_pool.checkpoint(mode)
+
+async def get_db_performance_report() -> Dict[str, Any]:
+    """Возвращает текущий режим журнала, размер WAL и статистику чекпоинтов."""
+    async with db_pool.reader() as db:
+        cursor = await db.execute("PRAGMA journal_mode")
+        journal_mode = (await cursor.fetchone())[0]
+    return {
+        "profile": config.DB_PERFORMANCE_PROFILE,
+        "journal_mode": journal_mode,
+        "pragmas": dict(db_pool.pragmas),
+        "wal_size_bytes": db_pool.wal_size_bytes(),
+        "idle_seconds": db_pool.idle_seconds(),
+        "checkpoints": dict(db_pool.checkpoint_stats),
+        "schema_version": await get_schema_version(),
+        "season_id": current_season_id,
+        "game_stats_buffer": {**game_stats_buffer.stats, "pending_rows": len(game_stats_buffer)},
+        "activity_tracker": dict(activity_tracker.stats),
+        "moderation_cache": dict(moderation_cache.stats),
+        "user_stats_cache": {**user_stats_cache.stats, "size": len(user_stats_cache)},
+        "answer_event_log": {**answer_event_log.stats, "queued": len(answer_event_log)},
+        "analytics_snapshot": {
+            **analytics_snapshot.stats,
+            "enabled": config.ANALYTICS_SNAPSHOT_ENABLED,
+            "refreshed_at": analytics_snapshot.refreshed_at.isoformat() if analytics_snapshot.refreshed_at else None,
+        },
+    }
+
+MIGRATIONS_DIR = 'migrations'
+
+async def _migration_baseline(db):
+    """Исходная схема. Идемпотентна, поэтому подходит и для баз, созданных до появления user_version."""
+    with open(os.path.join(MIGRATIONS_DIR, 'init.sql'), 'r') as f:
+        sql_script = f.read()
+    await db.executescript(sql_script)
+
+    # Columns added to the schema before versioned migrations existed
+    await _add_column_if_not_exists(db, "users", "first_name", "TEXT")
+    await _add_column_if_not_exists(db, "users", "last_name", "TEXT")
+    await _add_column_if_not_exists(db, "users", "username", "TEXT")
+    await _add_column_if_not_exists(db, "users", "mute_until", "TEXT")
+    await _add_column_if_not_exists(db, "games_stats", "word_set_name", "TEXT NOT NULL DEFAULT 'default'")
+    await _add_column_if_not_exists(db, "results", "word_set_name", "TEXT NOT NULL DEFAULT 'default'")
+
+# Нумерованные миграции схемы: (версия, описание, функция или SQL-файл в MIGRATIONS_DIR).
+# Номер примененной версии хранится в PRAGMA user_version; новые шаги добавляются только в конец.
+MIGRATIONS = [
+    (1, "baseline schema", _migration_baseline),
+    (2, "leaderboard table", "0002_leaderboard.sql"),
+    (3, "covering indexes for results and games_stats", "0003_covering_indexes.sql"),
+    (4, "statistics seasons and season rollups", "0004_seasons.sql"),
+    (5, "answer events log", "0005_answer_events.sql"),
+    (6, "active word set per user", "0006_user_word_sets.sql"),
+    (7, "leaderboard rows per season", "0007_leaderboard_seasons.sql"),
+]
+
+async def _get_user_version(db) -> int:
+    cursor = await db.execute("PRAGMA user_version")
+    row = await cursor.fetchone()
+    return row[0]
+
+async def get_schema_version() -> int:
+    async with db_pool.reader() as db:
+        return await _get_user_version(db)
+
+async def migrate_db() -> list[int]:
+    """Применяет только те миграции, номер которых больше PRAGMA user_version. Возвращает список примененных версий."""
+    applied = []
+    async with db_pool.writer() as db:
+        current_version = await _get_user_version(db)
+        for version, description, step in MIGRATIONS:
+            if version <= current_version:
+                continue
+            started = time.perf_counter()
+            if callable(step):
+                await step(db)
+                await db.execute(f"PRAGMA user_version = {int(version)}")
+                await db.commit()
+            else:
+                with open(os.path.join(MIGRATIONS_DIR, step), 'r') as f:
+                    sql_script = f.read()
+                # SQL-шаг и новая версия схемы фиксируются одной транзакцией
+                await db.executescript(f"BEGIN;\n{sql_script}\nPRAGMA user_version = {int(version)};\nCOMMIT;")
+            applied.append(version)
+            logger.info(f"[migrate_db] Applied migration {version} ({description}) in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return applied
+
+# Текущий сезон статистики: results, games_stats и user_data читаются и пишутся только в нем.
+# Загружается в init_db и меняется только в start_new_season (внутри транзакции записи).
+current_season_id = 1
+
+async def _load_current_season():
+    global current_season_id
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT MAX(season_id) FROM seasons")
+        row = await cursor.fetchone()
+    current_season_id = row[0] or 1
+
+async def init_db():
+    await migrate_db()
+    await _load_current_season()
+    await rebuild_leaderboard()
+    await moderation_cache.load()
 
 async def _add_column_if_not_exists(db, table_name, column_name, column_type):
     cursor = await db.execute(f"PRAGMA table_info({table_name})")
@@ -33,7 +415,7 @@ async def _add_column_if_not_exists(db, table_name, column_name, column_type):
         await db.commit()
 
 async def add_user(user_id: int, name: str, first_name: str = None, last_name: str = None, username: str = None):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
+    async with db_pool.writer() as db:
         registered_at = datetime.datetime.now().isoformat()
         last_active = registered_at
         await db.execute(
@@ -41,137 +423,901 @@ async def add_user(user_id: int, name: str, first_name: str = None, last_name: s
             (user_id, name, registered_at, last_active, first_name, last_name, username)
         )
         await db.execute("INSERT OR IGNORE INTO user_data (user_id) VALUES (?) ", (user_id,))
-        await db.commit()
+        overall_score = await _apply_leaderboard_delta(db, user_id)
+    leaderboard.set_score(user_id, overall_score)
+    user_stats_cache.invalidate(user_id)
 
 async def get_user(user_id: int):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT * FROM users WHERE user_id = ?", (user_id,))
         user = await cursor.fetchone()
-        return dict(user) if user else None
+    if not user:
+        return None
+    user = dict(user)
+    user['last_active'] = activity_tracker.overlay(user_id, user['last_active'])
+    return user
 
 async def update_user_profile_data(user_id: int, name: str, first_name: str = None, last_name: str = None, username: str = None):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
+    async with db_pool.writer() as db:
         await db.execute(
             "UPDATE users SET name = ?, first_name = ?, last_name = ?, username = ? WHERE user_id = ?",
             (name, first_name, last_name, username, user_id)
         )
-        await db.commit()
 
-async def update_last_active(user_id: int):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        last_active = datetime.datetime.now().isoformat()
-        await db.execute(
-            "UPDATE users SET last_active = ? WHERE user_id = ?",
-            (last_active, user_id)
+USER_WORD_SET_UPSERT_QUERY = """
+INSERT INTO user_word_sets (user_id, filename, display_name, updated_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT(user_id) DO UPDATE SET
+    filename = excluded.filename,
+    display_name = excluded.display_name,
+    updated_at = excluded.updated_at
+WHERE user_word_sets.filename IS NOT excluded.filename
+   OR user_word_sets.display_name IS NOT excluded.display_name
+"""
+
+async def get_all_user_word_sets() -> Dict[int, Dict[str, str]]:
+    """Активные словари всех пользователей: user_id -> {"filename", "display_name"}."""
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT user_id, filename, display_name FROM user_word_sets")
+        rows = await cursor.fetchall()
+    return {row['user_id']: {"filename": row['filename'], "display_name": row['display_name']} for row in rows}
+
+async def set_user_word_set(user_id: int, filename: str, display_name: str) -> bool:
+    """Запоминает активный словарь пользователя. Строка переписывается, только если что-то изменилось."""
+    async with db_pool.writer() as db:
+        cursor = await db.execute(
+            USER_WORD_SET_UPSERT_QUERY,
+            (user_id, filename, display_name, datetime.datetime.now().isoformat())
         )
-        await db.commit()
+        return cursor.rowcount > 0
+
+async def import_user_word_sets(user_files: Dict[int, Dict[str, str]]) -> int:
+    """Разовый перенос активных словарей из старого config.json. Уже записанные в БД значения не трогает."""
+    now = datetime.datetime.now().isoformat()
+    rows = [(user_id, data["filename"], data.get("display_name") or "Unknown User", now) for user_id, data in user_files.items()]
+    async with db_pool.writer() as db:
+        cursor = await db.executemany(
+            "INSERT OR IGNORE INTO user_word_sets (user_id, filename, display_name, updated_at) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        return cursor.rowcount
+
+async def reset_user_word_sets_for_file(filename: str) -> list[int]:
+    """Сбрасывает активный словарь у всех, кто выбрал filename. Возвращает их user_id."""
+    async with db_pool.writer() as db:
+        cursor = await db.execute("DELETE FROM user_word_sets WHERE filename = ? RETURNING user_id", (filename,))
+        rows = await cursor.fetchall()
+    return [row[0] for row in rows]
+
+class ActivityTracker:
+    """Время последней активности пользователей в памяти.
+
+    update_last_active и ответы в играх только обновляют словарь; измененные значения
+    записываются в users.last_active одним executemany раз в flush_interval секунд
+    и при остановке бота. Значения из памяти не удаляются после записи, поэтому чтения
+    (get_user, get_user_stats, рейтинг) всегда могут взять их вместо устаревших данных БД.
+    """
+
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._last_active: Dict[int, str] = {}
+        self._dirty: set[int] = set()
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, Any] = {
+            "touches": 0,
+            "flushes": 0,
+            "rows_written": 0,
+        }
+
+    def touch(self, user_id: int, last_active: str | None = None):
+        last_active = last_active or datetime.datetime.now().isoformat()
+        # ISO-строки сравниваются как даты; время активности не должно откатываться назад
+        if last_active >= self._last_active.get(user_id, ""):
+            self._last_active[user_id] = last_active
+            self._dirty.add(user_id)
+        self.stats["touches"] += 1
+        if self._task is None:
+            self.start()
+
+    def get(self, user_id: int) -> str | None:
+        return self._last_active.get(user_id)
+
+    def overlay(self, user_id: int, last_active: str | None) -> str | None:
+        """Самое свежее из значения в БД и значения в памяти."""
+        cached = self._last_active.get(user_id)
+        if cached is None or (last_active is not None and last_active > cached):
+            return last_active
+        return cached
+
+    def discard_user(self, user_id: int):
+        self._last_active.pop(user_id, None)
+        self._dirty.discard(user_id)
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [(self._last_active[user_id], user_id) for user_id in dirty if user_id in self._last_active]
+        try:
+            async with db_pool.writer() as db:
+                await db.executemany("UPDATE users SET last_active = ? WHERE user_id = ?", rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        self.stats["flushes"] += 1
+        self.stats["rows_written"] += len(rows)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[ActivityTracker] Flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую запись и записывает оставшиеся значения."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+activity_tracker = ActivityTracker(config.LAST_ACTIVE_FLUSH_INTERVAL_SECONDS)
+
+async def update_last_active(user_id: int):
+    """Отмечает активность пользователя в activity_tracker; в БД значение попадет при ближайшей записи."""
+    activity_tracker.touch(user_id)
 
 async def save_test_result(user_id: int, score: int, total: int, word_set_name: str = "default"):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
+    async with db_pool.writer() as db:
         date = datetime.datetime.now().isoformat()
         await db.execute(
-            "INSERT INTO results (user_id, score, total, date, word_set_name) VALUES (?, ?, ?, ?, ?)",
-            (user_id, score, total, date, word_set_name)
+            "INSERT INTO results (season_id, user_id, score, total, date, word_set_name) VALUES (?, ?, ?, ?, ?, ?)",
+            (current_season_id, user_id, score, total, date, word_set_name)
         )
-        # Update best_test_score in user_data if current score is better
+        # Update best_test_score in user_data if current score is better.
+        # Лучшие результаты прошлого сезона не учитываются: строка переходит в текущий сезон.
         await db.execute(
-            "INSERT INTO user_data (user_id, best_test_score) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET best_test_score = MAX(excluded.best_test_score, user_data.best_test_score)",
-            (user_id, score)
+            """
+            INSERT INTO user_data (user_id, best_test_score, season_id) VALUES (:user_id, :score, :season_id)
+            ON CONFLICT(user_id) DO UPDATE SET
+                best_test_score = CASE WHEN user_data.season_id = excluded.season_id
+                                       THEN MAX(excluded.best_test_score, user_data.best_test_score)
+                                       ELSE excluded.best_test_score END,
+                best_test_time = CASE WHEN user_data.season_id = excluded.season_id
+                                      THEN user_data.best_test_time ELSE 999999.0 END,
+                season_id = excluded.season_id
+            """,
+            {"user_id": user_id, "score": score, "season_id": current_season_id}
         )
-        await db.commit()
+        overall_score = await _apply_leaderboard_delta(db, user_id, test_score=score, best_test_score=score)
+    leaderboard.set_score(user_id, overall_score)
+    user_stats_cache.invalidate(user_id)
 
-async def get_user_stats(user_id: int):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        
-        # Total correct answers
-        cursor_total_correct = await db.execute(
-            "SELECT SUM(score) FROM results WHERE user_id = ?", (user_id,)
-        )
-        total_correct = (await cursor_total_correct.fetchone())[0] or 0
+# Вся статистика одного пользователя за один запрос. Строки различаются по kind:
+#   profile - (NULL, NULL, NULL, NULL, NULL, есть ли строка user_data текущего сезона, best_test_time, last_active)
+#   test    - (NULL, word_set_name, тестов, сумма очков, сумма максимумов, лучший результат, NULL, NULL)
+#   game    - (game_type, word_set_name, played, correct, incorrect, NULL, best_time, NULL)
+USER_STATS_SNAPSHOT_QUERY = """
+    SELECT 'profile' AS kind, NULL AS game_type, NULL AS word_set_name,
+           NULL AS value_1, NULL AS value_2, NULL AS value_3, ud.season_id IS :season_id AS value_4,
+           ud.best_test_time AS best_time, u.last_active AS last_active
+    FROM users u
+    LEFT JOIN user_data ud ON ud.user_id = u.user_id
+    WHERE u.user_id = :user_id
+    UNION ALL
+    SELECT 'test', NULL, word_set_name, COUNT(id), SUM(score), SUM(total), MAX(score), NULL, NULL
+    FROM results
+    WHERE season_id = :season_id AND user_id = :user_id
+    GROUP BY word_set_name
+    UNION ALL
+    SELECT 'game', game_type, word_set_name, played, correct, incorrect, NULL, best_time, NULL
+    FROM games_stats
+    WHERE season_id = :season_id AND user_id = :user_id
+"""
 
-        # Best test score
-        cursor_best_score = await db.execute(
-            "SELECT MAX(score) FROM results WHERE user_id = ?", (user_id,)
-        )
-        best_score = (await cursor_best_score.fetchone())[0] or 0
+def _empty_game_stats() -> Dict[str, Any]:
+    return {"played": 0, "correct": 0, "incorrect": 0, "best_time": None}
 
-        # Last activity date (from users table)
-        cursor_last_active = await db.execute(
-            "SELECT last_active FROM users WHERE user_id = ?", (user_id,)
-        )
-        last_active_raw = (await cursor_last_active.fetchone())
-        last_active = last_active_raw[0] if last_active_raw else "N/A"
-
-        # Get best_test_time from user_data table
-        cursor_best_test_time = await db.execute("SELECT best_test_time FROM user_data WHERE user_id = ?", (user_id,))
-        best_test_time_raw = (await cursor_best_test_time.fetchone())
-        best_test_time = best_test_time_raw[0] if best_test_time_raw else float('inf')
-
-        # Get games_stats
-        cursor_games_stats = await db.execute("SELECT game_type, played, correct, incorrect, best_time FROM games_stats WHERE user_id = ?", (user_id,))
-        games_stats_rows = await cursor_games_stats.fetchall()
-        games_stats = {
-            row['game_type']: {
-                'played': row['played'],
-                'correct': row['correct'],
-                'incorrect': row['incorrect'],
-                'best_time': row['best_time']
-            } for row in games_stats_rows
-        }
-        
-        return {
-            "total_correct_answers": total_correct,
-            "best_test_score": best_score,
-            "last_activity_date": last_active,
-            "best_test_time": best_test_time,
-            "games_stats": games_stats
+
+class UserStatsCache:
+    """LRU-кэш снимков статистики пользователей (результат USER_STATS_SNAPSHOT_QUERY).
+
+    Снимок содержит только данные из БД: ответы из game_stats_buffer и время активности
+    добавляются при каждом чтении. Запись статистики пользователя вызывает invalidate()
+    после коммита; номер поколения не дает загрузке, начатой до записи, положить в кэш старые данные.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._snapshots: OrderedDict[int, Dict[str, Any]] = OrderedDict()
+        self._generations: Dict[int, int] = {}
+        self._epoch = 0
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
         }
 
+    def get(self, user_id: int) -> Dict[str, Any] | None:
+        snapshot = self._snapshots.get(user_id)
+        if snapshot is None:
+            self.stats["misses"] += 1
+            return None
+        self._snapshots.move_to_end(user_id)
+        self.stats["hits"] += 1
+        return snapshot
+
+    def generation(self, user_id: int) -> tuple[int, int]:
+        return self._epoch, self._generations.get(user_id, 0)
+
+    def put(self, user_id: int, snapshot: Dict[str, Any], generation: tuple[int, int]):
+        if generation != self.generation(user_id):
+            return
+        self._snapshots[user_id] = snapshot
+        self._snapshots.move_to_end(user_id)
+        while len(self._snapshots) > self.max_size:
+            self._snapshots.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        self._snapshots.pop(user_id, None)
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+        self.stats["invalidations"] += 1
+
+    def clear(self):
+        self._snapshots.clear()
+        self._generations.clear()
+        self._epoch += 1
+        self.stats["invalidations"] += 1
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+
+user_stats_cache = UserStatsCache(config.USER_STATS_CACHE_SIZE)
+
+async def _load_user_stats_snapshot(user_id: int) -> Dict[str, Any]:
+    snapshot = user_stats_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+
+    generation = user_stats_cache.generation(user_id)
+    async with db_pool.reader() as db:
+        cursor = await db.execute(USER_STATS_SNAPSHOT_QUERY, {"user_id": user_id, "season_id": current_season_id})
+        rows = await cursor.fetchall()
+
+    snapshot = {
+        "total_correct_answers": 0,
+        "best_test_score": 0,
+        "last_activity_date": "N/A",
+        "best_test_time": float('inf'),
+        "games_stats": {},
+        "test_stats_by_set": {},
+        "game_stats_by_set": {},
+    }
+    for row in rows:
+        if row['kind'] == 'profile':
+            snapshot["last_activity_date"] = row['last_active']
+            if row['value_4']:
+                snapshot["best_test_time"] = row['best_time']
+        elif row['kind'] == 'test':
+            snapshot["test_stats_by_set"][row['word_set_name']] = {
+                'total_tests': row['value_1'],
+                'total_score': row['value_2'],
+                'total_possible_score': row['value_3'],
+                'best_score': row['value_4']
+            }
+            snapshot["total_correct_answers"] += row['value_2'] or 0
+            snapshot["best_test_score"] = max(snapshot["best_test_score"], row['value_4'] or 0)
+        else:
+            game_stats = {
+                'played': row['value_1'],
+                'correct': row['value_2'],
+                'incorrect': row['value_3'],
+                'best_time': row['best_time']
+            }
+            snapshot["game_stats_by_set"].setdefault(row['word_set_name'], {})[row['game_type']] = game_stats
+            # games_stats - сумма по всем словарям для каждого типа игры
+            _merge_game_stats(snapshot["games_stats"].setdefault(row['game_type'], _empty_game_stats()), {
+                'played': game_stats['played'] or 0,
+                'correct': game_stats['correct'] or 0,
+                'incorrect': game_stats['incorrect'] or 0,
+                'best_time': game_stats['best_time'],
+            })
+
+    user_stats_cache.put(user_id, snapshot, generation)
+    return snapshot
+
+USER_STATS_SNAPSHOT_ATTEMPTS = 3 # Попыток прочитать снимок без lock буфера, прежде чем читать под lock
+
+async def get_user_stats_snapshot(user_id: int) -> Dict[str, Any]:
+    """Вся статистика пользователя: общие показатели, games_stats, test_stats_by_set и game_stats_by_set.
+
+    Повторные вызовы берут снимок из user_stats_cache без запросов к БД. К копии снимка
+    добавляются еще не записанные ответы из game_stats_buffer и время активности из activity_tracker.
+
+    Снимок читается без game_stats_buffer.lock, чтобы чтения статистики не ждали друг друга и запись
+    буфера. Под lock берутся только ответы из буфера; если за время чтения завершилась запись статистики
+    пользователя (сменилось поколение в user_stats_cache), снимок мог не совпасть с буфером - читаем заново.
+    """
+    for _ in range(USER_STATS_SNAPSHOT_ATTEMPTS):
+        generation = user_stats_cache.generation(user_id)
+        snapshot = await _load_user_stats_snapshot(user_id)
+        async with game_stats_buffer.lock:
+            if user_stats_cache.generation(user_id) == generation:
+                pending = game_stats_buffer.pending_for_user(user_id)
+                break
+    else:
+        # Статистику пользователя все время переписывают - читаем снимок под lock
+        async with game_stats_buffer.lock:
+            snapshot = await _load_user_stats_snapshot(user_id)
+            pending = game_stats_buffer.pending_for_user(user_id)
+    snapshot = copy.deepcopy(snapshot)
+
+    for game_type, word_set, delta in pending:
+        _merge_game_stats(snapshot["games_stats"].setdefault(game_type, _empty_game_stats()), delta)
+        _merge_game_stats(snapshot["game_stats_by_set"].setdefault(word_set, {}).setdefault(game_type, _empty_game_stats()), delta)
+    snapshot["last_activity_date"] = activity_tracker.overlay(user_id, snapshot["last_activity_date"])
+    return snapshot
+
+async def get_user_stats(user_id: int):
+    return await get_user_stats_snapshot(user_id)
+
 async def delete_user_from_db(user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        # Delete from results table
-        await db.execute("DELETE FROM results WHERE user_id = ?", (user_id,))
-        # Delete from games_stats table
-        await db.execute("DELETE FROM games_stats WHERE user_id = ?", (user_id,))
-        # Delete from user_data table
-        await db.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
-        # Delete from banned_users table
-        await db.execute("DELETE FROM banned_users WHERE user_id = ?", (user_id,))
-        # Delete from users table
-        cursor = await db.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-        await db.commit()
-        return cursor.rowcount > 0 # Returns True if any row was deleted
+    # Под lock буфера: ответы пользователя не будут записаны уже после удаления
+    async with game_stats_buffer.lock:
+        game_stats_buffer.discard_user(user_id)
+        activity_tracker.discard_user(user_id)
+        async with db_pool.writer() as db:
+            # Delete from results table
+            await db.execute("DELETE FROM results WHERE user_id = ?", (user_id,))
+            # Delete from games_stats table
+            await db.execute("DELETE FROM games_stats WHERE user_id = ?", (user_id,))
+            # Delete from season_rollups table
+            await db.execute("DELETE FROM season_rollups WHERE user_id = ?", (user_id,))
+            # Delete from answer_events and answer_word_stats tables
+            answer_event_log.discard_user(user_id)
+            await db.execute("DELETE FROM answer_events WHERE user_id = ?", (user_id,))
+            await db.execute("DELETE FROM answer_word_stats WHERE user_id = ?", (user_id,))
+            # Delete from user_data table
+            await db.execute("DELETE FROM user_data WHERE user_id = ?", (user_id,))
+            # Delete from user_word_sets table
+            await db.execute("DELETE FROM user_word_sets WHERE user_id = ?", (user_id,))
+            # Delete from banned_users table
+            await db.execute("DELETE FROM banned_users WHERE user_id = ?", (user_id,))
+            # Delete from leaderboard table
+            await db.execute("DELETE FROM leaderboard WHERE user_id = ?", (user_id,))
+            # Delete from users table
+            cursor = await db.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            deleted = cursor.rowcount > 0 # Returns True if any row was deleted
+        leaderboard.remove(user_id)
+        user_stats_cache.invalidate(user_id)
+    moderation_cache.unban(user_id)
+    moderation_cache.unmute(user_id)
+    return deleted
+
+async def start_new_season() -> int:
+    """Открывает новый сезон статистики и возвращает его номер.
+
+    Результаты тестов и игр не удаляются и не переписываются: запросы просто начинают
+    читать другой season_id. В таблице leaderboard у нового сезона строк нет (нет строки -
+    0 очков), поэтому транзакция - это только строка в seasons, а рейтинг в памяти обнуляется
+    без запросов к БД. Прошлые сезоны позже сворачивает compact_old_seasons.
+    """
+    global current_season_id
+    # Ответы, данные до сброса, относятся к закрываемому сезону
+    await game_stats_buffer.flush()
+    async with db_pool.writer() as db:
+        now = datetime.datetime.now().isoformat()
+        await db.execute("UPDATE seasons SET ended_at = ? WHERE season_id = ?", (now, current_season_id))
+        cursor = await db.execute("INSERT INTO seasons (started_at) VALUES (?) RETURNING season_id", (now,))
+        season_id = (await cursor.fetchone())[0]
+        await cursor.close()
+        # Внутри транзакции записи: ни одна запись не попадет между сменой сезона и обнулением рейтинга
+        current_season_id = season_id
+        leaderboard.reset()
+    user_stats_cache.clear()
+    logger.info(f"[start_new_season] Season {season_id} started for {len(leaderboard)} users")
+    return season_id
 
 async def reset_all_user_statistics() -> bool:
-    """Сбрасывает всю статистику пользователей, связанную с рейтингом и тестами."""
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        try:
-            # Обнуляем best_test_score и best_test_time в user_data для всех пользователей
-            await db.execute("UPDATE user_data SET best_test_score = 0, best_test_time = ?", (float('inf'),))
-            # Удаляем все записи из таблицы результатов тестов
-            await db.execute("DELETE FROM results")
-            # Удаляем все записи из таблицы статистики игр
-            await db.execute("DELETE FROM games_stats")
-            await db.commit()
-            return True
-        except Exception as e:
-            print(f"Error resetting all user statistics: {e}")
-            return False
+    """Сбрасывает статистику пользователей, связанную с рейтингом и тестами, открывая новый сезон."""
+    try:
+        await start_new_season()
+        return True
+    except Exception as e:
+        print(f"Error resetting all user statistics: {e}")
+        return False
 
 
 async def update_user_best_test_time(user_id: int, best_test_time: float):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
+    async with db_pool.writer() as db:
         await db.execute(
-            "UPDATE user_data SET best_test_time = ? WHERE user_id = ?",
-            (best_test_time, user_id)
+            """
+            UPDATE user_data SET
+                best_test_score = CASE WHEN season_id = :season_id THEN best_test_score ELSE 0 END,
+                best_test_time = :best_test_time,
+                season_id = :season_id
+            WHERE user_id = :user_id
+            """,
+            {"best_test_time": best_test_time, "season_id": current_season_id, "user_id": user_id}
         )
-        await db.commit()
+    user_stats_cache.invalidate(user_id)
+
+# Формула рейтинга: сумма очков тестов + правильные ответы в играх * GAME_CORRECT_WEIGHT
+# + лучший результат теста + бонус RECALL_TYPING_TIME_BONUS / лучшее время в "Ввод по памяти"
+GAME_CORRECT_WEIGHT = 0.5
+RECALL_TYPING_TIME_BONUS = 100
+
+# Та же формула над столбцами таблицы leaderboard
+LEADERBOARD_SCORE_SQL = """
+    total_correct_answers + total_game_correct * :game_weight + best_test_score
+    + CASE WHEN recall_best_time > 0 THEN :time_bonus / recall_best_time ELSE 0 END
+"""
+
+# Пересчет слагаемых рейтинга из исходных таблиц одним проходом (для полной перестройки leaderboard)
+LEADERBOARD_REBUILD_QUERY = """
+    WITH test_totals AS (
+        SELECT user_id, SUM(score) AS total_correct_answers
+        FROM results
+        WHERE season_id = :season_id
+        GROUP BY user_id
+    ),
+    game_totals AS (
+        SELECT
+            user_id,
+            SUM(correct) AS total_game_correct,
+            MIN(CASE WHEN game_type = 'recall_typing' THEN best_time END) AS recall_best_time
+        FROM games_stats
+        WHERE season_id = :season_id
+        GROUP BY user_id
+    )
+    INSERT INTO leaderboard (season_id, user_id, total_correct_answers, total_game_correct, best_test_score, recall_best_time)
+    SELECT
+        :season_id,
+        u.user_id,
+        COALESCE(tt.total_correct_answers, 0),
+        COALESCE(gt.total_game_correct, 0),
+        CASE WHEN ud.season_id = :season_id THEN ud.best_test_score ELSE 0 END,
+        gt.recall_best_time
+    FROM users u
+    LEFT JOIN user_data ud ON u.user_id = ud.user_id
+    LEFT JOIN test_totals tt ON u.user_id = tt.user_id
+    LEFT JOIN game_totals gt ON u.user_id = gt.user_id
+"""
+
+# Пользователь без строки leaderboard в текущем сезоне (еще ничего не сделал в нем) имеет 0 очков
+RANKING_QUERY = """
+    SELECT
+        u.user_id,
+        u.name AS registered_name,
+        u.first_name,
+        u.last_name,
+        u.username,
+        CASE WHEN ud.season_id = :season_id THEN ud.best_test_time END AS best_test_time,
+        COALESCE(l.best_test_score, 0) AS best_test_score,
+        COALESCE(l.total_correct_answers, 0) AS total_correct_answers,
+        COALESCE(l.total_game_correct, 0) AS total_game_correct,
+        u.last_active AS last_activity_date,
+        COALESCE(l.overall_score, 0.0) AS overall_score,
+        ROW_NUMBER() OVER (ORDER BY COALESCE(l.overall_score, 0.0) DESC, u.user_id) AS rank
+    FROM users u
+    LEFT JOIN leaderboard l ON l.season_id = :season_id AND l.user_id = u.user_id
+    LEFT JOIN user_data ud ON u.user_id = ud.user_id
+    ORDER BY rank
+"""
+
+# Очки всех пользователей для рейтинга снимка (AnalyticsSnapshot.leaderboard)
+SNAPSHOT_SCORES_QUERY = """
+    SELECT u.user_id, COALESCE(l.overall_score, 0.0) AS overall_score
+    FROM users u
+    LEFT JOIN leaderboard l ON l.season_id = :season_id AND l.user_id = u.user_id
+"""
+
+def _score_params(**params) -> Dict[str, Any]:
+    return {"game_weight": GAME_CORRECT_WEIGHT, "time_bonus": float(RECALL_TYPING_TIME_BONUS), **params}
+
+
+class Leaderboard:
+    """Упорядоченный рейтинг в памяти, зеркало таблицы leaderboard.
+
+    Хранит отсортированный список ключей (-очки, user_id) - тот же порядок, что и
+    ROW_NUMBER() OVER (ORDER BY overall_score DESC, user_id) - и словарь очков.
+    Место и очки пользователя находятся за O(log n) двоичным поиском.
+    """
+
+    def __init__(self):
+        self._scores: Dict[int, float] = {}
+        self._order: list[tuple[float, int]] = []
+        self.loaded = False
+
+    def load(self, scores: Dict[int, float]):
+        self._scores = dict(scores)
+        self._order = sorted((-score, user_id) for user_id, score in self._scores.items())
+        self.loaded = True
+
+    def reset(self):
+        """Новый сезон: у всех известных пользователей 0 очков."""
+        self.load(dict.fromkeys(self._scores, 0.0))
+
+    def set_score(self, user_id: int, score: float):
+        self.remove(user_id)
+        self._scores[user_id] = score
+        insort(self._order, (-score, user_id))
+
+    def remove(self, user_id: int):
+        old_score = self._scores.pop(user_id, None)
+        if old_score is None:
+            return
+        index = bisect_left(self._order, (-old_score, user_id))
+        if index < len(self._order) and self._order[index] == (-old_score, user_id):
+            del self._order[index]
+
+    def get_score(self, user_id: int) -> float | None:
+        return self._scores.get(user_id)
+
+    def get_rank(self, user_id: int) -> int | None:
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._order, (-score, user_id)) + 1
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+
+leaderboard = Leaderboard()
+
+async def _apply_leaderboard_delta(db, user_id: int, test_score: int = 0, game_correct: int = 0,
+                                   best_test_score: int = 0, recall_time: float | None = None) -> float:
+    """Инкрементально обновляет строку leaderboard в текущей транзакции записи и возвращает новые очки.
+
+    Рейтинг в памяти вызывающий код меняет (leaderboard.set_score) только после выхода из
+    db_pool.writer(), то есть после коммита: при откате в памяти не останутся незаписанные очки.
+    Между коммитом и set_score нет await, поэтому другие записи не вклиниваются.
+    """
+    params = _score_params(
+        season_id=current_season_id,
+        user_id=user_id,
+        test_score=test_score,
+        game_correct=game_correct,
+        best_test_score=best_test_score,
+        recall_time=recall_time,
+    )
+    await db.execute(
+        """
+        INSERT INTO leaderboard (season_id, user_id, total_correct_answers, total_game_correct, best_test_score, recall_best_time)
+        VALUES (:season_id, :user_id, :test_score, :game_correct, :best_test_score, :recall_time)
+        ON CONFLICT(season_id, user_id) DO UPDATE SET
+            total_correct_answers = total_correct_answers + excluded.total_correct_answers,
+            total_game_correct = total_game_correct + excluded.total_game_correct,
+            best_test_score = MAX(best_test_score, excluded.best_test_score),
+            recall_best_time = MIN(COALESCE(recall_best_time, excluded.recall_best_time),
+                                   COALESCE(excluded.recall_best_time, recall_best_time))
+        """,
+        params
+    )
+    cursor = await db.execute(
+        f"UPDATE leaderboard SET overall_score = {LEADERBOARD_SCORE_SQL} WHERE season_id = :season_id AND user_id = :user_id RETURNING overall_score",
+        params
+    )
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row[0]
+
+async def rebuild_leaderboard():
+    """Полностью пересчитывает строки leaderboard текущего сезона и рейтинг в памяти. Вызывается при старте."""
+    async with db_pool.writer() as db:
+        await db.execute("DELETE FROM leaderboard WHERE season_id = ?", (current_season_id,))
+        await db.execute(LEADERBOARD_REBUILD_QUERY, {"season_id": current_season_id})
+        await db.execute(f"UPDATE leaderboard SET overall_score = {LEADERBOARD_SCORE_SQL} WHERE season_id = :season_id",
+                         _score_params(season_id=current_season_id))
+        cursor = await db.execute("SELECT user_id, overall_score FROM leaderboard WHERE season_id = ?", (current_season_id,))
+        rows = await cursor.fetchall()
+    leaderboard.load({row['user_id']: row['overall_score'] for row in rows})
+    logger.info(f"[rebuild_leaderboard] Leaderboard rebuilt for {len(leaderboard)} users")
+
+# Итоги одного сезона по пользователям: те же слагаемые, что в leaderboard, плюс счетчики тестов и игр.
+# Два прохода (тесты, затем игры с UPSERT) вместо объединения агрегатов: каждый читает свой покрывающий индекс.
+# WHERE в обоих нужен SQLite для разбора INSERT ... SELECT ... ON CONFLICT.
+SEASON_ROLLUP_TESTS_QUERY = """
+    INSERT INTO season_rollups (season_id, user_id, tests_taken, total_correct_answers, total_possible_score, best_test_score)
+    SELECT :season_id, user_id, COUNT(*), SUM(score), SUM(total), MAX(score)
+    FROM results
+    WHERE season_id = :season_id
+    GROUP BY user_id
+"""
+
+SEASON_ROLLUP_GAMES_QUERY = """
+    INSERT INTO season_rollups (season_id, user_id, games_played, total_game_correct, games_incorrect, recall_best_time)
+    SELECT
+        :season_id,
+        user_id,
+        SUM(played),
+        SUM(correct),
+        SUM(incorrect),
+        MIN(CASE WHEN game_type = 'recall_typing' THEN best_time END)
+    FROM games_stats
+    WHERE season_id = :season_id
+    GROUP BY user_id
+    ON CONFLICT(season_id, user_id) DO UPDATE SET
+        games_played = excluded.games_played,
+        total_game_correct = excluded.total_game_correct,
+        games_incorrect = excluded.games_incorrect,
+        recall_best_time = excluded.recall_best_time
+"""
+
+async def compact_old_seasons(min_age_days: int = 0) -> list[int]:
+    """Сворачивает закрытые сезоны в season_rollups и удаляет их строки из results и games_stats.
+
+    Сезон сворачивается, если он закончился не меньше min_age_days дней назад. Каждый сезон
+    обрабатывается отдельной транзакцией, поэтому повторный запуск после сбоя безопасен.
+    Возвращает номера свернутых сезонов.
+    """
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=min_age_days)).isoformat()
+    async with db_pool.reader() as db:
+        cursor = await db.execute(
+            "SELECT season_id FROM seasons WHERE season_id < ? AND compacted_at IS NULL AND ended_at <= ? ORDER BY season_id",
+            (current_season_id, cutoff)
+        )
+        season_ids = [row[0] for row in await cursor.fetchall()]
+
+    for season_id in season_ids:
+        started = time.perf_counter()
+        async with db_pool.writer() as db:
+            # Повторный запуск после сбоя перезаписывает итоги сезона целиком
+            await db.execute("DELETE FROM season_rollups WHERE season_id = ?", (season_id,))
+            await db.execute(SEASON_ROLLUP_TESTS_QUERY, {"season_id": season_id})
+            await db.execute(SEASON_ROLLUP_GAMES_QUERY, {"season_id": season_id})
+            await db.execute(
+                f"UPDATE season_rollups SET overall_score = {LEADERBOARD_SCORE_SQL} WHERE season_id = :season_id",
+                _score_params(season_id=season_id)
+            )
+            results_cursor = await db.execute("DELETE FROM results WHERE season_id = ?", (season_id,))
+            games_cursor = await db.execute("DELETE FROM games_stats WHERE season_id = ?", (season_id,))
+            # Итоговые очки сезона теперь в season_rollups
+            await db.execute("DELETE FROM leaderboard WHERE season_id = ?", (season_id,))
+            await db.execute(
+                "UPDATE seasons SET compacted_at = ? WHERE season_id = ?",
+                (datetime.datetime.now().isoformat(), season_id)
+            )
+        logger.info(f"[compact_old_seasons] Season {season_id} compacted: {results_cursor.rowcount} results, "
+                    f"{games_cursor.rowcount} games_stats rows in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return season_ids
+
+async def get_user_rank(user_id: int) -> Dict[str, Any] | None:
+    """Место и очки пользователя из рейтинга в памяти (O(log n)), без запросов к БД."""
+    if game_stats_buffer.has_pending(user_id):
+        # Очки зависят от еще не записанных ответов - записываем их, чтобы место было актуальным
+        await game_stats_buffer.flush()
+    if not leaderboard.loaded:
+        await rebuild_leaderboard()
+    rank = leaderboard.get_rank(user_id)
+    if rank is None:
+        return None
+    return {"user_id": user_id, "rank": rank, "overall_score": leaderboard.get_score(user_id)}
+
+async def get_ranking() -> list[Dict[str, Any]]:
+    """Полный рейтинг из таблицы leaderboard, места назначаются оконной функцией ROW_NUMBER."""
+    await game_stats_buffer.flush()
+    async with db_pool.reader() as db:
+        cursor = await db.execute(RANKING_QUERY, {"season_id": current_season_id})
+        rows = await cursor.fetchall()
+    ranking = [dict(row) for row in rows]
+    for row in ranking:
+        row['last_activity_date'] = activity_tracker.overlay(row['user_id'], row['last_activity_date'])
+    return ranking
+
+RANKING_PAGE_COLUMNS = """
+    u.name AS registered_name,
+    u.first_name,
+    u.last_name,
+    u.username,
+    CASE WHEN ud.season_id = :season_id THEN ud.best_test_time END AS best_test_time,
+    COALESCE(l.best_test_score, 0) AS best_test_score,
+    COALESCE(l.total_correct_answers, 0) AS total_correct_answers,
+    COALESCE(l.total_game_correct, 0) AS total_game_correct,
+    u.last_active AS last_activity_date
+"""
+
+# Очки не бывают отрицательными, поэтому рейтинг - это две части подряд: строки leaderboard текущего
+# сезона с очками > 0 (по индексу idx_leaderboard_season_score), затем все остальные пользователи с 0 очков
+# по user_id (по UNIQUE-индексу users), включая тех, у кого строки в этом сезоне еще нет.
+RANKING_PAGE_SCORED = f"""
+    SELECT l.user_id, {RANKING_PAGE_COLUMNS}, l.overall_score
+    FROM leaderboard l
+    JOIN users u ON u.user_id = l.user_id
+    LEFT JOIN user_data ud ON u.user_id = ud.user_id
+    WHERE l.season_id = :season_id AND l.overall_score > 0
+      AND (:name_filter IS NULL OR instr(py_upper(u.name), :name_filter) > 0)
+"""
+
+RANKING_PAGE_ZERO = f"""
+    SELECT u.user_id, {RANKING_PAGE_COLUMNS}, 0.0 AS overall_score
+    FROM users u
+    LEFT JOIN leaderboard l ON l.season_id = :season_id AND l.user_id = u.user_id
+    LEFT JOIN user_data ud ON u.user_id = ud.user_id
+    WHERE COALESCE(l.overall_score, 0) <= 0
+      AND (:name_filter IS NULL OR instr(py_upper(u.name), :name_filter) > 0)
+"""
+
+# Keyset-пагинация рейтинга: строки после (after_score, after_user_id) в порядке рейтинга.
+# Первое условие по очкам - граница диапазона индекса, второе отсекает равные очки до after_user_id.
+RANKING_PAGE_SCORED_AFTER_QUERY = f"""
+    {RANKING_PAGE_SCORED}
+      AND l.overall_score <= :after_score
+      AND (l.overall_score < :after_score OR l.user_id > :after_user_id)
+    ORDER BY l.overall_score DESC, l.user_id
+    LIMIT :limit
+"""
+
+RANKING_PAGE_ZERO_AFTER_QUERY = f"""
+    {RANKING_PAGE_ZERO}
+      AND u.user_id > :after_user_id
+    ORDER BY u.user_id
+    LIMIT :limit
+"""
+
+# Те же части в обратную сторону: строки перед (before_score, before_user_id), от ближайшей к дальней
+RANKING_PAGE_SCORED_BEFORE_QUERY = f"""
+    {RANKING_PAGE_SCORED}
+      AND l.overall_score >= :before_score
+      AND (l.overall_score > :before_score OR l.user_id < :before_user_id)
+    ORDER BY l.overall_score ASC, l.user_id DESC
+    LIMIT :limit
+"""
+
+RANKING_PAGE_ZERO_BEFORE_QUERY = f"""
+    {RANKING_PAGE_ZERO}
+      AND u.user_id < :before_user_id
+    ORDER BY u.user_id DESC
+    LIMIT :limit
+"""
+
+# Ключ перед первой строкой рейтинга: больше любых очков и меньше любого user_id
+RANKING_START_KEY = (math.inf, -math.inf)
+
+async def _fetch_ranking_rows(db, params: Dict[str, Any], limit: int, after: tuple[float, int] | None,
+                              before: tuple[float, int] | None) -> list[Dict[str, Any]]:
+    """До limit строк рейтинга после after (или перед before - от ближайшей к дальней), переходя между частями."""
+    rows = []
+
+    async def fetch(query: str, **key):
+        cursor = await db.execute(query, {**params, **key, "limit": limit - len(rows)})
+        rows.extend(dict(row) for row in await cursor.fetchall())
+
+    if before:
+        before_score, before_user_id = before
+        if before_score <= 0:
+            await fetch(RANKING_PAGE_ZERO_BEFORE_QUERY, before_user_id=before_user_id)
+        # При before_score = 0 запрос возвращает всю часть с очками, начиная с конца
+        if len(rows) < limit:
+            await fetch(RANKING_PAGE_SCORED_BEFORE_QUERY, before_score=before_score, before_user_id=before_user_id)
+    else:
+        after_score, after_user_id = after or RANKING_START_KEY
+        if after_score > 0:
+            await fetch(RANKING_PAGE_SCORED_AFTER_QUERY, after_score=after_score, after_user_id=after_user_id)
+            # После части с очками - все пользователи с 0 очков с начала
+            after_user_id = -math.inf
+        if len(rows) < limit:
+            await fetch(RANKING_PAGE_ZERO_AFTER_QUERY, after_user_id=after_user_id)
+    return rows
+
+async def _ranking_page(db, ranks: "Leaderboard", limit: int, after: tuple[float, int] | None,
+                        before: tuple[float, int] | None, name_filter: str | None) -> Dict[str, Any]:
+    params = {
+        "name_filter": name_filter.upper() if name_filter else None,
+        "season_id": current_season_id,
+    }
+    rows = await _fetch_ranking_rows(db, params, limit + 1, after, before)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before:
+        rows.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+
+    for row in rows:
+        row['rank'] = ranks.get_rank(row['user_id'])
+        row['last_activity_date'] = activity_tracker.overlay(row['user_id'], row['last_activity_date'])
+    return {"rows": rows, "has_prev": has_prev, "has_next": has_next}
+
+def _use_snapshot(from_snapshot: bool) -> bool:
+    # Без ANALYTICS_SNAPSHOT_ENABLED analytics_snapshot.reader() отдает соединение пула - тогда читаем как обычно
+    return from_snapshot and config.ANALYTICS_SNAPSHOT_ENABLED
+
+async def get_ranking_page(limit: int, after: tuple[float, int] | None = None, before: tuple[float, int] | None = None,
+                           name_filter: str | None = None, from_snapshot: bool = False) -> Dict[str, Any]:
+    """Одна страница рейтинга без загрузки всего рейтинга.
+
+    after/before - ключ (overall_score, user_id) последней или первой строки соседней страницы.
+    name_filter - подстрока в зарегистрированном имени без учета регистра (например, " 2В" для класса).
+    from_snapshot=True - из снимка analytics_snapshot (для админских отчетов, данные могут отставать).
+    Возвращает {"rows", "has_prev", "has_next"}; место (rank) каждой строки берется из рейтинга в памяти
+    (для снимка - из рейтинга, построенного по этому снимку).
+    """
+    if _use_snapshot(from_snapshot):
+        async with analytics_snapshot.reader() as db:
+            return await _ranking_page(db, await analytics_snapshot.leaderboard(db), limit, after, before, name_filter)
+
+    await game_stats_buffer.flush()
+    if not leaderboard.loaded:
+        await rebuild_leaderboard()
+    async with db_pool.reader() as db:
+        return await _ranking_page(db, leaderboard, limit, after, before, name_filter)
+
+async def _iter_pages(fetch_page: Callable[[tuple[float, int] | None], Awaitable[Dict[str, Any]]]) -> AsyncIterator[list[Dict[str, Any]]]:
+    after = None
+    while True:
+        page = await fetch_page(after)
+        if page["rows"]:
+            yield page["rows"]
+        if not page["has_next"] or not page["rows"]:
+            return
+        last_row = page["rows"][-1]
+        after = (last_row['overall_score'], last_row['user_id'])
+
+async def iter_ranking_pages(name_filter: str | None = None, batch_size: int = 200,
+                             from_snapshot: bool = False) -> AsyncIterator[list[Dict[str, Any]]]:
+    """Весь рейтинг порциями по batch_size строк (keyset), без загрузки в память целиком.
+
+    Со снимком все порции читаются через одно соединение, то есть из одного и того же снимка.
+    """
+    if _use_snapshot(from_snapshot):
+        async with analytics_snapshot.reader() as db:
+            ranks = await analytics_snapshot.leaderboard(db)
+            async for rows in _iter_pages(lambda after: _ranking_page(db, ranks, batch_size, after, None, name_filter)):
+                yield rows
+        return
+
+    async for rows in _iter_pages(lambda after: get_ranking_page(batch_size, after=after, name_filter=name_filter)):
+        yield rows
+
+async def get_game_stats_by_word_set_for_users(user_ids: list[int], from_snapshot: bool = False) -> Dict[int, dict[str, dict[str, Any]]]:
+    """Статистика игр по словарям сразу для нескольких пользователей (одна страница отчета) одним запросом.
+
+    from_snapshot=True - из снимка analytics_snapshot (для админских отчетов, данные могут отставать).
+    """
+    if not user_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in user_ids)
+    connection = analytics_snapshot.reader() if from_snapshot else db_pool.reader()
+    async with connection as db:
+        cursor = await db.execute(
+            f"SELECT user_id, game_type, word_set_name, played, correct, incorrect, best_time FROM games_stats "
+            f"WHERE season_id = ? AND user_id IN ({placeholders})",
+            [current_season_id, *user_ids]
+        )
+        rows = await cursor.fetchall()
+
+    stats_by_user: Dict[int, dict[str, dict[str, Any]]] = {}
+    for row in rows:
+        stats_by_user.setdefault(row['user_id'], {}).setdefault(row['word_set_name'], {})[row['game_type']] = {
+            'played': row['played'],
+            'correct': row['correct'],
+            'incorrect': row['incorrect'],
+            'best_time': row['best_time']
+        }
+    return stats_by_user
 
 async def get_all_users_for_ranking() -> list[Dict[str, Any]]:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    """Сырые данные для эталонного расчета рейтинга в Python (utils.data_manager.calculate_overall_score_and_rank_reference).
+
+    Статистика игр агрегируется по типу игры по всем словарям: correct суммируется, best_time - минимальное.
+    """
+    await game_stats_buffer.flush()
+    async with db_pool.reader() as db:
         cursor = await db.execute("""
             SELECT
                 u.user_id,
@@ -179,153 +1325,477 @@ async def get_all_users_for_ranking() -> list[Dict[str, Any]]:
                 u.first_name,
                 u.last_name,
                 u.username,
-                ud.best_test_time,
-                ud.best_test_score,
+                CASE WHEN ud.season_id = :season_id THEN ud.best_test_time END AS best_test_time,
+                CASE WHEN ud.season_id = :season_id THEN ud.best_test_score ELSE 0 END AS best_test_score,
                 SUM(r.score) AS total_correct_answers,
                 u.last_active
             FROM users u
             LEFT JOIN user_data ud ON u.user_id = ud.user_id
-            LEFT JOIN results r ON u.user_id = r.user_id
+            LEFT JOIN results r ON u.user_id = r.user_id AND r.season_id = :season_id
             GROUP BY u.user_id
-        """)
+        """, {"season_id": current_season_id})
         users_data = await cursor.fetchall()
 
+        games_cursor = await db.execute("""
+            SELECT user_id, game_type, SUM(played) AS played, SUM(correct) AS correct,
+                   SUM(incorrect) AS incorrect, MIN(best_time) AS best_time
+            FROM games_stats
+            WHERE season_id = :season_id
+            GROUP BY user_id, game_type
+        """, {"season_id": current_season_id})
+        games_stats_by_user: Dict[int, Dict[str, Any]] = {}
+        for row in await games_cursor.fetchall():
+            games_stats_by_user.setdefault(row['user_id'], {})[row['game_type']] = {
+                'played': row['played'],
+                'correct': row['correct'],
+                'incorrect': row['incorrect'],
+                'best_time': row['best_time']
+            }
+
         result = []
         for user_row in users_data:
             user_dict = dict(user_row)
-            # Get games stats for each user
-            games_cursor = await db.execute("SELECT game_type, played, correct, incorrect, best_time FROM games_stats WHERE user_id = ?", (user_dict['user_id'],))
-            games_stats_rows = await games_cursor.fetchall()
-            user_dict['games_stats'] = {
-                row['game_type']: {
-                    'played': row['played'],
-                    'correct': row['correct'],
-                    'incorrect': row['incorrect'],
-                    'best_time': row['best_time']
-                } for row in games_stats_rows
-            }
+            user_dict['games_stats'] = games_stats_by_user.get(user_dict['user_id'], {})
+            user_dict['last_active'] = activity_tracker.overlay(user_dict['user_id'], user_dict['last_active'])
             result.append(user_dict)
         return result
 
-async def update_game_stats(user_id: int, game_type: str, is_correct: bool, last_activity_date: str, time_taken: float = None, word_set_name: str = "default"):
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        # Update last activity in users table
-        await db.execute("UPDATE users SET last_active = ? WHERE user_id = ?", (last_activity_date, user_id))
-
-        # Get current game stats
-        cursor = await db.execute("SELECT played, correct, incorrect, best_time FROM games_stats WHERE user_id = ? AND game_type = ? AND word_set_name = ?", (user_id, game_type, word_set_name))
-        game_data = await cursor.fetchone()
-
-        played = game_data[0] if game_data else 0
-        correct = game_data[1] if game_data else 0
-        incorrect = game_data[2] if game_data else 0
-        current_best_time = game_data[3] if game_data and game_data[3] is not None else float('inf')
-
-        played += 1
-        if is_correct:
-            correct += 1
-        else:
-            incorrect += 1
+# Атомарное добавление накопленных ответов к строке games_stats: вся арифметика и выбор лучшего
+# времени выполняются в SQLite, без чтения строки в Python. best_time задан только для recall_typing.
+GAME_STATS_UPSERT_QUERY = """
+    INSERT INTO games_stats (season_id, user_id, game_type, word_set_name, played, correct, incorrect, best_time)
+    VALUES (:season_id, :user_id, :game_type, :word_set_name, :played, :correct, :incorrect, :best_time)
+    ON CONFLICT(season_id, user_id, game_type, word_set_name) DO UPDATE SET
+        played = played + excluded.played,
+        correct = correct + excluded.correct,
+        incorrect = incorrect + excluded.incorrect,
+        best_time = CASE
+            WHEN excluded.best_time IS NULL THEN best_time
+            WHEN best_time IS NULL THEN excluded.best_time
+            ELSE MIN(best_time, excluded.best_time)
+        END
+"""
 
-        if game_type == "recall_typing" and time_taken is not None and time_taken < current_best_time:
-            current_best_time = time_taken
-        elif game_type != "recall_typing":
-            current_best_time = None # Ensure best_time is None for other game types
+def _merge_game_stats(target: Dict[str, Any], delta: Dict[str, Any]):
+    """Добавляет накопленные ответы delta к статистике игры target (played/correct/incorrect/best_time)."""
+    target['played'] = (target.get('played') or 0) + delta['played']
+    target['correct'] = (target.get('correct') or 0) + delta['correct']
+    target['incorrect'] = (target.get('incorrect') or 0) + delta['incorrect']
+    if delta['best_time'] is not None and (target.get('best_time') is None or delta['best_time'] < target['best_time']):
+        target['best_time'] = delta['best_time']
 
-        if game_data:
-            await db.execute(
-                "UPDATE games_stats SET played = ?, correct = ?, incorrect = ?, best_time = ? WHERE user_id = ? AND game_type = ? AND word_set_name = ?",
-                (played, correct, incorrect, current_best_time, user_id, game_type, word_set_name)
-            )
-        else:
-            await db.execute(
-                "INSERT INTO games_stats (user_id, game_type, word_set_name, played, correct, incorrect, best_time) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (user_id, game_type, word_set_name, played, correct, incorrect, current_best_time)
-            )
-        await db.commit()
+
+class GameStatsBuffer:
+    """Write-behind буфер ответов в играх.
+
+    Ответы складываются в память и объединяются по ключу (user_id, game_type, word_set_name),
+    а в БД записываются одной транзакцией раз в flush_interval секунд, при накоплении
+    max_events ответов и при остановке бота (close_db_pool). Чтения статистики берут lock только на
+    время чтения буфера, чтобы не попасть между началом и концом записи, и добавляют к данным из БД
+    еще не записанные ответы.
+    """
+
+    def __init__(self, flush_interval: float, max_events: int):
+        self.flush_interval = flush_interval
+        self.max_events = max(1, max_events)
+        self.lock = asyncio.Lock()
+        self._pending: Dict[tuple[int, str, str], Dict[str, Any]] = {}
+        self._event_count = 0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, Any] = {
+            "events": 0,
+            "flushes": 0,
+            "rows_written": 0,
+            "last_flush_ms": None,
+        }
+
+    def add(self, user_id: int, game_type: str, word_set_name: str, is_correct: bool,
+            last_activity_date: str, time_taken: float | None = None):
+        delta = self._pending.setdefault(
+            (user_id, game_type, word_set_name),
+            {"played": 0, "correct": 0, "incorrect": 0, "best_time": None}
+        )
+        _merge_game_stats(delta, {
+            "played": 1,
+            "correct": 1 if is_correct else 0,
+            "incorrect": 0 if is_correct else 1,
+            "best_time": time_taken if game_type == "recall_typing" else None,
+        })
+        activity_tracker.touch(user_id, last_activity_date)
+        self._event_count += 1
+        self.stats["events"] += 1
+
+        if self._task is None:
+            self.start()
+        if self._event_count >= self.max_events:
+            self._wake.set()
+
+    def has_pending(self, user_id: int | None = None) -> bool:
+        if user_id is None:
+            return bool(self._pending)
+        return any(pending_user_id == user_id for pending_user_id, _, _ in self._pending)
+
+    def pending_for_user(self, user_id: int) -> list[tuple[str, str, Dict[str, Any]]]:
+        """Не записанные в БД ответы пользователя: [(game_type, word_set_name, delta)]."""
+        return [
+            (game_type, word_set_name, delta)
+            for (pending_user_id, game_type, word_set_name), delta in self._pending.items()
+            if pending_user_id == user_id
+        ]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def discard_user(self, user_id: int):
+        self._pending = {key: delta for key, delta in self._pending.items() if key[0] != user_id}
+
+    async def flush(self):
+        """Записывает все накопленные ответы одной транзакцией."""
+        async with self.lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            self._event_count = 0
+
+            started = time.perf_counter()
+            try:
+                async with db_pool.writer() as db:
+                    await db.executemany(GAME_STATS_UPSERT_QUERY, [
+                        {"season_id": current_season_id, "user_id": user_id, "game_type": game_type,
+                         "word_set_name": word_set_name, **delta}
+                        for (user_id, game_type, word_set_name), delta in pending.items()
+                    ])
+                    # Слагаемые рейтинга меняются один раз на пользователя, а не на каждую строку games_stats
+                    leaderboard_deltas: Dict[int, Dict[str, Any]] = {}
+                    for (user_id, _, _), delta in pending.items():
+                        _merge_game_stats(leaderboard_deltas.setdefault(user_id, _empty_game_stats()), delta)
+                    new_scores = {
+                        user_id: await _apply_leaderboard_delta(db, user_id, game_correct=delta['correct'], recall_time=delta['best_time'])
+                        for user_id, delta in leaderboard_deltas.items()
+                    }
+            except Exception:
+                # Возвращаем ответы в буфер, чтобы не потерять их при следующей попытке
+                for key, delta in pending.items():
+                    _merge_game_stats(self._pending.setdefault(
+                        key, {"played": 0, "correct": 0, "incorrect": 0, "best_time": None}
+                    ), delta)
+                raise
+
+            for user_id, overall_score in new_scores.items():
+                leaderboard.set_score(user_id, overall_score)
+                user_stats_cache.invalidate(user_id)
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += len(pending)
+            self.stats["last_flush_ms"] = (time.perf_counter() - started) * 1000
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"[GameStatsBuffer] Flush failed: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую запись и записывает остаток буфера."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+game_stats_buffer = GameStatsBuffer(config.GAME_STATS_FLUSH_INTERVAL_SECONDS, config.GAME_STATS_FLUSH_MAX_EVENTS)
+
+async def update_game_stats(user_id: int, game_type: str, is_correct: bool, last_activity_date: str, time_taken: float = None, word_set_name: str = "default"):
+    """Ставит ответ в game_stats_buffer. В БД он попадет при ближайшей записи буфера."""
+    game_stats_buffer.add(user_id, game_type, word_set_name, is_correct, last_activity_date, time_taken)
+
+async def flush_game_stats():
+    await game_stats_buffer.flush()
 
 async def get_game_stats_by_word_set(user_id: int) -> dict[str, dict[str, Any]]:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT game_type, word_set_name, played, correct, incorrect, best_time FROM games_stats WHERE user_id = ?", (user_id,))
-        rows = await cursor.fetchall()
-        
-        stats_by_set = {}
-        for row in rows:
-            word_set = row['word_set_name']
-            game_type = row['game_type']
-            if word_set not in stats_by_set:
-                stats_by_set[word_set] = {}
-            stats_by_set[word_set][game_type] = {
-                'played': row['played'],
-                'correct': row['correct'],
-                'incorrect': row['incorrect'],
-                'best_time': row['best_time']
-            }
-        return stats_by_set
+    return (await get_user_stats_snapshot(user_id))["game_stats_by_set"]
 
 async def get_test_stats_by_word_set(user_id: int) -> dict[str, dict[str, Any]]:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """
-            SELECT 
-                word_set_name, 
-                COUNT(id) AS total_tests,
-                SUM(score) AS total_score,
-                SUM(total) AS total_possible_score,
-                MAX(score) AS best_score
-            FROM results 
-            WHERE user_id = ?
-            GROUP BY word_set_name
-            """,
-            (user_id,)
-        )
-        rows = await cursor.fetchall()
-        
-        stats_by_set = {}
-        for row in rows:
-            word_set = row['word_set_name']
-            stats_by_set[word_set] = {
-                'total_tests': row['total_tests'],
-                'total_score': row['total_score'],
-                'total_possible_score': row['total_possible_score'],
-                'best_score': row['best_score']
-            }
-        return stats_by_set
+    return (await get_user_stats_snapshot(user_id))["test_stats_by_set"]
+
+ANSWER_EVENT_INSERT_QUERY = """
+    INSERT INTO answer_events (user_id, word, game_type, word_set_name, is_correct, latency_ms, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+class AnswerEventLog:
+    """Очередь событий отдельных ответов с пакетной записью в answer_events.
+
+    log() только кладет событие в asyncio.Queue. Фоновая задача забирает события пачками
+    до batch_size штук (ожидая до flush_interval секунд, пока пачка наберется) и записывает
+    каждую пачку одним executemany. Если очередь переполнена, событие отбрасывается и
+    учитывается в stats["dropped"] - из-за журнала ответ ученика никогда не задерживается.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue_size: int):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[tuple] = asyncio.Queue(maxsize=max_queue_size)
+        # Пачка, взятая из очереди, но еще не записанная (переживает отмену задачи в stop)
+        self._batch: list[tuple] = []
+        self._task: asyncio.Task | None = None
+        self.stats: Dict[str, Any] = {
+            "events": 0,
+            "dropped": 0,
+            "batches": 0,
+            "rows_written": 0,
+            "failed": 0,
+        }
+
+    def log(self, user_id: int, word: str, game_type: str, word_set_name: str, is_correct: bool,
+            latency_ms: int | None = None):
+        event = (user_id, word, game_type, word_set_name, 1 if is_correct else 0, latency_ms,
+                 datetime.datetime.now().isoformat())
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            return
+        self.stats["events"] += 1
+        if self._task is None:
+            self.start()
+
+    def __len__(self) -> int:
+        return self._queue.qsize() + len(self._batch)
+
+    def discard_user(self, user_id: int):
+        """Убирает из очереди события удаляемого пользователя."""
+        self._batch = [event for event in self._batch if event[0] != user_id]
+        kept = [event for event in self._drain(self._queue.qsize()) if event[0] != user_id]
+        for event in kept:
+            self._queue.put_nowait(event)
+
+    def _drain(self, limit: int) -> list[tuple]:
+        events = []
+        while len(events) < limit and not self._queue.empty():
+            events.append(self._queue.get_nowait())
+        return events
+
+    async def _write_batch(self):
+        if not self._batch:
+            return
+        batch = self._batch
+        async with db_pool.writer() as db:
+            await db.executemany(ANSWER_EVENT_INSERT_QUERY, batch)
+        self._batch = []
+        self.stats["batches"] += 1
+        self.stats["rows_written"] += len(batch)
+
+    async def _run(self):
+        while True:
+            if not self._batch:
+                # discard_user может заменить список, пока задача ждет в get()
+                event = await self._queue.get()
+                self._batch.append(event)
+            if len(self) < self.batch_size:
+                # Событиям не нужна немедленная запись - даем пачке набраться
+                await asyncio.sleep(self.flush_interval)
+            self._batch.extend(self._drain(self.batch_size - len(self._batch)))
+            try:
+                await self._write_batch()
+            except Exception as e:
+                logger.error(f"[AnswerEventLog] Failed to write {len(self._batch)} events: {e}")
+                self.stats["failed"] += len(self._batch)
+                self._batch = []
+
+    async def flush(self):
+        """Записывает все события из очереди (пачками по batch_size)."""
+        while self._batch or not self._queue.empty():
+            self._batch.extend(self._drain(self.batch_size - len(self._batch)))
+            await self._write_batch()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Останавливает фоновую запись и записывает оставшиеся события."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+answer_event_log = AnswerEventLog(config.ANSWER_EVENTS_BATCH_SIZE, config.ANSWER_EVENTS_FLUSH_INTERVAL_SECONDS,
+                                  config.ANSWER_EVENTS_QUEUE_SIZE)
+
+async def log_answer_event(user_id: int, word: str, game_type: str, word_set_name: str, is_correct: bool,
+                           latency_ms: int | None = None):
+    """Ставит ответ в очередь answer_event_log. В answer_events он попадет с ближайшей пачкой."""
+    answer_event_log.log(user_id, word, game_type, word_set_name, is_correct, latency_ms)
+
+# Свертка диапазона id событий в итоги по словам; WHERE нужен SQLite для разбора INSERT ... SELECT ... ON CONFLICT
+ANSWER_EVENTS_ROLLUP_QUERY = """
+    INSERT INTO answer_word_stats (user_id, word_set_name, word, answers, correct, latency_ms_total, latency_count, last_answered_at)
+    SELECT user_id, word_set_name, word, COUNT(*), SUM(is_correct), COALESCE(SUM(latency_ms), 0), COUNT(latency_ms), MAX(created_at)
+    FROM answer_events
+    WHERE id >= :low_id AND id < :high_id
+    GROUP BY user_id, word_set_name, word
+    ON CONFLICT(user_id, word_set_name, word) DO UPDATE SET
+        answers = answers + excluded.answers,
+        correct = correct + excluded.correct,
+        latency_ms_total = latency_ms_total + excluded.latency_ms_total,
+        latency_count = latency_count + excluded.latency_count,
+        last_answered_at = MAX(last_answered_at, excluded.last_answered_at)
+"""
+
+async def compact_answer_events(retention_days: int, max_rows: int, batch_size: int = 5000) -> int:
+    """Удаляет события старше retention_days дней и сверх max_rows последних, сворачивая их в answer_word_stats.
+
+    События удаляются диапазонами id по batch_size штук, каждый диапазон - отдельной короткой
+    транзакцией записи, чтобы не задерживать ответы учеников. Возвращает число удаленных событий.
+    """
+    cutoff = (datetime.datetime.now() - datetime.timedelta(days=retention_days)).isoformat()
+    async with db_pool.reader() as db:
+        cursor = await db.execute("SELECT MIN(id), MAX(id) FROM answer_events")
+        min_id, max_id = await cursor.fetchone()
+        if min_id is None:
+            return 0
+        # id растут вместе со временем: проход по rowid останавливается на первом свежем событии
+        cursor = await db.execute("SELECT id FROM answer_events WHERE created_at >= ? ORDER BY id LIMIT 1", (cutoff,))
+        row = await cursor.fetchone()
+    first_kept_id = max(row[0] if row else max_id + 1, max_id - max_rows + 1)
+
+    deleted = 0
+    for low_id in range(min_id, first_kept_id, batch_size):
+        high_id = min(low_id + batch_size, first_kept_id)
+        async with db_pool.writer() as db:
+            await db.execute(ANSWER_EVENTS_ROLLUP_QUERY, {"low_id": low_id, "high_id": high_id})
+            cursor = await db.execute("DELETE FROM answer_events WHERE id >= ? AND id < ?", (low_id, high_id))
+            deleted += cursor.rowcount
+    if deleted:
+        logger.info(f"[compact_answer_events] Folded {deleted} answer events older than id {first_kept_id} into answer_word_stats")
+    return deleted
+
+class ModerationCache:
+    """Заблокированные и заглушенные пользователи в памяти процесса.
+
+    Загружается из БД при старте (init_db) и обновляется после успешной записи в
+    add_banned_user, remove_banned_user, mute_user, unmute_user и delete_user_from_db,
+    поэтому проверка на каждое входящее сообщение - это поиск в set/dict без запросов к БД.
+    ban_checks/banned - проверки блокировки и сколько из них пришлось на заблокированных,
+    mute_checks/muted - то же для mute, db_loads - сколько раз списки загружались из БД.
+    """
+
+    def __init__(self):
+        self._banned: set[int] = set()
+        self._mute_until: Dict[int, str] = {}
+        self.loaded = False
+        self.stats: Dict[str, int] = {
+            "ban_checks": 0,
+            "banned": 0,
+            "mute_checks": 0,
+            "muted": 0,
+            "db_loads": 0,
+        }
+
+    async def load(self):
+        self.stats["db_loads"] += 1
+        async with db_pool.reader() as db:
+            cursor = await db.execute("SELECT user_id FROM banned_users")
+            banned = {row[0] for row in await cursor.fetchall()}
+            cursor = await db.execute("SELECT user_id, mute_until FROM users WHERE mute_until IS NOT NULL")
+            mute_until = {row['user_id']: row['mute_until'] for row in await cursor.fetchall()}
+        self._banned = banned
+        self._mute_until = mute_until
+        self.loaded = True
+
+    async def _ensure_loaded(self):
+        if not self.loaded:
+            await self.load()
+
+    async def is_banned(self, user_id: int) -> bool:
+        await self._ensure_loaded()
+        self.stats["ban_checks"] += 1
+        if user_id in self._banned:
+            self.stats["banned"] += 1
+            return True
+        return False
+
+    async def banned_users(self) -> list[int]:
+        await self._ensure_loaded()
+        return list(self._banned)
+
+    async def mute_until(self, user_id: int) -> str | None:
+        await self._ensure_loaded()
+        self.stats["mute_checks"] += 1
+        mute_until = self._mute_until.get(user_id)
+        if mute_until is not None:
+            self.stats["muted"] += 1
+        return mute_until
+
+    def ban(self, user_id: int):
+        self._banned.add(user_id)
+
+    def unban(self, user_id: int):
+        self._banned.discard(user_id)
+
+    def mute(self, user_id: int, mute_until: str):
+        self._mute_until[user_id] = mute_until
+
+    def unmute(self, user_id: int):
+        self._mute_until.pop(user_id, None)
+
+
+moderation_cache = ModerationCache()
 
 async def get_banned_users() -> list[int]:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        cursor = await db.execute("SELECT user_id FROM banned_users")
-        rows = await cursor.fetchall()
-        return [row[0] for row in rows]
+    return await moderation_cache.banned_users()
+
+async def is_user_banned(user_id: int) -> bool:
+    """Проверка блокировки за O(1) по moderation_cache."""
+    return await moderation_cache.is_banned(user_id)
 
 async def add_banned_user(user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        try:
+    try:
+        async with db_pool.writer() as db:
             await db.execute("INSERT INTO banned_users (user_id) VALUES (?) ", (user_id,))
-            await db.commit()
-            return True
-        except aiosqlite.IntegrityError: # User might already be banned
-            return False
+    except aiosqlite.IntegrityError: # User might already be banned
+        return False
+    moderation_cache.ban(user_id)
+    return True
 
 async def remove_banned_user(user_id: int) -> bool:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
+    async with db_pool.writer() as db:
         cursor = await db.execute("DELETE FROM banned_users WHERE user_id = ?", (user_id,))
-        await db.commit()
-        return cursor.rowcount > 0
+        removed = cursor.rowcount > 0
+    moderation_cache.unban(user_id)
+    return removed
 
-async def get_all_users():
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
+async def get_all_users(from_snapshot: bool = False):
+    """Все пользователи. from_snapshot=True - из снимка analytics_snapshot (для админских отчетов, данные могут отставать)."""
+    connection = analytics_snapshot.reader() if from_snapshot else db_pool.reader()
+    async with connection as db:
         # Retrieve all relevant user information including first_name, last_name, username
         cursor = await db.execute("SELECT user_id, name, first_name, last_name, username FROM users")
         users = await cursor.fetchall()
         return [dict(user) for user in users]
 
 async def get_user_display_name(user_id: int) -> str:
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
+    async with db_pool.reader() as db:
         cursor = await db.execute("SELECT name, first_name, last_name, username FROM users WHERE user_id = ?", (user_id,))
         user = await cursor.fetchone()
 
@@ -350,44 +1820,72 @@ async def get_user_display_name(user_id: int) -> str:
 
 async def mute_user(user_id: int, hours: float | None) -> bool:
     """Mutes a user for a specified number of hours, or permanently if hours is None."""
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        if hours is None:
-            mute_until = "9999-12-31T23:59:59"
-        else:
-            mute_until = (datetime.datetime.now() + datetime.timedelta(hours=hours)).isoformat()
-        
-        try:
-            await db.execute("UPDATE users SET mute_until = ? WHERE user_id = ?", (mute_until, user_id))
-            await db.commit()
-            return True
-        except Exception as e:
-            print(f"Error muting user {user_id}: {e}")
-            return False
+    if hours is None:
+        mute_until = "9999-12-31T23:59:59"
+    else:
+        mute_until = (datetime.datetime.now() + datetime.timedelta(hours=hours)).isoformat()
+
+    try:
+        async with db_pool.writer() as db:
+            cursor = await db.execute("UPDATE users SET mute_until = ? WHERE user_id = ?", (mute_until, user_id))
+            updated = cursor.rowcount > 0
+    except Exception as e:
+        print(f"Error muting user {user_id}: {e}")
+        return False
+    # Неизвестного пользователя в БД нет - в кэш его тоже не добавляем
+    if updated:
+        moderation_cache.mute(user_id, mute_until)
+    return True
 
 async def unmute_user(user_id: int) -> bool:
     """Unmutes a user."""
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        try:
+    try:
+        async with db_pool.writer() as db:
             await db.execute("UPDATE users SET mute_until = NULL WHERE user_id = ?", (user_id,))
-            await db.commit()
-            return True
-        except Exception as e:
-            print(f"Error unmuting user {user_id}: {e}")
-            return False
+    except Exception as e:
+        print(f"Error unmuting user {user_id}: {e}")
+        return False
+    moderation_cache.unmute(user_id)
+    return True
 
 async def get_user_mute_status(user_id: int) -> datetime.datetime | None:
     """Returns the datetime until which the user is muted, or None if not muted."""
-    async with aiosqlite.connect(DATABASE_NAME) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT mute_until FROM users WHERE user_id = ?", (user_id,))
-        row = await cursor.fetchone()
-        
-        if row and row['mute_until']:
-            try:
-                mute_until = datetime.datetime.fromisoformat(row['mute_until'])
-                if mute_until > datetime.datetime.now():
-                    return mute_until
-            except ValueError:
-                pass
-        
-        return None
\ No newline at end of file
+    mute_until_raw = await moderation_cache.mute_until(user_id)
+
+    if mute_until_raw:
+        try:
+            mute_until = datetime.datetime.fromisoformat(mute_until_raw)
+            if mute_until > datetime.datetime.now():
+                return mute_until
+        except ValueError:
+            pass
+
+    return None
+
+# Запросы, планы которых показывает /db_explain: имя -> (SQL, параметры)
+EXPLAIN_QUERIES = {
+    "user_stats_snapshot": (USER_STATS_SNAPSHOT_QUERY, {"user_id": 0, "season_id": 1}),
+    "game_stats_upsert": (GAME_STATS_UPSERT_QUERY, {
+        "season_id": 1, "user_id": 0, "game_type": "", "word_set_name": "", "played": 0, "correct": 0, "incorrect": 0, "best_time": None,
+    }),
+    "ranking": (RANKING_QUERY, {"season_id": 1}),
+    "ranking_page_scored": (RANKING_PAGE_SCORED_AFTER_QUERY, {
+        "name_filter": None, "limit": 11, "after_score": 10.0, "after_user_id": 0, "season_id": 1,
+    }),
+    "ranking_page_zero": (RANKING_PAGE_ZERO_AFTER_QUERY, {"name_filter": None, "limit": 11, "after_user_id": 0, "season_id": 1}),
+    "leaderboard_rebuild": (LEADERBOARD_REBUILD_QUERY, {"season_id": 1}),
+    "season_rollup_tests": (SEASON_ROLLUP_TESTS_QUERY, {"season_id": 1}),
+    "season_rollup_games": (SEASON_ROLLUP_GAMES_QUERY, {"season_id": 1}),
+}
+
+async def explain_query_plans() -> Dict[str, list[str]]:
+    """EXPLAIN QUERY PLAN для запросов из EXPLAIN_QUERIES. Строки с "SCAN" без индекса означают полный проход по таблице."""
+    plans = {}
+    async with db_pool.reader() as db:
+        # EXPLAIN не начинает транзакцию и не проверяет версию схемы - обычный запрос перечитывает схему после миграций
+        await (await db.execute("SELECT COUNT(*) FROM sqlite_master")).close()
+        for name, (query, params) in EXPLAIN_QUERIES.items():
+            cursor = await db.execute(f"EXPLAIN QUERY PLAN {query}", params)
+            rows = await cursor.fetchall()
+            plans[name] = [row['detail'] for row in rows]
+    return plans
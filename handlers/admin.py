@@ -1,23 +1,29 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery, BufferedInputFile # Import BufferedInputFile
+from aiogram.types import Message, CallbackQuery, BufferedInputFile, FSInputFile # Import BufferedInputFile
 from aiogram.filters import Command
-from config import ADMIN_IDS
-from utils.utils import add_word, get_words_alphabetical, delete_word
-from utils.data_manager import calculate_overall_score_and_rank
+import config # Изменения из /settings применяются к модулю config без перезапуска
+from config import ADMIN_IDS, ADMIN_STATS_PAGE_SIZE, TELEGRAM_MAX_MESSAGE_LENGTH, WORD_IMPORT_PROGRESS_INTERVAL_SECONDS
+from utils.utils import add_word, get_words_alphabetical, delete_word, QUIZ_DIFFICULTY_NORMAL, QUIZ_DIFFICULTY_HARD
 from utils.word_manager import word_manager
+from utils.word_set_watcher import word_set_watcher
+from utils.word_import import SUPPORTED_FORMATS, detect_format, import_words
 import datetime
 from utils.audio_converter import convert_single_ogg_to_mp3, check_for_similar_audio_file, convert_all_ogg_to_mp3 # Импорт для админской команды конвертации
-from database import delete_user_from_db, get_all_users, get_game_stats_by_word_set, reset_all_user_statistics, mute_user, unmute_user # Импорт get_all_users и get_game_stats_by_word_set
+from database import delete_user_from_db, get_all_users, reset_all_user_statistics, mute_user, unmute_user # Импорт get_all_users
+from database import get_db_performance_report, checkpoint_wal, explain_query_plans
+from database import get_ranking_page, iter_ranking_pages, get_game_stats_by_word_set_for_users
 import html # Import the html module for escaping
 import re # Add this import
 import json # Add this import for json.loads
 import logging # Add this import for logging
 import asyncio # Add this import for asyncio.sleep
+import time # Интервал между обновлениями прогресса импорта
 
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.context import FSMContext
 from aiogram import Bot # Импорт Bot для загрузки файлов
 import os # Импорт os для работы с файловой системой
+import aiofiles # Асинхронная запись отчетов на диск
 import uuid # Импорт uuid для генерации уникальных имен файлов
 from keyboards import cancel_keyboard_for_filename, confirm_broadcast_keyboard # Импорт клавиатуры для отмены
 from keyboards import main_menu_keyboard # Импорт клавиатуры для отмены
@@ -41,6 +47,7 @@ class AdminStates(StatesGroup):
     waiting_for_content = State() # New state for waiting for content to broadcast
     waiting_for_content_confirmation = State() # New state for confirming content broadcast
     waiting_for_admin_action = State()
+    waiting_for_import_document = State() # Ожидание файла для /import_words
 
 GAME_NAME_TRANSLATIONS = {
     "guess_word": "Угадай слово (по аудио)",
@@ -53,7 +60,7 @@ GAME_NAME_TRANSLATIONS = {
 
 router = Router()
 
-# Dictionary to hold configurable settings and their types
+# Dictionary to hold configurable settings and their types ("choices" - допустимые значения, если их немного)
 CONFIGURABLE_SETTINGS = {
     "TEST_QUESTIONS_COUNT": {"type": int, "description": "Количество вопросов в тесте"},
     "ADMIN_IDS": {"type": list, "description": "Список ID администраторов"},
@@ -61,6 +68,8 @@ CONFIGURABLE_SETTINGS = {
     "MAX_USER_WORDS": {"type": int, "description": "Максимальное количество слов в пользовательском словаре"},
     "CHECK_NEW_AUDIO": {"type": bool, "description": "Проверять наличие новых аудио в папке /sounds/mp3 и уведомлять админа"},
     "DEFAULT_WORD_SET": {"type": str, "description": "Словарь по умолчанию при первом запуске или отсутствии активного"},
+    "QUIZ_DIFFICULTY": {"type": str, "choices": (QUIZ_DIFFICULTY_NORMAL, QUIZ_DIFFICULTY_HARD),
+                        "description": "Варианты ответа: normal - случайные, hard - похожие на правильный перевод"},
     "AUTO_RESET_STATS_MONTHLY": {"type": bool, "description": "Автоматически сбрасывать статистику пользователей 1 числа каждого месяца"},
 }
 
@@ -189,6 +198,134 @@ async def del_word(message: Message):
     else:
         await message.reply(f"Слово \'{word_to_delete_en}\' не найдено в файле \'{target_filename}\' (ваш текущий словарь).")
 
+def _stats_report_header(target_class: str | None) -> str:
+    if target_class:
+        header = f"<b>Статистика пользователей класса {target_class} (по рейтингу):</b>\n"
+    else:
+        header = "<b>Общая статистика пользователей (по рейтингу):</b>\n"
+    # Отчет читает снимок БД (analytics_snapshot), который обновляется не чаще раза в ANALYTICS_SNAPSHOT_INTERVAL_SECONDS
+    if config.ANALYTICS_SNAPSHOT_ENABLED:
+        header += f"<i>Данные из снимка базы, могут отставать до {config.ANALYTICS_SNAPSHOT_INTERVAL_SECONDS / 60:g} мин.</i>\n"
+    return header + "\n"
+
+
+def _format_user_stats_entry(user_entry: dict, game_stats_by_set: dict) -> str:
+    """Блок отчета /stats для одного пользователя (HTML)."""
+    user_id = user_entry['user_id']
+    rank = user_entry['rank']
+    overall_score = user_entry['overall_score']
+
+    # Get detailed stats with default values
+    total_correct_answers = user_entry.get('total_correct_answers', 0) or 0
+    best_test_score = user_entry.get('best_test_score', 0) or 0
+    last_activity_date_str = user_entry.get('last_activity_date', 'N/A') or 'N/A'
+
+    # Total game correct for OKPO (computed by the ranking query)
+    total_game_correct = user_entry.get('total_game_correct', 0) or 0
+
+    # Calculate OKPO
+    overall_correct_answers = total_correct_answers + total_game_correct
+
+    # Format last activity date
+    formatted_last_activity = last_activity_date_str
+    if last_activity_date_str != 'N/A':
+        try:
+            dt_object = datetime.datetime.fromisoformat(last_activity_date_str)
+            formatted_last_activity = dt_object.strftime("%d.%m.%y в %H:%M")
+        except ValueError:
+            pass # Keep as 'N/A' or original string if parsing fails
+
+    # Determine display name for the user, prioritizing Telegram full name, then username, then bot-registered name, then "No name"
+    # Use the helper function to get the display name
+    display_name_for_link = _get_display_name(
+        user_entry.get('first_name'),
+        user_entry.get('last_name'),
+        user_entry.get('username'),
+        user_entry.get('registered_name') # Correctly use registered_name
+    )
+    escaped_username_for_display = html.escape(str(user_entry.get('username', '') or ''))
+    username_display_text = f" (@{escaped_username_for_display})" if escaped_username_for_display else " (No username)"
+
+    # Create a user profile link (HTML format)
+    user_link = f"<a href=\"tg://user?id={user_id}\">{display_name_for_link}</a>"
+
+    entry_text = f"<b>Ранг: {rank}</b> - {user_link}{username_display_text} (Балл: <b>{overall_score:.2f}</b>)\n"
+    entry_text += f"  - ОКПО: <b>{overall_correct_answers}</b> | Тест: <b>{best_test_score}</b> | ПА: <b>{formatted_last_activity}</b>\n"
+
+    # Display game stats by word set
+    if game_stats_by_set:
+        entry_text += "  <b>Статистика по словарям:</b>\n"
+        for word_set, games in game_stats_by_set.items():
+            entry_text += f"    └ 📁 `{html.escape(word_set)}`:\n"
+            for game_type, stats in games.items():
+                correct = stats.get('correct', 0)
+                played = stats.get('played', 0)
+                incorrect = stats.get('incorrect', 0)
+                best_time_str = f" ({stats['best_time']:.2f}с)" if stats['best_time'] and stats['best_time'] != float('inf') else ""
+
+                # Применяем перевод названия игры
+                translated_game_name = GAME_NAME_TRANSLATIONS.get(game_type, game_type.replace('_', ' ').title())
+
+                entry_text += f"      • {translated_game_name}: Всего: {played}, Верно: {correct}, Неверно: {incorrect}{best_time_str}\n"
+    entry_text += "\n" # Add a newline for better spacing between users
+    return entry_text
+
+
+async def _iter_stats_report_chunks(target_class: str | None, max_length: int = TELEGRAM_MAX_MESSAGE_LENGTH):
+    """Отчет /stats по всем пользователям как поток фрагментов не длиннее max_length.
+
+    Рейтинг читается из снимка analytics_snapshot порциями (keyset), статистика игр - одним запросом на порцию,
+    поэтому в памяти одновременно находится только одна порция и один фрагмент.
+    """
+    name_filter = f" {target_class}" if target_class else None
+    chunk = _stats_report_header(target_class)
+    async for rows in iter_ranking_pages(name_filter=name_filter, from_snapshot=True):
+        game_stats_by_user = await get_game_stats_by_word_set_for_users([row['user_id'] for row in rows], from_snapshot=True)
+        for user_entry in rows:
+            entry_text = _format_user_stats_entry(user_entry, game_stats_by_user.get(user_entry['user_id'], {}))
+            if len(chunk) + len(entry_text) > max_length and chunk:
+                yield chunk
+                chunk = ""
+            chunk += entry_text
+    if chunk:
+        yield chunk
+
+
+def _stats_page_callback(direction: str, user_entry: dict, target_class: str | None) -> str:
+    return f"stats_page:{direction}:{user_entry['overall_score']!r}:{user_entry['user_id']}:{target_class or ''}"
+
+
+async def _render_stats_page(target_class: str | None, after: tuple[float, int] | None = None,
+                             before: tuple[float, int] | None = None) -> tuple[str | None, InlineKeyboardMarkup | None]:
+    """Одна страница отчета /stats и клавиатура листания. Страницы запрашиваются из снимка БД по ключу соседней страницы."""
+    name_filter = f" {target_class}" if target_class else None
+    page = await get_ranking_page(ADMIN_STATS_PAGE_SIZE, after=after, before=before, name_filter=name_filter, from_snapshot=True)
+    rows = page["rows"]
+    if not rows:
+        return None, None
+
+    game_stats_by_user = await get_game_stats_by_word_set_for_users([row['user_id'] for row in rows], from_snapshot=True)
+    stats_text = _stats_report_header(target_class)
+    shown_rows = []
+    for user_entry in rows:
+        entry_text = _format_user_stats_entry(user_entry, game_stats_by_user.get(user_entry['user_id'], {}))
+        # Если страница не помещается в одно сообщение, остаток уходит на следующую страницу
+        if shown_rows and len(stats_text) + len(entry_text) > TELEGRAM_MAX_MESSAGE_LENGTH:
+            break
+        stats_text += entry_text
+        shown_rows.append(user_entry)
+    has_next = page["has_next"] or len(shown_rows) < len(rows)
+
+    navigation_buttons = []
+    if page["has_prev"]:
+        navigation_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=_stats_page_callback("prev", shown_rows[0], target_class)))
+    if has_next:
+        navigation_buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=_stats_page_callback("next", shown_rows[-1], target_class)))
+    inline_keyboard = [navigation_buttons] if navigation_buttons else []
+    inline_keyboard.append([InlineKeyboardButton(text="📥 Скачать файлом", callback_data=f"stats_file:{target_class or ''}")])
+    return stats_text, InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
+
+
 @router.message(Command("stats"))
 async def show_all_user_stats(message: Message):
     if message.from_user.id not in ADMIN_IDS:
@@ -206,93 +343,60 @@ async def show_all_user_stats(message: Message):
             await message.reply("Неверный формат команды. Используйте: `/stats` или `/stats class=2в`", parse_mode="Markdown")
             return
 
-    ranked_users = await calculate_overall_score_and_rank()
+    stats_text, keyboard = await _render_stats_page(target_class)
 
-    if not ranked_users:
-        await message.reply("Статистика по пользователям пока отсутствует.")
-        return
-
-    filtered_users = []
-    for user_entry in ranked_users:
+    if stats_text is None:
         if target_class:
-            # Check if user's registered_name contains the class name (e.g., "Иван 2В")
-            if user_entry.get('registered_name') and f" {target_class}" in user_entry['registered_name'].upper():
-                filtered_users.append(user_entry)
+            await message.reply(f"Статистика для класса `{target_class}` не найдена.", parse_mode="Markdown")
         else:
-            filtered_users.append(user_entry)
+            await message.reply("Статистика по пользователям пока отсутствует.")
+        return
 
-    if not filtered_users and target_class:
-        await message.reply(f"Статистика для класса `{target_class}` не найдена.", parse_mode="Markdown")
+    await message.reply(stats_text, parse_mode="HTML", reply_markup=keyboard)
+
+@router.callback_query(F.data.startswith("stats_page:"))
+async def stats_page_callback(callback: CallbackQuery):
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("У вас нет прав для выполнения этой команды.", show_alert=True)
         return
 
-    stats_text = "<b>Общая статистика пользователей (по рейтингу):</b>\n\n"
-    if target_class:
-        stats_text = f"<b>Статистика пользователей класса {target_class} (по рейтингу):</b>\n\n"
-
-    for user_entry in filtered_users:
-        user_id = user_entry['user_id']
-        rank = user_entry['rank']
-        overall_score = user_entry['overall_score']
-
-        # Get detailed stats with default values
-        total_correct_answers = user_entry.get('total_correct_answers', 0) or 0
-        best_test_score = user_entry.get('best_test_score', 0) or 0
-        last_activity_date_str = user_entry.get('last_activity_date', 'N/A') or 'N/A'
-
-        # Calculate total game correct for OKPO
-        total_game_correct = 0
-        if 'games_stats' in user_entry:
-            for game_type, game_data in user_entry['games_stats'].items():
-                total_game_correct += game_data.get('correct', 0)
-        
-        # Calculate OKPO
-        overall_correct_answers = total_correct_answers + total_game_correct
+    _, direction, score, user_id, target_class = callback.data.split(":", 4)
+    key = (float(score), int(user_id))
+    stats_text, keyboard = await _render_stats_page(
+        target_class or None,
+        after=key if direction == "next" else None,
+        before=key if direction == "prev" else None,
+    )
+    if stats_text is None:
+        await callback.answer("Больше пользователей нет.")
+        return
 
-        # Format last activity date
-        formatted_last_activity = last_activity_date_str
-        if last_activity_date_str != 'N/A':
-            try:
-                dt_object = datetime.datetime.fromisoformat(last_activity_date_str)
-                formatted_last_activity = dt_object.strftime("%d.%m.%y в %H:%M")
-            except ValueError:
-                pass # Keep as 'N/A' or original string if parsing fails
+    await callback.message.edit_text(stats_text, parse_mode="HTML", reply_markup=keyboard)
+    await callback.answer()
 
-        # Determine display name for the user, prioritizing Telegram full name, then username, then bot-registered name, then "No name"
-        # Use the helper function to get the display name
-        display_name_for_link = _get_display_name(
-            user_entry.get('first_name'),
-            user_entry.get('last_name'),
-            user_entry.get('username'),
-            user_entry.get('registered_name') # Correctly use registered_name
-        )
-        escaped_username_for_display = html.escape(str(user_entry.get('username', '') or ''))
-        username_display_text = f" (@{escaped_username_for_display})" if escaped_username_for_display else " (No username)"
+@router.callback_query(F.data.startswith("stats_file:"))
+async def stats_file_callback(callback: CallbackQuery):
+    if callback.from_user.id not in ADMIN_IDS:
+        await callback.answer("У вас нет прав для выполнения этой команды.", show_alert=True)
+        return
 
-        # Create a user profile link (HTML format)
-        user_link = f"<a href=\"tg://user?id={user_id}\">{display_name_for_link}</a>"
+    await callback.answer("Готовлю файл...")
+    target_class = callback.data.split(":", 1)[1] or None
 
-        stats_text += f"<b>Ранг: {rank}</b> - {user_link}{username_display_text} (Балл: <b>{overall_score:.2f}</b>)\n"
-        stats_text += f"  - ОКПО: <b>{overall_correct_answers}</b> | Тест: <b>{best_test_score}</b> | ПА: <b>{formatted_last_activity}</b>\n"
-
-        # Get and display game stats by word set
-        game_stats_by_set = await get_game_stats_by_word_set(user_id)
-        if game_stats_by_set:
-            stats_text += "  <b>Статистика по словарям:</b>\n"
-            for word_set, games in game_stats_by_set.items():
-                stats_text += f"    └ 📁 `{html.escape(word_set)}`:\n"
-                for game_type, stats in games.items():
-                    correct = stats.get('correct', 0)
-                    played = stats.get('played', 0)
-                    incorrect = stats.get('incorrect', 0)
-                    best_time_str = f" ({stats['best_time']:.2f}с)" if stats['best_time'] and stats['best_time'] != float('inf') else ""
-                    
-                    # Применяем перевод названия игры
-                    translated_game_name = GAME_NAME_TRANSLATIONS.get(game_type, game_type.replace('_', ' ').title())
-                    
-                    stats_text += f"      • {translated_game_name}: Всего: {played}, Верно: {correct}, Неверно: {incorrect}{best_time_str}\n"
-        stats_text += "\n" # Add a newline for better spacing between users
+    # Отчет пишется на диск по мере чтения рейтинга и не собирается в памяти целиком
+    report_dir = os.path.join("data", "reports")
+    os.makedirs(report_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, f"stats_{uuid.uuid4().hex}.txt")
+    try:
+        async with aiofiles.open(report_path, "w", encoding="utf-8") as report_file:
+            async for chunk in _iter_stats_report_chunks(target_class):
+                await report_file.write(html.unescape(re.sub(r"<[^>]+>", "", chunk)))
 
-    await message.reply(stats_text, parse_mode="HTML")
+        filename = f"stats_{target_class}.txt" if target_class else "stats.txt"
+        await callback.message.answer_document(FSInputFile(report_path, filename=filename))
+    finally:
+        if os.path.exists(report_path):
+            os.remove(report_path)
 
 @router.message(Command("deluser"))
 async def del_user(message: Message):
@@ -312,6 +416,7 @@ async def del_user(message: Message):
         return
 
     db_deleted = await delete_user_from_db(user_id_to_delete)
+    word_manager.discard_user(user_id_to_delete)
     
     if db_deleted:
         await message.reply(f"Пользователь с ID {user_id_to_delete} успешно удален из базы данных.")
@@ -372,7 +477,7 @@ async def switch_word_file_for_all_users(message: Message):
         # Получаем display_name для каждого пользователя
         user_display_name = _get_display_name(user.get('first_name'), user.get('last_name'), user.get('username'), user.get('name'))
 
-        if word_manager.set_user_current_file(user_id, filename, user_display_name):
+        if await word_manager.set_user_current_file(user_id, filename, user_display_name):
             successful_switches += 1
         else:
             failed_switches += 1
@@ -396,7 +501,7 @@ async def create_word_file(message: Message):
         return
 
     filename = args[1].strip()
-    if word_manager.create_new_file(filename):
+    if await word_manager.create_new_file(filename):
         await message.reply(f"✅ Файл '{filename}' успешно создан.")
     else:
         await message.reply(f"❌ Не удалось создать файл '{filename}'. Возможно, файл уже существует.")
@@ -418,11 +523,35 @@ async def delete_word_file(message: Message):
         await message.reply("❌ Нельзя удалить основной файл 'all_words.json'.")
         return
 
-    if word_manager.delete_file(filename):
+    if await word_manager.delete_file(filename):
         await message.reply(f"✅ Файл '{filename}' успешно удален.")
     else:
         await message.reply(f"❌ Не удалось удалить файл '{filename}'. Файл не найден или это основной файл.")
 
+@router.message(Command("compile_words"))
+async def compile_words_command(message: Message):
+    """Строит компилированные версии словарей (/compile_words [имя_файла.json], без аргумента - все файлы)."""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.reply("У вас нет прав для выполнения этой команды.")
+        return
+
+    parts = message.text.split(maxsplit=1)
+    files = [parts[1].strip()] if len(parts) > 1 else word_manager.get_available_files()
+    if not files:
+        await message.reply("Файлы со словами не найдены.")
+        return
+
+    lines = []
+    for filename in files:
+        try:
+            count = await asyncio.to_thread(word_manager.compile_file, filename)
+            lines.append(f"✅ <code>{html.escape(filename)}</code>: {count} слов")
+        except FileNotFoundError:
+            lines.append(f"❌ <code>{html.escape(filename)}</code>: файл не найден")
+        except (ValueError, json.JSONDecodeError) as e:
+            lines.append(f"⚠️ <code>{html.escape(filename)}</code>: не скомпилирован ({html.escape(str(e))})")
+    await message.reply("<b>Компиляция словарей:</b>\n" + "\n".join(lines), parse_mode="HTML")
+
 @router.message(Command("deduplicate_words"))
 async def deduplicate_words_command(message: Message):
     if message.from_user.id not in ADMIN_IDS:
@@ -445,7 +574,7 @@ async def deduplicate_words_command(message: Message):
             return
         
         for filename in files:
-            duplicates_removed = word_manager.remove_duplicates_from_file(filename)
+            duplicates_removed = await word_manager.remove_duplicates_from_file_async(filename)
             if duplicates_removed > 0:
                 total_duplicates_removed += duplicates_removed
                 await message.reply(f"✅ Удалено {duplicates_removed} дубликатов из файла `{filename}`.", parse_mode="Markdown")
@@ -466,7 +595,7 @@ async def deduplicate_words_command(message: Message):
             return
 
         await message.reply(f"Начинаю удаление дубликатов из файла `{filename_to_process}`...")
-        duplicates_removed = word_manager.remove_duplicates_from_file(filename_to_process)
+        duplicates_removed = await word_manager.remove_duplicates_from_file_async(filename_to_process)
 
         if duplicates_removed > 0:
             await message.reply(f"✅ Удалено {duplicates_removed} дубликатов из файла `{filename_to_process}`.", parse_mode="Markdown")
@@ -476,6 +605,92 @@ async def deduplicate_words_command(message: Message):
         await message.reply("Неверный формат команды. Используйте: `/deduplicate_words [имя_файла.json]` для обработки конкретного файла, `/deduplicate_words all` для обработки всех файлов или `/deduplicate_words` для обработки файла по умолчанию.", parse_mode="Markdown")
 
 
+def _format_import_report(report: dict) -> str:
+    return (f"прочитано строк: {report['lines']}, новых слов: {report['added']}, дубликатов: {report['duplicates']}, "
+            f"ошибочных строк: {report['invalid']}, запрещенных слов: {report['bad_words']}")
+
+@router.message(Command("import_words"))
+async def import_words_command(message: Message, state: FSMContext):
+    """Массовое добавление слов из CSV/TSV/JSONL: /import_words имя_файла.json, затем сам файл документом."""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.reply("У вас нет прав для выполнения этой команды.")
+        return
+
+    parts = message.text.split(maxsplit=1)
+    if len(parts) < 2 or not parts[1].strip().endswith(".json"):
+        await message.reply("Используйте формат: <code>/import_words имя_файла.json</code>", parse_mode="HTML")
+        return
+    filename = parts[1].strip()
+    if not word_manager.get_file_info(filename):
+        await message.reply(f"❌ Файл <code>{html.escape(filename)}</code> не найден. Используйте /files для просмотра доступных файлов.", parse_mode="HTML")
+        return
+
+    await state.set_state(AdminStates.waiting_for_import_document)
+    await state.update_data(import_filename=filename)
+    await message.reply(
+        f"Отправьте файл со словами для <code>{html.escape(filename)}</code> документом ({', '.join(SUPPORTED_FORMATS)}).\n"
+        "CSV/TSV: две колонки - английское слово и перевод. JSONL: по объекту <code>{\"en\": ..., \"ru\": ...}</code> в строке.",
+        parse_mode="HTML",
+        reply_markup=cancel_keyboard
+    )
+
+@router.message(AdminStates.waiting_for_import_document, F.document)
+async def process_import_document(message: Message, state: FSMContext, bot: Bot):
+    if message.from_user.id not in ADMIN_IDS:
+        await message.reply("У вас нет прав для выполнения этой команды.")
+        await state.clear()
+        return
+
+    file_format = detect_format(message.document.file_name)
+    if file_format is None:
+        await message.reply(f"Неподдерживаемый формат файла. Отправьте файл {', '.join(SUPPORTED_FORMATS)}.", reply_markup=cancel_keyboard)
+        return
+    filename = (await state.get_data()).get("import_filename")
+    await state.clear()
+
+    # Файл скачивается на диск по частям и читается построчно - целиком в память он не загружается
+    temp_import_dir = os.path.join("data", "temp_import")
+    os.makedirs(temp_import_dir, exist_ok=True)
+    temp_path = os.path.join(temp_import_dir, f"{uuid.uuid4().hex}{file_format}")
+    progress_message = await message.reply(f"Импорт в <code>{html.escape(filename)}</code>: загружаю файл...", parse_mode="HTML")
+    last_progress = time.monotonic()
+
+    async def report_progress(report: dict):
+        nonlocal last_progress
+        if time.monotonic() - last_progress < WORD_IMPORT_PROGRESS_INTERVAL_SECONDS:
+            return
+        last_progress = time.monotonic()
+        try:
+            await progress_message.edit_text(f"Импорт в <code>{html.escape(filename)}</code>: {_format_import_report(report)}...", parse_mode="HTML")
+        except Exception as e:
+            logging.warning(f"Не удалось обновить прогресс импорта: {e}")
+
+    try:
+        file = await bot.get_file(message.document.file_id)
+        await bot.download_file(file.file_path, temp_path)
+        report = await import_words(word_manager, filename, temp_path, file_format, progress=report_progress)
+    except Exception as e:
+        logging.error(f"Ошибка импорта слов в {filename}: {e}")
+        await message.reply(f"❌ Ошибка импорта: {html.escape(str(e))}", parse_mode="HTML", reply_markup=main_menu_keyboard)
+        return
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    if not report['saved']:
+        result_text = f"❌ Не удалось записать файл <code>{html.escape(filename)}</code>, слова не добавлены.\n"
+    else:
+        result_text = f"✅ Импорт в <code>{html.escape(filename)}</code> завершен.\n"
+    result_text += _format_import_report(report).capitalize()
+    if report['errors']:
+        result_text += "\n\nПримеры ошибок:\n" + "\n".join(html.escape(error) for error in report['errors'])
+    await message.reply(result_text, parse_mode="HTML", reply_markup=main_menu_keyboard)
+
+@router.message(AdminStates.waiting_for_import_document)
+async def process_invalid_import_document(message: Message):
+    await message.reply(f"Пожалуйста, отправьте файл документом ({', '.join(SUPPORTED_FORMATS)}) или нажмите «Отмена».", reply_markup=cancel_keyboard)
+
+
 @router.message(Command("current_files"))
 async def show_all_users_current_files(message: Message):
     """Показывает текущие активные файлы со словами для всех пользователей."""
@@ -485,7 +700,7 @@ async def show_all_users_current_files(message: Message):
 
     await message.reply("Собираю информацию о текущих файлах всех пользователей... Это может занять некоторое время.", parse_mode="Markdown")
 
-    all_users = await get_all_users()
+    all_users = await get_all_users(from_snapshot=True)
     if not all_users:
         await message.reply("В базе данных нет зарегистрированных пользователей.")
         return
@@ -660,7 +875,7 @@ async def list_all_users(message: Message):
         await message.reply("У вас нет прав для выполнения этой команды.")
         return
     
-    users = await get_all_users()
+    users = await get_all_users(from_snapshot=True)
     
     if not users:
         await message.reply("В базе данных нет зарегистрированных пользователей.")
@@ -1263,6 +1478,16 @@ async def process_new_setting_value(message: Message, state: FSMContext):
             new_value = new_value_str.lower() == "true"
         else:
             new_value = new_value_str.strip('"') # Treat as string
+
+        choices = setting_info.get("choices")
+        if choices and new_value not in choices:
+            await message.reply(
+                f"❌ Неверное значение для *{selected_setting}*. Допустимые значения: "
+                + ", ".join(f"`{choice}`" for choice in choices) + ".",
+                parse_mode="Markdown",
+                reply_markup=cancel_keyboard
+            )
+            return # Do not clear state, allow re-entry
         
         # Now, update the config.py file
         await update_config_file(selected_setting, new_value)
@@ -1341,6 +1566,8 @@ async def update_config_file(setting_name: str, new_value: any):
 
     with open(filepath, "w", encoding="utf-8") as f:
         f.writelines(new_file_content_lines)
+    # Обработчики, читающие config.<НАСТРОЙКА> при каждом вызове, получают новое значение сразу
+    setattr(config, setting_name, new_value)
 
 
 # Handler for invalid text input during settings selection
@@ -1701,7 +1928,7 @@ async def reset_all_stats_command(message: Message, state: FSMContext):
         await message.reply("У вас нет прав для выполнения этой команды.")
         return
 
-    await message.reply("Вы уверены, что хотите сбросить всю статистику ВСЕХ пользователей (рейтинги, очки, результаты тестов и игр)? Это действие необратимо.", reply_markup=confirm_broadcast_keyboard) # Переиспользуем клавиатуру подтверждения
+    await message.reply("Вы уверены, что хотите сбросить всю статистику ВСЕХ пользователей (рейтинги, очки, результаты тестов и игр)? Начнется новый сезон: рейтинг начнется с нуля, итоги прошлого сезона сохранятся в архиве.", reply_markup=confirm_broadcast_keyboard) # Переиспользуем клавиатуру подтверждения
     await state.set_state(AdminStates.waiting_for_admin_action)
 
 @router.message(AdminStates.waiting_for_admin_action, F.text == "Да, отправить")
@@ -1776,3 +2003,96 @@ async def unmute_user_command(message: Message):
         await message.reply(f"Пользователь {user_id} разглушен.")
     else:
         await message.reply(f"Не удалось разглушить пользователя {user_id}.")
+
+@router.message(Command("db_stats"))
+async def db_stats_command(message: Message):
+    """Показывает профиль SQLite, размер WAL и статистику чекпоинтов. /db_stats checkpoint - выполнить чекпоинт сейчас."""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.reply("У вас нет прав для выполнения этой команды.")
+        return
+
+    args = message.text.split(maxsplit=1)
+    if len(args) > 1 and args[1].strip().lower() == "checkpoint":
+        await checkpoint_wal("TRUNCATE")
+
+    report = await get_db_performance_report()
+    checkpoints = report['checkpoints']
+
+    stats_text = "<b>🗄 База данных:</b>\n\n"
+    stats_text += f"Профиль: <code>{html.escape(str(report['profile']))}</code>\n"
+    stats_text += f"Режим журнала: <code>{html.escape(str(report['journal_mode']))}</code>\n"
+    stats_text += f"Версия схемы: <code>{report['schema_version']}</code>\n"
+    stats_text += f"Сезон статистики: <code>{report['season_id']}</code>\n"
+    stats_text += "PRAGMA: " + ", ".join(f"<code>{html.escape(str(k))}={html.escape(str(v))}</code>" for k, v in report['pragmas'].items()) + "\n"
+    stats_text += f"Размер WAL: <b>{report['wal_size_bytes'] / 1024:.1f} КиБ</b>\n"
+    stats_text += f"Без записей: {report['idle_seconds']:.0f} сек.\n\n"
+
+    game_stats_buffer = report['game_stats_buffer']
+    stats_text += "<b>Буфер ответов в играх:</b>\n"
+    stats_text += f"Ответов: {game_stats_buffer['events']}, записей буфера: {game_stats_buffer['flushes']}, строк записано: {game_stats_buffer['rows_written']}\n"
+    stats_text += f"Ожидают записи: {game_stats_buffer['pending_rows']} строк\n"
+    if game_stats_buffer['last_flush_ms'] is not None:
+        stats_text += f"Последняя запись: {game_stats_buffer['last_flush_ms']:.1f} мс\n"
+    activity = report['activity_tracker']
+    stats_text += f"Отметок активности: {activity['touches']}, записано строк: {activity['rows_written']} за {activity['flushes']} записей\n"
+    user_stats = report['user_stats_cache']
+    stats_text += f"Кэш статистики: {user_stats['size']} снимков, попаданий {user_stats['hits']}, промахов {user_stats['misses']}, сбросов {user_stats['invalidations']}\n"
+    answer_events = report['answer_event_log']
+    stats_text += f"Журнал ответов: событий {answer_events['events']}, записано {answer_events['rows_written']} за {answer_events['batches']} пачек, в очереди {answer_events['queued']}, отброшено {answer_events['dropped']}, ошибок {answer_events['failed']}\n"
+    snapshot = report['analytics_snapshot']
+    if snapshot['enabled']:
+        snapshot_time = snapshot['refreshed_at'] or "еще не создан"
+        stats_text += f"Снимок для отчетов: {html.escape(str(snapshot_time))}, обновлений {snapshot['refreshes']}, ошибок {snapshot['failures']}"
+        if snapshot['last_ms'] is not None:
+            stats_text += f", последнее {snapshot['last_ms']:.1f} мс, {snapshot['size_bytes'] / 1024:.1f} КиБ"
+        stats_text += "\n"
+    word_sets = word_manager.word_set_cache.get_stats()
+    hit_rate = f"{word_sets['hit_rate'] * 100:.1f}%" if word_sets['hit_rate'] is not None else "—"
+    stats_text += f"Кэш словарей: {word_sets['entries']} файлов, {word_sets['words']} слов, попаданий {hit_rate}, загрузок {word_sets['loads']} ({word_sets['load_ms_total']:.1f} мс всего)\n"
+    word_writes = word_manager.write_stats
+    stats_text += f"Запись словарей: правок {word_writes['edits']}, записей файлов {word_writes['writes']}, ошибок {word_writes['failures']}\n"
+    watch = word_set_watcher.stats
+    last_reload = f"{watch['last_reload_ms']:.1f} мс" if watch['last_reload_ms'] is not None else "—"
+    last_lag = f"{watch['last_lag_ms']:.0f} мс" if watch['last_lag_ms'] is not None else "—"
+    stats_text += (f"Слежение за словарями: добавлено {watch['added']}, изменено {watch['changed']}, удалено {watch['deleted']}, "
+                   f"обновление {last_reload} (макс. {watch['max_reload_ms']:.1f} мс), задержка {last_lag} (макс. {watch['max_lag_ms']:.0f} мс), ошибок {watch['errors']}\n")
+    moderation = report['moderation_cache']
+    stats_text += (f"Кэш блокировок: проверок бана {moderation['ban_checks']} (заблокировано {moderation['banned']}), "
+                   f"проверок mute {moderation['mute_checks']} (с mute {moderation['muted']}), загрузок из БД {moderation['db_loads']}\n")
+    stats_text += "\n"
+
+    stats_text += "<b>Чекпоинты WAL:</b>\n"
+    if checkpoints['count']:
+        average_ms = checkpoints['total_ms'] / checkpoints['count']
+        stats_text += f"Выполнено: {checkpoints['count']} (в среднем {average_ms:.1f} мс)\n"
+        stats_text += f"Последний: {html.escape(str(checkpoints['last_at']))}, {checkpoints['last_mode']}, {checkpoints['last_ms']:.1f} мс\n"
+        stats_text += f"WAL до/после: {checkpoints['wal_bytes_before']} / {checkpoints['wal_bytes_after']} байт\n"
+        stats_text += f"Результат (busy, log, checkpointed): <code>{html.escape(str(checkpoints['last_result']))}</code>\n"
+    else:
+        stats_text += "Еще не выполнялись.\n"
+
+    await message.reply(stats_text, parse_mode="HTML")
+
+
+@router.message(Command("db_explain"))
+async def db_explain_command(message: Message):
+    """Показывает EXPLAIN QUERY PLAN для основных запросов database.py."""
+    if message.from_user.id not in ADMIN_IDS:
+        await message.reply("У вас нет прав для выполнения этой команды.")
+        return
+
+    plans = await explain_query_plans()
+
+    chunks = []
+    current_chunk = "<b>🔎 Планы запросов:</b>\n\n"
+    for name, details in plans.items():
+        block = f"<b>{html.escape(name)}</b>\n<code>{html.escape(chr(10).join(details))}</code>\n\n"
+        if len(current_chunk) + len(block) > 4000:
+            chunks.append(current_chunk)
+            current_chunk = ""
+        current_chunk += block
+    if current_chunk:
+        chunks.append(current_chunk)
+
+    for chunk in chunks:
+        await message.reply(chunk, parse_mode="HTML")
@@ -9,7 +9,7 @@ from utils.utils import get_random_word, shuffle_word, get_quiz_options
 import uuid
 from database import update_last_active
 from keyboards import games_menu_keyboard, main_menu_keyboard, quiz_options_keyboard, start_recall_typing_keyboard
-from utils.data_manager import update_game_stats
+from utils.data_manager import update_game_stats, record_answer_event
 import datetime
 from handlers.stats import show_statistics_handler # Import the function for unified stats display
 import asyncio
@@ -17,6 +17,7 @@ from config import RECALL_TYPING_COUNTDOWN_SECONDS # Import countdown seconds
 from utils.audio_cleanup import cleanup_guess_audio
 from aiogram import Bot # Добавлено для явной передачи bot
 from utils.word_manager import word_manager # Импортируем word_manager
+import config # QUIZ_DIFFICULTY читается при каждом вопросе: его меняют через /settings
 from config import TEST_QUESTIONS_COUNT
 
 router = Router()
@@ -29,6 +30,16 @@ class Games(StatesGroup):
     quiz_recall_typing = State() # New state for 'Recall Typing' game
     quiz_guess_word = State() # New state for 'Guess the Word' game
 
+def _start_session_words(user_id: int) -> tuple[str, int]:
+    """Имя и версия текущего словаря пользователя для данных FSM (сами слова в FSM не копируются)."""
+    word_set_id = word_manager.get_user_current_file(user_id)
+    word_set_version, _ = word_manager.word_set_registry.current(word_set_id)
+    return word_set_id, word_set_version
+
+def _session_words(state_data: dict):
+    """Слова игры из общего реестра словарей по word_set_id/word_set_version из данных FSM."""
+    return word_manager.word_set_registry.get(state_data['word_set_id'], state_data['word_set_version'])
+
 @router.message(F.text == "🎮 Игры")
 async def cmd_games(message: Message, state: FSMContext):
     user_id = str(message.from_user.id)
@@ -39,15 +50,15 @@ async def cmd_games(message: Message, state: FSMContext):
 @router.message(F.text == "🎧 Угадай слово", Games.in_games_menu)
 async def start_guess_word_game(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    words = word_manager.load_words(user_id)
+    word_set_id, word_set_version = _start_session_words(user_id)
     await state.set_state(Games.quiz_guess_word)
-    await state.update_data(user_id=user_id, all_words=words)
+    await state.update_data(user_id=user_id, word_set_id=word_set_id, word_set_version=word_set_version)
     await message.answer("Прослушайте аудио и угадайте слово.")
     await send_guess_word_question(message, state)
 
 async def send_guess_word_question(message: Message, state: FSMContext):
     state_data = await state.get_data()
-    all_words = state_data['all_words']
+    all_words = _session_words(state_data)
     user_id = state_data['user_id'] # Get user_id from state
 
     words_with_audio = []
@@ -92,13 +103,14 @@ async def send_guess_word_question(message: Message, state: FSMContext):
     word = get_random_word(words_with_audio)
 
     # Build 3 distractors in Russian, 1 correct in Russian
-    options = get_quiz_options(word['ru'], all_words) # Use all_words for options to include missing audio words for distractors if needed
+    options = get_quiz_options(word['ru'], all_words, difficulty=config.QUIZ_DIFFICULTY, set_id=state_data['word_set_id']) # Use all_words for options to include missing audio words for distractors if needed
 
     # Save current word and options for later validation
     await state.update_data(
         current_guess_word_en=word['en'],
         current_guess_word_ru=word['ru'],
-        quiz_options=options
+        quiz_options=options,
+        question_sent_at=datetime.datetime.now().isoformat()
     )
 
     # Try to send audio for the word if exists via data_manager like in learn
@@ -152,7 +164,7 @@ async def process_guess_word_answer(callback: CallbackQuery, state: FSMContext):
             f"Слово по аудио: *{correct_english_word}*\nВаш ответ: *{chosen_answer}* - ✅ Верно!",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "guess_word", True, current_date, word_set_name=current_word_set)
     else:
         await callback.answer("Неверно.", show_alert=False)
@@ -160,8 +172,10 @@ async def process_guess_word_answer(callback: CallbackQuery, state: FSMContext):
             f"Слово по аудио: *{correct_english_word}*\nВаш ответ: *{chosen_answer}* - ❌ Неверно. Правильный ответ: *{correct_russian_word}*",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "guess_word", False, current_date, word_set_name=current_word_set)
+    await record_answer_event(user_id, correct_english_word, "guess_word", current_word_set, is_correct,
+                              state_data.get('question_sent_at'))
 
     await callback.message.answer(
         "Хотите еще раз сыграть?",
@@ -191,22 +205,23 @@ async def play_guess_word_again(callback: CallbackQuery, state: FSMContext, bot:
 @router.message(F.text == "🤔 Выбери перевод", Games.in_games_menu)
 async def start_choose_translation_quiz(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    words = word_manager.load_words(user_id)
+    word_set_id, word_set_version = _start_session_words(user_id)
     await state.set_state(Games.quiz_choose_translation)
-    await state.update_data(user_id=user_id, all_words=words)
+    await state.update_data(user_id=user_id, word_set_id=word_set_id, word_set_version=word_set_version)
     await message.answer("Выберите правильный перевод слова.")
     await send_choose_translation_question(message, state)
 
 async def send_choose_translation_question(message: Message, state: FSMContext):
     state_data = await state.get_data()
-    words = state_data['all_words']
+    words = _session_words(state_data)
     word = get_random_word(words)
-    options = get_quiz_options(word['ru'], words)
+    options = get_quiz_options(word['ru'], words, difficulty=config.QUIZ_DIFFICULTY, set_id=state_data['word_set_id'])
     
     await state.update_data(
         current_quiz_word_en=word['en'],
         current_quiz_word_ru=word['ru'],
-        quiz_options=options # Store options for later validation
+        quiz_options=options, # Store options for later validation
+        question_sent_at=datetime.datetime.now().isoformat()
     )
 
     await message.answer(
@@ -252,7 +267,7 @@ async def process_choose_translation_answer(callback: CallbackQuery, state: FSMC
             f"\nВаш ответ: *{chosen_answer}* - ✅ Верно!",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "choose_translation", True, current_date, word_set_name=current_word_set)
     else:
         await callback.answer("Неверно.", show_alert=False)
@@ -261,8 +276,10 @@ async def process_choose_translation_answer(callback: CallbackQuery, state: FSMC
             f"\nВаш ответ: *{chosen_answer}* - ❌ Неверно. Правильный ответ: *{correct_russian_word}*",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "choose_translation", False, current_date, word_set_name=current_word_set)
+    await record_answer_event(user_id, english_word, "choose_translation", current_word_set, is_correct,
+                              state_data.get('question_sent_at'))
     
     await callback.message.answer(
         "Хотите еще раз сыграть?",
@@ -284,9 +301,9 @@ async def play_choose_translation_again(callback: CallbackQuery, state: FSMConte
 @router.message(F.text == "🧩 Собери слово", Games.in_games_menu)
 async def start_build_word_quiz(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    words = word_manager.load_words(user_id)
+    word_set_id, word_set_version = _start_session_words(user_id)
     await state.set_state(Games.quiz_build_word)
-    await state.update_data(user_id=user_id, all_words=words)
+    await state.update_data(user_id=user_id, word_set_id=word_set_id, word_set_version=word_set_version)
     await message.answer(
         "Я покажу тебе перемешанные буквы. Собери из них английское слово. "
         "Введи слово полностью.",
@@ -297,9 +314,9 @@ async def start_build_word_quiz(message: Message, state: FSMContext):
 @router.message(F.text == "🔍 Найди букву", Games.in_games_menu)
 async def start_find_missing_letter_quiz(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    words = word_manager.load_words(user_id)
+    word_set_id, word_set_version = _start_session_words(user_id)
     await state.set_state(Games.quiz_find_missing_letter)
-    await state.update_data(user_id=user_id, all_words=words)
+    await state.update_data(user_id=user_id, word_set_id=word_set_id, word_set_version=word_set_version)
     await message.answer(
         "Я покажу тебе слово с пропущенной буквой. Выбери правильную букву.",
         reply_markup=main_menu_keyboard # Keep main menu visible
@@ -308,7 +325,7 @@ async def start_find_missing_letter_quiz(message: Message, state: FSMContext):
 
 async def send_find_missing_letter_question(message: Message, state: FSMContext):
     state_data = await state.get_data()
-    words = state_data['all_words']
+    words = _session_words(state_data)
     word_data = get_random_word(words)
     english_word = word_data['en']
     russian_translation = word_data['ru']
@@ -334,7 +351,8 @@ async def send_find_missing_letter_question(message: Message, state: FSMContext)
     await state.update_data(current_missing_word_en=english_word, 
                              current_missing_word_ru=russian_translation, 
                              correct_missing_letter=missing_letter,
-                             quiz_options=options # Store options for later validation
+                             quiz_options=options, # Store options for later validation
+                             question_sent_at=datetime.datetime.now().isoformat()
     )
 
     await message.answer(
@@ -351,11 +369,12 @@ async def send_find_missing_letter_question(message: Message, state: FSMContext)
 
 async def send_build_word_question(message: Message, state: FSMContext):
     state_data = await state.get_data()
-    words = state_data['all_words']
+    words = _session_words(state_data)
     word = get_random_word(words)
     shuffled = shuffle_word(word['en'])
     
-    await state.update_data(current_build_word_en=word['en'], current_build_word_ru=word['ru'])
+    await state.update_data(current_build_word_en=word['en'], current_build_word_ru=word['ru'],
+                            question_sent_at=datetime.datetime.now().isoformat())
     
     await message.answer(
         f"Перемешанные буквы: *{shuffled.lower()}*"
@@ -394,7 +413,7 @@ async def process_find_missing_letter_answer(callback: CallbackQuery, state: FSM
             f"\nВаш ответ: *{chosen_answer}* - ✅ Верно!",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "find_missing_letter", True, current_date, word_set_name=current_word_set)
     else:
         await callback.answer("Неверно.", show_alert=False)
@@ -403,8 +422,10 @@ async def process_find_missing_letter_answer(callback: CallbackQuery, state: FSM
             f"\nВаш ответ: *{chosen_answer}* - ❌ Неверно. Правильная буква: *{correct_missing_letter}*",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "find_missing_letter", False, current_date, word_set_name=current_word_set)
+    await record_answer_event(user_id, correct_english_word, "find_missing_letter", current_word_set, is_correct,
+                              state_data.get('question_sent_at'))
 
     await callback.message.answer(
         "Хотите еще раз сыграть?",
@@ -434,7 +455,7 @@ async def process_build_word_answer(message: Message, state: FSMContext):
             f"✅ Верно! Слово: *{correct_english_word.capitalize()}* (перевод: *{russian_translation}*)",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "build_word", True, current_date, word_set_name=current_word_set)
     else:
         await message.answer(
@@ -442,8 +463,10 @@ async def process_build_word_answer(message: Message, state: FSMContext):
             f"Правильный ответ: *{correct_english_word.capitalize()}* (перевод: *{russian_translation}*)",
             parse_mode="Markdown"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "build_word", False, current_date, word_set_name=current_word_set)
+    await record_answer_event(user_id, correct_english_word, "build_word", current_word_set, user_answer == correct_english_word,
+                              state_data.get('question_sent_at'))
     
     await message.answer(
         "Хотите сыграть еще раз?",
@@ -516,9 +539,9 @@ async def start_recall_typing_countdown(callback: CallbackQuery, state: FSMConte
 @router.message(F.text == "📝 Ввод по памяти", Games.in_games_menu)
 async def start_recall_typing_quiz(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    words = word_manager.load_words(user_id)
+    word_set_id, word_set_version = _start_session_words(user_id)
     await state.set_state(Games.quiz_recall_typing)
-    await state.update_data(user_id=user_id, all_words=words)
+    await state.update_data(user_id=user_id, word_set_id=word_set_id, word_set_version=word_set_version)
     await message.answer(
         "Я покажу вам слово с переводом, затем вы должны будете ввести его по памяти.\n\nНажмите 'Начать', когда будете готовы.",
         reply_markup=start_recall_typing_keyboard
@@ -526,7 +549,7 @@ async def start_recall_typing_quiz(message: Message, state: FSMContext):
 
 async def send_recall_typing_question(message: Message, state: FSMContext):
     state_data = await state.get_data()
-    words = state_data['all_words']
+    words = _session_words(state_data)
     word_data = get_random_word(words)
     english_word = word_data['en']
     russian_translation = word_data['ru']
@@ -580,15 +603,17 @@ async def process_recall_typing_answer(message: Message, state: FSMContext):
             f"✅ Верно! Слово: *{correct_english_word.capitalize()}* (перевод: *{russian_translation}*)\n"
             f"Время ответа: *{time_taken:.2f}* секунд."
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "recall_typing", True, current_date, time_taken=time_taken, word_set_name=current_word_set)
     else:
         feedback_text = (
             f"❌ Неверно. Правильное слово: *{correct_english_word.capitalize()}* (перевод: *{russian_translation}*)\n"
             f"Ваш ответ: *{user_answer}*"
         )
-        current_word_set = word_manager.get_user_current_file(int(user_id))
+        current_word_set = state_data['word_set_id'] # Словарь, из которого был вопрос
         await update_game_stats(int(user_id), "recall_typing", False, current_date, word_set_name=current_word_set)
+    await record_answer_event(user_id, correct_english_word, "recall_typing", current_word_set, is_correct,
+                              question_start_time_str)
     
     await message.answer(feedback_text, parse_mode="Markdown")
 
@@ -46,6 +46,8 @@ async def show_help(message: Message, state: FSMContext, bot: Bot):
             f"/add <code>{html.escape('[имя файла.json]')}</code> слово=перевод - добавить слово в указанный файл (по умолчанию ваш текущий)\n" +
             f"/del <code>{html.escape('[имя файла.json]')}</code> слово - удалить слово из указанного файла (по умолчанию ваш текущий)\n" +
             f"/deduplicate_words - удалить дубликаты слов во всех файлах словарей\n" +
+            f"/compile_words <code>{html.escape('[имя файла.json]')}</code> - построить быстрые компилированные версии словарей (по умолчанию всех)\n" +
+            f"/import_words <code>{html.escape('<имя файла.json>')}</code> - добавить слова из присланного файла CSV, TSV или JSONL\n" +
             "\n" +
             "<b>👥 Управление пользователями:</b>\n" +
             f"/users - показать список всех юзеров\n" +
@@ -60,6 +62,8 @@ async def show_help(message: Message, state: FSMContext, bot: Bot):
             f"/convert_all_audio - конвертация аудиофайлов в mp3\n" +
             f"/delete_audio_files - удалить аудиофайлы из папок\n" +
             f"/reset_all_stats - сбросить всю статистику пользователей\n" +
+            f"/db_stats <code>[checkpoint]</code> - состояние базы данных (WAL, чекпоинты)\n" +
+            f"/db_explain - планы выполнения основных запросов к базе\n" +
             f"/send_content <code>[ID_класса]</code> - оправить любой контент пользователям\n" +
             f"/send_msg <code>[текст]</code> или <code>class=ID_класса [текст]</code> - отправить сообщение пользователям\n\n" +
             "<b>💡 Примечание:</b> Все команды работают с текущим активным файлом слов."
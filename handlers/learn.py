@@ -4,7 +4,6 @@ from aiogram.types import Message, FSInputFile
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from utils.utils import get_random_word
 from keyboards import learn_words_keyboard, main_menu_keyboard
 from utils.data_manager import get_image_filepath, get_audio_filepath
 from utils.audio_cleanup import cleanup_guess_audio
@@ -58,13 +57,13 @@ async def cmd_learn_words(message: Message, state: FSMContext, bot: Bot):
     await send_flashcard(message, state, bot)
 
 async def send_flashcard(message: Message, state: FSMContext, bot: Bot, random_word: bool = False):
-    words = word_manager.load_words(int(message.from_user.id)) # Load words every time
+    words = word_manager.load_words_view(int(message.from_user.id)) # Compiled set if available, otherwise JSON
     current_words = await state.get_data()
     word_index = current_words.get("word_index", -1)
 
     if random_word or word_index == -1 or word_index >= len(words):
-        word = get_random_word(words)
-        word_index = words.index(word) # Find index of the random word
+        word_index = random.randrange(len(words)) # Random index, the word itself is read only by index
+        word = words[word_index]
     else:
         word = words[word_index]
 
@@ -105,7 +104,7 @@ async def send_flashcard(message: Message, state: FSMContext, bot: Bot, random_w
 
 @router.message(F.text == "➡️ Следующее слово", LearnWords.viewing_flashcard)
 async def next_word(message: Message, state: FSMContext, bot: Bot):
-    words = word_manager.load_words(message.from_user.id) # Load words every time
+    words = word_manager.load_words_view(message.from_user.id) # Only the length is needed here
     current_words_data = await state.get_data()
     current_index = current_words_data.get("word_index", -1)
     
@@ -27,7 +27,7 @@ async def cmd_start(message: Message, state: FSMContext):
         await update_last_active(user_id)
         # Ensure display_name is updated in word_manager's config, in case it changed
         user_display_name = message.from_user.full_name or message.from_user.username or user['name'] or "Unknown User"
-        word_manager.set_user_current_file(user_id, word_manager.get_user_current_file(user_id), user_display_name) # Update display_name
+        await word_manager.set_user_current_file(user_id, word_manager.get_user_current_file(user_id), user_display_name) # Update display_name
         await message.answer(
             f"С возвращением, {user['name']}!",
             reply_markup=main_menu_keyboard
@@ -61,7 +61,7 @@ async def process_name(message: Message, state: FSMContext, bot: Bot):
             username
         )
         # Set default word set for new user
-        word_manager.set_user_current_file(user_id, config.DEFAULT_WORD_SET, user_display_name)
+        await word_manager.set_user_current_file(user_id, config.DEFAULT_WORD_SET, user_display_name)
         # Update user profile data in stats.json
         await update_user_profile_data(
             str(user_id),
@@ -2,9 +2,9 @@ from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 import logging
-from database import update_last_active, get_user_stats, get_test_stats_by_word_set, get_game_stats_by_word_set
+from database import update_last_active, get_user_stats_snapshot
 from keyboards import main_menu_keyboard
-from utils.data_manager import calculate_overall_score_and_rank
+from utils.data_manager import get_user_rank
 from aiogram import Bot # Добавлено для явной передачи bot
 from config import TEST_QUESTIONS_COUNT
 import datetime
@@ -38,8 +38,8 @@ async def show_statistics_handler(message: Message, state: FSMContext, bot: Bot)
 
     user_name_display = message.from_user.username if message.from_user.username else message.from_user.full_name
 
-    # Получаем общую статистику пользователя
-    user_overall_stats = await get_user_stats(user_id)
+    # Получаем всю статистику пользователя одним снимком (из кэша, если он уже загружен)
+    user_overall_stats = await get_user_stats_snapshot(user_id)
     
     # Общая статистика по тестам
     total_correct_answers = user_overall_stats.get("total_correct_answers", 0)
@@ -71,10 +71,7 @@ async def show_statistics_handler(message: Message, state: FSMContext, bot: Bot)
     overall_correct_answers = total_correct_answers + total_game_correct
 
     # Calculate ranking
-    user_ranks = await calculate_overall_score_and_rank()
-    current_user_rank_info = next(
-        (u for u in user_ranks if int(u['user_id']) == user_id), None
-    )
+    current_user_rank_info = await get_user_rank(user_id)
 
     rank_text = ""
     if current_user_rank_info:
@@ -106,7 +103,7 @@ async def show_statistics_handler(message: Message, state: FSMContext, bot: Bot)
     )
 
     # === Статистика по тестам для каждого словаря ===
-    test_stats_by_set = await get_test_stats_by_word_set(user_id)
+    test_stats_by_set = user_overall_stats["test_stats_by_set"]
     if test_stats_by_set:
         stats_text += "📝 Статистика тестов по словарям:\n"
         for word_set, stats in test_stats_by_set.items():
@@ -133,7 +130,7 @@ async def show_statistics_handler(message: Message, state: FSMContext, bot: Bot)
 
     stats_text += "🎮 *Игры:*"
     # === Статистика по играм для каждого словаря (для пользователя) ===
-    game_stats_by_set = await get_game_stats_by_word_set(user_id)
+    game_stats_by_set = user_overall_stats["game_stats_by_set"]
     if game_stats_by_set:
         stats_text += "\n" # Добавляем перенос строки для красивого отображения статистики игр
         for word_set, games in game_stats_by_set.items():
@@ -9,8 +9,10 @@ from database import save_test_result, update_last_active, get_user_stats, updat
 from keyboards import main_menu_keyboard, quiz_options_keyboard
 from utils.word_manager import word_manager # Импортируем word_manager
 from aiogram import Bot # Добавлено для явной передачи bot
+import config # QUIZ_DIFFICULTY читается при каждом вопросе: его меняют через /settings
 from config import TEST_QUESTIONS_COUNT
 from utils.audio_cleanup import cleanup_guess_audio
+from utils.data_manager import record_answer_event
 import datetime
 import asyncio
 import logging
@@ -30,9 +32,11 @@ async def start_test(message: Message, state: FSMContext, bot: Bot):
     logging.info(f"[handlers/test.py] Starting test for user ID: {user_id}")
     await update_last_active(int(user_id))
     
-    words = word_manager.load_words(int(user_id)) # Cast user_id to int
+    # В данные FSM попадают только имя и версия словаря и индексы вопросов; слова - в общем реестре
+    word_set_id = word_manager.get_user_current_file(int(user_id)) # Cast user_id to int
+    word_set_version, words = word_manager.word_set_registry.current(word_set_id)
     
-    logging.info(f"[handlers/test.py] Loaded {len(words)} words for user {user_id} from file: {word_manager.get_user_current_file(int(user_id))}") # Added logging
+    logging.info(f"[handlers/test.py] Loaded {len(words)} words for user {user_id} from file: {word_set_id}") # Added logging
     
     # Определяем количество вопросов для теста
     num_questions = min(len(words), TEST_QUESTIONS_COUNT)
@@ -53,22 +57,22 @@ async def start_test(message: Message, state: FSMContext, bot: Bot):
         question_num=0,
         correct_answers=0,
         num_questions=num_questions, # Сохраняем актуальное количество вопросов
-        test_words=random.sample(words, num_questions),
-        all_words=words,
+        test_word_indices=random.sample(range(len(words)), num_questions),
+        word_set_id=word_set_id,
+        word_set_version=word_set_version,
         test_sent_message_ids=[],
         start_time=datetime.datetime.now() # Добавляем время начала теста
     )
     
     await message.answer("Результаты вашего теста будут отображаться в статистике только после его завершения!")
-    current_word_set_name = word_manager.get_user_current_file(int(user_id))
-    await message.answer(f"Начинаем тест! Ответьте на {num_questions} вопросов из словаря '{current_word_set_name}' в котором {len(words)} слов.")
+    await message.answer(f"Начинаем тест! Ответьте на {num_questions} вопросов из словаря '{word_set_id}' в котором {len(words)} слов.")
     await send_test_question(message, state)
 
 async def send_test_question(message: Message, state: FSMContext):
     state_data = await state.get_data()
     question_num = state_data['question_num']
-    test_words = state_data['test_words']
-    words = state_data['all_words']
+    test_word_indices = state_data['test_word_indices']
+    words = word_manager.word_set_registry.get(state_data['word_set_id'], state_data['word_set_version'])
     actual_num_questions = state_data['num_questions'] # Получаем актуальное количество вопросов
     # Delete previously sent test messages (to keep chat clean)
     previous_ids = state_data.get('test_sent_message_ids', [])
@@ -88,16 +92,19 @@ async def send_test_question(message: Message, state: FSMContext):
             pass
 
     if question_num < actual_num_questions:
-        current_word_data = test_words[question_num]
+        word_index = test_word_indices[question_num]
+        # Версию могли удалить из реестра (сессия простаивала дольше WORD_SET_REGISTRY_TTL_SECONDS), а словарь - сократиться
+        current_word_data = words[word_index] if word_index < len(words) else random.choice(words)
         english_word = current_word_data['en']
         russian_translation = current_word_data['ru']
         
-        options = get_quiz_options(russian_translation, words)
+        options = get_quiz_options(russian_translation, words, difficulty=config.QUIZ_DIFFICULTY, set_id=state_data['word_set_id'])
         
         await state.update_data(
             current_test_word_ru=russian_translation, 
             current_test_word_en=english_word,
-            quiz_options=options # Сохраняем опции в состоянии
+            quiz_options=options, # Сохраняем опции в состоянии
+            question_sent_at=datetime.datetime.now().isoformat()
         )
 
         word_msg = await message.answer(
@@ -135,6 +142,9 @@ async def process_test_answer(callback: CallbackQuery, state: FSMContext):
         answer_feedback = "✅ Верно!"
     else:
         answer_feedback = f"❌ Неверно. Правильный ответ: *{correct_russian_word}*"
+
+    await record_answer_event(state_data['user_id'], english_word, "test", state_data['word_set_id'], is_correct,
+                              state_data.get('question_sent_at'))
     
     await callback.message.edit_text(
         f"Вопрос {question_num + 1}/{actual_num_questions}: *{english_word}*"
@@ -197,9 +207,8 @@ async def finish_test(message: Message, state: FSMContext):
     except Exception:
         pass
 
-    # Get the current word set name
-    current_word_set = word_manager.get_user_current_file(int(user_id))
-    await save_test_result(int(user_id), correct_answers, actual_num_questions, word_set_name=current_word_set)
+    # Результат относится к словарю, из которого были вопросы, даже если пользователь сменил словарь во время теста
+    await save_test_result(int(user_id), correct_answers, actual_num_questions, word_set_name=state_data['word_set_id'])
 
     # Fetch updated stats to compare best_test_time
     current_user_stats = await get_user_stats(int(user_id))
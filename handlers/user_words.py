@@ -12,7 +12,7 @@ import html
 import os
 import logging
 from config import MAX_USER_WORDS, TELEGRAM_MAX_MESSAGE_LENGTH # Импортируем MAX_USER_WORDS и TELEGRAM_MAX_MESSAGE_LENGTH из config.py
-from utils.data_manager import get_banned_users, get_image_filepath, get_audio_filepath
+from utils.data_manager import is_user_banned, get_image_filepath, get_audio_filepath
 from aiogram.exceptions import TelegramBadRequest
 import asyncio
 from aiogram import Bot # Import Bot for accessing bot methods
@@ -41,7 +41,7 @@ async def _get_user_display_name(user_id: int) -> str:
 @router.message(Command("my_set"))
 async def my_word_set_command(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    if user_id in await get_banned_users():
+    if await is_user_banned(user_id):
         await message.reply("Вы заблокированы и не можете использовать функционал пользовательских словарей.")
         return
     user_display_name = await _get_user_display_name(user_id)
@@ -63,7 +63,7 @@ async def my_word_set_command(message: Message, state: FSMContext):
         
         # Если текущий файл пользователя не его личный словарь, автоматически переключаем на него
         if current_user_file != selected_personal_file:
-            word_manager.set_user_current_file(user_id, selected_personal_file, user_display_name)
+            await word_manager.set_user_current_file(user_id, selected_personal_file, user_display_name)
             current_user_file = selected_personal_file # Обновляем для дальнейшего использования
 
         base_personal_filename = word_manager.get_user_custom_filename(user_id, user_display_name)
@@ -109,7 +109,7 @@ async def my_word_set_command(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "create_my_word_set", UserWordStates.waiting_for_create_confirm)
 async def create_my_word_set(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -118,7 +118,7 @@ async def create_my_word_set(callback: CallbackQuery, state: FSMContext):
     user_display_name = await _get_user_display_name(user_id)
     logger.debug(f"[create_my_word_set] User ID: {user_id}, Display Name: {user_display_name}")
 
-    created_filename = word_manager.create_new_file(user_id, user_display_name) # Passing user_display_name
+    created_filename = await word_manager.create_new_file(user_id, user_display_name) # Passing user_display_name
 
     if created_filename:
         logger.debug(f"[create_my_word_set] Successfully created and set current file to: {created_filename}")
@@ -204,7 +204,7 @@ async def cancel_create_word_set(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "add_my_word")
 async def add_my_word_command(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -238,7 +238,7 @@ async def add_my_word_command(callback: CallbackQuery, state: FSMContext):
 @router.message(UserWordStates.waiting_for_add_word, F.text)
 async def process_add_my_word(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    if user_id in await get_banned_users():
+    if await is_user_banned(user_id):
         await message.reply("Вы заблокированы и не можете использовать функционал пользовательских словарей.")
         await state.clear()
         return
@@ -256,8 +256,8 @@ async def process_add_my_word(message: Message, state: FSMContext):
         return
 
     # Проверка на лимит слов
-    current_words = word_manager.load_words_from_file(os.path.join(word_manager.data_dir, "words", current_user_file))
-    if len(current_words) >= MAX_USER_WORDS:
+    current_word_set = word_manager.get_word_set(current_file_path)
+    if len(current_word_set) >= MAX_USER_WORDS:
         state_data = await state.get_data()
         word_list_visible = state_data.get("word_list_visible", False)
         show_list_button_text = "Скрыть список слов" if word_list_visible else "📖 Показать список слов"
@@ -291,6 +291,15 @@ async def process_add_my_word(message: Message, state: FSMContext):
         )
         return
 
+    if en_word in current_word_set:
+        await message.answer(
+            f"Слово <code>{html.escape(en_word)}</code> уже есть в вашем словаре. "
+            "Введите другое слово или нажмите '❌ Отмена'.",
+            parse_mode="HTML",
+            reply_markup=cancel_add_del_keyboard
+        )
+        return
+
     if is_bad_word(en_word) or is_bad_word(ru_word):
         state_data = await state.get_data()
         word_list_visible = state_data.get("word_list_visible", False)
@@ -302,7 +311,7 @@ async def process_add_my_word(message: Message, state: FSMContext):
         await state.clear()
         return
 
-    if word_manager.add_word_to_file(current_user_file, {"en": en_word, "ru": ru_word}):
+    if await word_manager.add_word_to_file_async(current_user_file, {"en": en_word, "ru": ru_word}):
         state_data = await state.get_data()
         word_list_visible = state_data.get("word_list_visible", False)
         show_list_button_text = "Скрыть список слов" if word_list_visible else "📖 Показать список слов"
@@ -326,7 +335,7 @@ async def process_add_my_word(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "del_my_word")
 async def del_my_word_command(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -355,7 +364,7 @@ async def del_my_word_command(callback: CallbackQuery, state: FSMContext):
 @router.message(UserWordStates.waiting_for_del_word, F.text)
 async def process_del_my_word(message: Message, state: FSMContext):
     user_id = message.from_user.id
-    if user_id in await get_banned_users():
+    if await is_user_banned(user_id):
         await message.reply("Вы заблокированы и не можете использовать функционал пользовательских словарей.")
         await state.clear()
         return
@@ -381,7 +390,7 @@ async def process_del_my_word(message: Message, state: FSMContext):
         )
         return
 
-    if word_manager.delete_word_from_file(current_user_file, en_word_to_delete):
+    if await word_manager.delete_word_from_file_async(current_user_file, en_word_to_delete):
         state_data = await state.get_data()
         word_list_visible = state_data.get("word_list_visible", False)
         show_list_button_text = "Скрыть список слов" if word_list_visible else "📖 Показать список слов"
@@ -404,7 +413,7 @@ async def process_del_my_word(message: Message, state: FSMContext):
 
 @router.callback_query(F.data.startswith("select_file_"))
 async def process_select_file(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -414,11 +423,11 @@ async def process_select_file(callback: CallbackQuery, state: FSMContext):
     user_display_name = await _get_user_display_name(user_id)
     is_personal_set = selected_filename == word_manager.get_user_custom_filename(user_id, user_display_name)
 
-    if word_manager.set_user_current_file(user_id, selected_filename, user_display_name):
+    if await word_manager.set_user_current_file(user_id, selected_filename, user_display_name):
         # После выбора файла, устанавливаем word_list_visible в False и обновляем сообщение до начального вида /my_set
         await state.update_data(word_list_visible=False)
         info = word_manager.get_file_info(selected_filename)
-        words_in_file = word_manager.load_words_from_file(os.path.join(word_manager.data_dir, "words", selected_filename))
+        words_in_file = word_manager.get_word_set(os.path.join(word_manager.data_dir, "words", selected_filename))
         
         message_text = f"📁 <b>{'Ваш личный словарь:' if is_personal_set else 'Словарь:'}</b> {html.escape(selected_filename)}\n"
         message_text += f"📊 Количество слов: {len(words_in_file)}{f' / {MAX_USER_WORDS}' if is_personal_set else ''}\n"
@@ -528,7 +537,7 @@ async def back_to_main_from_file_selection(message: Message, state: FSMContext):
 
 @router.callback_query(F.data == "toggle_my_word_list") # Измененный callback_data
 async def toggle_my_word_list_callback(callback: CallbackQuery, state: FSMContext, bot: Bot): # Pass bot instance
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -547,7 +556,7 @@ async def toggle_my_word_list_callback(callback: CallbackQuery, state: FSMContex
 
     # Define the core prefix that appears on every message part
     core_message_prefix = f"📁 <b>{'Ваш личный словарь:' if is_personal_set else 'Словарь:'}</b> {html.escape(current_file)}\n"
-    word_count_str = str(len(word_manager.load_words_from_file(os.path.join(word_manager.data_dir, 'words', current_file))))
+    word_count_str = str(len(word_manager.get_word_set(os.path.join(word_manager.data_dir, 'words', current_file))))
     if is_personal_set:
         word_count_str += f" / {MAX_USER_WORDS}"
     core_message_prefix += f"📊 Количество слов: {word_count_str}\n"
@@ -704,7 +713,7 @@ async def _send_file_selection_menu_helper(message: Message, state: FSMContext,
 
 @router.callback_query(F.data == "delete_my_word_set")
 async def delete_my_word_set_command(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -730,7 +739,7 @@ async def delete_my_word_set_command(callback: CallbackQuery, state: FSMContext)
 
 @router.callback_query(F.data == "confirm_delete_my_word_set", UserWordStates.waiting_for_delete_confirm)
 async def confirm_delete_my_word_set(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
@@ -750,9 +759,9 @@ async def confirm_delete_my_word_set(callback: CallbackQuery, state: FSMContext)
         await state.clear()
         return
 
-    if word_manager.delete_file(current_user_file):
+    if await word_manager.delete_file(current_user_file):
         # Сбрасываем текущий файл пользователя на дефолтный
-        word_manager.set_user_current_file(user_id, "all_words.json", user_display_name) # Pass user_display_name
+        await word_manager.set_user_current_file(user_id, "all_words.json", user_display_name) # Pass user_display_name
         await callback.message.edit_text(
             f"✅ Ваш личный словарь <b>{html.escape(current_user_file)}</b> успешно удален.",
             parse_mode="HTML"
@@ -778,7 +787,7 @@ async def cancel_delete_my_word_set(callback: CallbackQuery, state: FSMContext):
 
 @router.callback_query(F.data == "cancel_add_del_word", StateFilter(UserWordStates.waiting_for_add_word, UserWordStates.waiting_for_del_word))
 async def cancel_add_del_word_action(callback: CallbackQuery, state: FSMContext):
-    if callback.from_user.id in await get_banned_users():
+    if await is_user_banned(callback.from_user.id):
         await callback.answer("Вы заблокированы и не можете использовать функционал пользовательских словарей.", show_alert=True)
         await state.clear()
         return
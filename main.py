@@ -11,11 +11,12 @@ from aiogram.fsm.context import FSMContext
 from logging.handlers import TimedRotatingFileHandler # Импортируем TimedRotatingFileHandler
 
 from config import TOKEN, ADMIN_IDS, AUTO_RESET_STATS_MONTHLY
-from database import init_db
+from database import init_db, open_db_pool, close_db_pool
 from keyboards import main_menu_keyboard
 from utils.audio_converter import convert_single_ogg_to_mp3
 from utils.audio_cleanup import cleanup_guess_audio
-from utils.data_manager import get_banned_users
+from utils.data_manager import is_user_banned
+from utils.word_manager import word_manager
 
 from handlers import start, learn, games, test, stats, help, admin
 from handlers import user_words # Новый импорт для пользовательских команд
@@ -36,7 +37,9 @@ async def main():
         ]
     )
 
+    await open_db_pool()
     await init_db()
+    await word_manager.load_user_current_files()
 
     bot = Bot(token=TOKEN)
     dp = Dispatcher(storage=MemoryStorage())
@@ -54,7 +57,7 @@ async def main():
     @dp.message.outer_middleware()
     async def anti_ban_outer_middleware(handler, event, data):
         user_id = event.from_user.id
-        if user_id in await get_banned_users():
+        if await is_user_banned(user_id):
             await event.answer("Вы заблокированы и не можете использовать этого бота.")
             return # Stop propagation for banned users
 
@@ -67,7 +70,11 @@ async def main():
     # Запускаем фоновые задачи
     await start_background_tasks(bot)
 
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await word_manager.flush_pending_writes()
+        await close_db_pool()
 
 if __name__ == "__main__":
     asyncio.run(main())
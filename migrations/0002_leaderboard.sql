@@ -0,0 +1,14 @@
+-- migrations/0002_leaderboard.sql
+-- Incrementally maintained leaderboard (see database.rebuild_leaderboard)
+
+CREATE TABLE IF NOT EXISTS leaderboard (
+    user_id INTEGER PRIMARY KEY,
+    total_correct_answers INTEGER NOT NULL DEFAULT 0, -- Sum of test scores
+    total_game_correct INTEGER NOT NULL DEFAULT 0, -- Sum of correct answers in games
+    best_test_score INTEGER NOT NULL DEFAULT 0,
+    recall_best_time REAL, -- Best time in recall_typing game
+    overall_score REAL NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_score ON leaderboard(overall_score DESC, user_id);
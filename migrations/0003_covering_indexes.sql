@@ -0,0 +1,8 @@
+-- migrations/0003_covering_indexes.sql
+-- Covering indexes for per-user statistics and ranking queries
+
+-- get_user_stats (SUM/MAX score), get_test_stats_by_word_set (GROUP BY word_set_name), ranking (SUM score per user)
+CREATE INDEX IF NOT EXISTS idx_results_user_set ON results(user_id, word_set_name, score, total);
+
+-- get_user_stats, get_game_stats_by_word_set, ranking (SUM correct, MIN best_time per user)
+CREATE INDEX IF NOT EXISTS idx_games_stats_user ON games_stats(user_id, game_type, word_set_name, played, correct, incorrect, best_time);
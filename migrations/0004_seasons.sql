@@ -0,0 +1,61 @@
+-- migrations/0004_seasons.sql
+-- Season-based statistics: the monthly reset opens a new season instead of deleting results
+
+CREATE TABLE IF NOT EXISTS seasons (
+    season_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at TEXT NOT NULL,
+    ended_at TEXT, -- Set when the next season is opened
+    compacted_at TEXT -- Set when raw results/games_stats were folded into season_rollups
+);
+
+INSERT INTO seasons (season_id, started_at)
+SELECT 1, strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+WHERE NOT EXISTS (SELECT 1 FROM seasons);
+
+-- Existing statistics belong to the first season
+ALTER TABLE results ADD COLUMN season_id INTEGER NOT NULL DEFAULT 1;
+
+-- best_test_score/best_test_time are valid only while user_data.season_id is the current season
+ALTER TABLE user_data ADD COLUMN season_id INTEGER NOT NULL DEFAULT 1;
+
+-- games_stats is rebuilt because its UNIQUE constraint now includes season_id
+CREATE TABLE games_stats_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    season_id INTEGER NOT NULL DEFAULT 1,
+    user_id INTEGER NOT NULL,
+    game_type TEXT NOT NULL,
+    word_set_name TEXT NOT NULL DEFAULT 'default',
+    played INTEGER DEFAULT 0,
+    correct INTEGER DEFAULT 0,
+    incorrect INTEGER DEFAULT 0,
+    best_time REAL, -- Only for recall_typing game
+    UNIQUE(season_id, user_id, game_type, word_set_name),
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+INSERT INTO games_stats_new (id, user_id, game_type, word_set_name, played, correct, incorrect, best_time)
+SELECT id, user_id, game_type, word_set_name, played, correct, incorrect, best_time FROM games_stats;
+
+DROP TABLE games_stats;
+ALTER TABLE games_stats_new RENAME TO games_stats;
+
+-- Per-user totals of compacted seasons (see database.compact_old_seasons)
+CREATE TABLE IF NOT EXISTS season_rollups (
+    season_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    tests_taken INTEGER NOT NULL DEFAULT 0,
+    total_correct_answers INTEGER NOT NULL DEFAULT 0, -- Sum of test scores
+    total_possible_score INTEGER NOT NULL DEFAULT 0,
+    best_test_score INTEGER NOT NULL DEFAULT 0,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    total_game_correct INTEGER NOT NULL DEFAULT 0,
+    games_incorrect INTEGER NOT NULL DEFAULT 0,
+    recall_best_time REAL,
+    overall_score REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (season_id, user_id)
+);
+
+-- Covering indexes from 0003, now leading with season_id
+DROP INDEX IF EXISTS idx_results_user_set;
+CREATE INDEX IF NOT EXISTS idx_results_season_user_set ON results(season_id, user_id, word_set_name, score, total);
+CREATE INDEX IF NOT EXISTS idx_games_stats_season_user ON games_stats(season_id, user_id, game_type, word_set_name, played, correct, incorrect, best_time);
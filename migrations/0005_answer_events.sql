@@ -0,0 +1,28 @@
+-- migrations/0005_answer_events.sql
+-- Append-only log of individual answers in games and tests (see database.AnswerEventLog)
+
+CREATE TABLE IF NOT EXISTS answer_events (
+    id INTEGER PRIMARY KEY, -- Grows with time, retention deletes by id ranges
+    user_id INTEGER NOT NULL,
+    word TEXT NOT NULL, -- English word of the question
+    game_type TEXT NOT NULL, -- Game type or 'test'
+    word_set_name TEXT NOT NULL DEFAULT 'default',
+    is_correct INTEGER NOT NULL,
+    latency_ms INTEGER, -- Time from question to answer, NULL if unknown
+    created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_answer_events_user_word ON answer_events(user_id, word_set_name, word);
+
+-- Per-word totals of events removed by retention (see database.compact_answer_events)
+CREATE TABLE IF NOT EXISTS answer_word_stats (
+    user_id INTEGER NOT NULL,
+    word_set_name TEXT NOT NULL,
+    word TEXT NOT NULL,
+    answers INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    latency_ms_total INTEGER NOT NULL DEFAULT 0,
+    latency_count INTEGER NOT NULL DEFAULT 0, -- Answers with known latency
+    last_answered_at TEXT,
+    PRIMARY KEY (user_id, word_set_name, word)
+);
@@ -0,0 +1,12 @@
+-- migrations/0006_user_word_sets.sql
+-- Active word set per user; previously stored in data/config/config.json (see WordManager.load_user_current_files)
+
+CREATE TABLE IF NOT EXISTS user_word_sets (
+    user_id INTEGER PRIMARY KEY,
+    filename TEXT NOT NULL,
+    display_name TEXT NOT NULL DEFAULT 'Unknown User',
+    updated_at TEXT NOT NULL
+);
+
+-- Deleting a word set resets every user who had it selected
+CREATE INDEX IF NOT EXISTS idx_user_word_sets_filename ON user_word_sets(filename);
@@ -0,0 +1,24 @@
+-- migrations/0007_leaderboard_seasons.sql
+-- Leaderboard rows per season: a new season starts with no rows, a missing row means score 0
+
+CREATE TABLE leaderboard_new (
+    season_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    total_correct_answers INTEGER NOT NULL DEFAULT 0, -- Sum of test scores
+    total_game_correct INTEGER NOT NULL DEFAULT 0, -- Sum of correct answers in games
+    best_test_score INTEGER NOT NULL DEFAULT 0,
+    recall_best_time REAL, -- Best time in recall_typing game
+    overall_score REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (season_id, user_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+
+-- Existing rows belong to the current season
+INSERT INTO leaderboard_new (season_id, user_id, total_correct_answers, total_game_correct, best_test_score, recall_best_time, overall_score)
+SELECT COALESCE((SELECT MAX(season_id) FROM seasons), 1), user_id, total_correct_answers, total_game_correct, best_test_score, recall_best_time, overall_score
+FROM leaderboard;
+
+DROP TABLE leaderboard;
+ALTER TABLE leaderboard_new RENAME TO leaderboard;
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_season_score ON leaderboard(season_id, overall_score DESC, user_id);
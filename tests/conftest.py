@@ -0,0 +1,55 @@
+"""Общие фикстуры тестов: временная мигрированная БД вместо data/db/bot_data.db.
+
+Тесты без pytest-asyncio: сценарий - корутина, которую run_db выполняет в своем asyncio.run
+между open_db_pool/init_db и close_db_pool.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import database
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Модуль database, переключенный на пустую БД в tmp_path.
+
+    Пул, буферы и кэши создаются заново: их asyncio-примитивы привязываются к циклу событий
+    теста, а данные не переходят из одного теста в другой.
+    """
+    monkeypatch.chdir(ROOT) # migrations/ ищется относительно текущего каталога
+    monkeypatch.setattr(database, "db_pool", database.DatabasePool(
+        str(tmp_path / "test.db"), reader_count=2, pragmas=database.DB_PERFORMANCE_PROFILES["fast"]))
+    monkeypatch.setattr(database, "current_season_id", 1)
+    monkeypatch.setattr(database, "activity_tracker", database.ActivityTracker(3600))
+    monkeypatch.setattr(database, "user_stats_cache", database.UserStatsCache(1000))
+    monkeypatch.setattr(database, "leaderboard", database.Leaderboard())
+    # Запись буфера только явным flush: тест сам решает, когда ответы попадают в БД
+    monkeypatch.setattr(database, "game_stats_buffer", database.GameStatsBuffer(3600, 10 ** 9))
+    monkeypatch.setattr(database, "answer_event_log", database.AnswerEventLog(100, 3600, 10000))
+    monkeypatch.setattr(database, "moderation_cache", database.ModerationCache())
+    # Снимок для админских отчетов - рядом с временной БД; обновляется только явным refresh
+    monkeypatch.setattr(database, "analytics_snapshot", database.AnalyticsSnapshot(
+        str(tmp_path / "test.db"), str(tmp_path / "analytics.db"), 10 ** 9))
+    return database
+
+
+@pytest.fixture
+def run_db(temp_db):
+    """run_db(scenario) - выполняет корутинную функцию scenario на временной БД и возвращает ее результат."""
+    def run(scenario):
+        async def main():
+            await database.open_db_pool()
+            try:
+                await database.init_db()
+                return await scenario()
+            finally:
+                await database.close_db_pool()
+        return asyncio.run(main())
+    return run
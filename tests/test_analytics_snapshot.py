@@ -0,0 +1,51 @@
+"""Отчет /stats из снимка analytics_snapshot: данные и места снимка согласованы, запись в рабочую БД их не меняет."""
+import datetime
+
+import database
+
+FIELDS = ["user_id", "rank", "overall_score", "total_correct_answers", "total_game_correct"]
+
+
+def _rows(rows: list[dict]) -> list[dict]:
+    return [{field: row[field] for field in FIELDS} for row in rows]
+
+
+async def _snapshot_pages(name_filter=None) -> list[dict]:
+    rows = []
+    async for batch in database.iter_ranking_pages(name_filter=name_filter, batch_size=2, from_snapshot=True):
+        rows.extend(batch)
+    return rows
+
+
+def test_report_reads_consistent_snapshot(run_db):
+    async def scenario():
+        now = datetime.datetime.now().isoformat()
+        for user_id in range(1, 8):
+            await database.add_user(user_id, f"Ученик {user_id} {'2В' if user_id % 2 else '3А'}")
+            await database.save_test_result(user_id, user_id % 4, 10)
+            await database.update_game_stats(user_id, "build_word", True, now, word_set_name="food.json")
+        await database.flush_game_stats()
+
+        await database.refresh_analytics_snapshot()
+        live = await database.get_ranking()
+        assert _rows(await _snapshot_pages()) == _rows(live)
+        page = await database.get_ranking_page(3, from_snapshot=True)
+        assert _rows(page["rows"]) == _rows(live[:3]) and page["has_next"]
+        # Фильтр по классу (py_upper) работает и на соединении снимка
+        assert _rows(await _snapshot_pages(name_filter=" 2в")) == _rows([row for row in live if "2В" in row["registered_name"]])
+
+        # Изменения рабочей БД не видны до обновления снимка, а места соответствуют порядку снимка
+        await database.save_test_result(7, 10, 10)
+        await database.update_game_stats(7, "build_word", True, now, word_set_name="food.json")
+        await database.flush_game_stats()
+        assert _rows(await _snapshot_pages()) == _rows(live)
+        stats = await database.get_game_stats_by_word_set_for_users([7], from_snapshot=True)
+        assert stats[7]["food.json"]["build_word"]["played"] == 1
+        assert (await database.get_game_stats_by_word_set_for_users([7]))[7]["food.json"]["build_word"]["played"] == 2
+
+        await database.refresh_analytics_snapshot()
+        live = await database.get_ranking()
+        assert live[0]["user_id"] == 7
+        assert _rows(await _snapshot_pages()) == _rows(live)
+
+    run_db(scenario)
@@ -0,0 +1,88 @@
+"""Одновременные ответы в играх: итоги games_stats и leaderboard не теряют и не удваивают ответы."""
+import asyncio
+import datetime
+import random
+
+import database
+
+GAME_TYPES = ["guess_word", "choose_translation", "build_word", "find_missing_letter", "recall_typing"]
+WORD_SETS = ["base_min.json", "food.json", "animals.json"]
+USERS = [101, 102, 103, 104]
+ANSWERS = 4000
+
+
+def test_concurrent_answers_keep_totals(run_db):
+    rng = random.Random(7)
+    answers = []
+    for _ in range(ANSWERS):
+        game_type = rng.choice(GAME_TYPES)
+        time_taken = round(rng.uniform(0.5, 20), 3) if game_type == "recall_typing" else None
+        answers.append((rng.choice(USERS), game_type, rng.choice(WORD_SETS), rng.random() < 0.6, time_taken))
+
+    expected = {}
+    for user_id, game_type, word_set, is_correct, time_taken in answers:
+        row = expected.setdefault((user_id, game_type, word_set), {"played": 0, "correct": 0, "incorrect": 0, "best_time": None})
+        row["played"] += 1
+        row["correct" if is_correct else "incorrect"] += 1
+        if time_taken is not None and (row["best_time"] is None or time_taken < row["best_time"]):
+            row["best_time"] = time_taken
+
+    async def answer(delay, user_id, game_type, word_set, is_correct, time_taken):
+        # Ответы приходят в течение ~0.2 с и перемешиваются с записями буфера
+        await asyncio.sleep(delay)
+        await database.update_game_stats(user_id, game_type, is_correct, datetime.datetime.now().isoformat(),
+                                         time_taken, word_set)
+
+    async def scenario():
+        for user_id in USERS:
+            await database.add_user(user_id, f"Ученик {user_id}")
+        # Фоновая запись буфера каждые 64 ответа - во время приема остальных ответов
+        database.game_stats_buffer.max_events = 64
+
+        async def periodic_flush():
+            for _ in range(20):
+                await asyncio.sleep(0.01)
+                await database.flush_game_stats()
+
+        calls = [answer(rng.uniform(0, 0.2), *entry) for entry in answers]
+        await asyncio.gather(periodic_flush(), *calls)
+        await database.flush_game_stats()
+        assert database.game_stats_buffer.stats["flushes"] > 1
+
+        async with database.db_pool.reader() as db:
+            cursor = await db.execute(
+                "SELECT user_id, game_type, word_set_name, played, correct, incorrect, best_time FROM games_stats WHERE season_id = ?",
+                (database.current_season_id,)
+            )
+            rows = await cursor.fetchall()
+            actual = {
+                (row['user_id'], row['game_type'], row['word_set_name']):
+                    {"played": row['played'], "correct": row['correct'], "incorrect": row['incorrect'], "best_time": row['best_time']}
+                for row in rows
+            }
+            assert actual == expected
+
+            for user_id in USERS:
+                cursor = await db.execute(
+                    "SELECT MIN(best_time) FROM games_stats WHERE season_id = ? AND user_id = ? AND game_type = 'recall_typing'",
+                    (database.current_season_id, user_id)
+                )
+                expected_best = min((row["best_time"] for key, row in expected.items()
+                                     if key[0] == user_id and row["best_time"] is not None), default=None)
+                assert (await cursor.fetchone())[0] == expected_best
+
+            cursor = await db.execute("SELECT user_id, total_game_correct, recall_best_time, overall_score FROM leaderboard")
+            leaderboard_rows = {row['user_id']: dict(row) for row in await cursor.fetchall()}
+
+        for user_id in USERS:
+            expected_correct = sum(row["correct"] for key, row in expected.items() if key[0] == user_id)
+            expected_best = min((row["best_time"] for key, row in expected.items()
+                                 if key[0] == user_id and row["best_time"] is not None), default=None)
+            row = leaderboard_rows[user_id]
+            assert (row['total_game_correct'], row['recall_best_time']) == (expected_correct, expected_best)
+            # Рейтинг в памяти совпадает с таблицей
+            assert database.leaderboard.get_score(user_id) == row['overall_score']
+
+        assert sum(row["played"] for row in actual.values()) == ANSWERS
+
+    run_db(scenario)
@@ -0,0 +1,43 @@
+"""Рейтинг в памяти меняется только после коммита транзакции записи."""
+import datetime
+
+import pytest
+
+import database
+
+
+def _fail_next_commit(monkeypatch):
+    connection = database.db_pool._writer
+
+    async def failing_commit():
+        monkeypatch.undo()
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(connection, "commit", failing_commit)
+
+
+def test_failed_write_keeps_leaderboard_score(run_db, monkeypatch):
+    async def scenario():
+        await database.add_user(1, "Ученик 1")
+        await database.save_test_result(1, 3, 10)
+        assert database.leaderboard.get_score(1) == 6
+
+        with monkeypatch.context() as patch:
+            _fail_next_commit(patch)
+            with pytest.raises(RuntimeError):
+                await database.save_test_result(1, 9, 10)
+        assert database.leaderboard.get_score(1) == 6
+
+        database.game_stats_buffer.add(1, "build_word", "default", True, datetime.datetime.now().isoformat())
+        with monkeypatch.context() as patch:
+            _fail_next_commit(patch)
+            with pytest.raises(RuntimeError):
+                await database.flush_game_stats()
+        assert database.leaderboard.get_score(1) == 6
+
+        # Ответ остался в буфере и попадает в рейтинг со следующей записью
+        await database.flush_game_stats()
+        assert database.leaderboard.get_score(1) == 6 + database.GAME_CORRECT_WEIGHT
+        assert (await database.get_user_rank(1))["overall_score"] == 6 + database.GAME_CORRECT_WEIGHT
+
+    run_db(scenario)
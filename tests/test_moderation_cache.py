@@ -0,0 +1,37 @@
+"""moderation_cache: кэш повторяет исход записи в БД, счетчики описывают результаты проверок."""
+import database
+
+
+def test_mute_unknown_user_is_not_cached(run_db):
+    async def scenario():
+        await database.add_user(1, "Ученик 1")
+
+        assert await database.mute_user(1, None)
+        assert await database.mute_user(999, None) # Пользователя 999 нет в users
+        assert await database.get_user_mute_status(1) is not None
+        assert await database.get_user_mute_status(999) is None
+
+        # Кэш совпадает с тем, что загрузилось бы из БД
+        fresh = database.ModerationCache()
+        await fresh.load()
+        assert fresh._mute_until == database.moderation_cache._mute_until
+
+    run_db(scenario)
+
+
+def test_stats_count_check_results(run_db):
+    async def scenario():
+        await database.add_user(1, "Ученик 1")
+        await database.add_user(2, "Ученик 2")
+        assert await database.add_banned_user(2)
+        loads = database.moderation_cache.stats["db_loads"]
+
+        for user_id in (1, 2, 2, 3):
+            await database.is_user_banned(user_id)
+
+        stats = database.moderation_cache.stats
+        assert (stats["ban_checks"], stats["banned"]) == (4, 2)
+        # Проверки после загрузки при старте отвечаются из памяти
+        assert stats["db_loads"] == loads == 1
+
+    run_db(scenario)
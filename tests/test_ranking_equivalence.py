@@ -0,0 +1,87 @@
+"""database.get_ranking (leaderboard + ROW_NUMBER) против эталонного расчета в Python
+(utils.data_manager.calculate_overall_score_and_rank_reference)."""
+import datetime
+import random
+
+import pytest
+
+import database
+from utils import data_manager
+
+GAME_TYPES = ["guess_word", "choose_translation", "build_word", "find_missing_letter", "recall_typing"]
+WORD_SETS = ["base_min.json", "food.json", "animals.json"]
+# Небольшой набор времен, чтобы у разных пользователей совпадали бонусы за "Ввод по памяти"
+RECALL_TIMES = [1.5, 2.0, 2.5, 4.0, 7.25]
+COMPARED_FIELDS = ["user_id", "rank", "total_correct_answers", "total_game_correct", "best_test_score",
+                   "best_test_time", "last_activity_date"]
+
+
+async def _seed(rng: random.Random, users: int):
+    now = datetime.datetime.now().isoformat()
+    for user_id in range(1, users + 1):
+        await database.add_user(user_id, f"Ученик {user_id}")
+
+    # Пользователи с одинаковыми очками: порядок внутри равных очков - по user_id
+    for user_id in (7, 3, 12):
+        await database.save_test_result(user_id, 10, 10, "base_min.json")
+
+    for user_id in range(1, users + 1):
+        kind = user_id % 4
+        if kind == 0:
+            continue # Без результатов: очки 0, одна большая группа равных
+        for _ in range(rng.randint(0, 3)):
+            await database.save_test_result(user_id, rng.randint(0, 10), 10, rng.choice(WORD_SETS))
+        if rng.random() < 0.5:
+            await database.update_user_best_test_time(user_id, rng.uniform(20, 300))
+        for _ in range(rng.randint(0, 40)):
+            game_type = rng.choice(GAME_TYPES)
+            await database.update_game_stats(user_id, game_type, rng.random() < 0.6, now,
+                                             rng.choice(RECALL_TIMES) if game_type == "recall_typing" else None,
+                                             rng.choice(WORD_SETS))
+        if rng.random() < 0.3:
+            # Часть ответов попадает в БД отдельными записями буфера
+            await database.flush_game_stats()
+    await database.flush_game_stats()
+
+
+def _assert_same_ranking(ranking: list[dict], reference: list[dict]):
+    assert len(ranking) == len(reference)
+    for row, expected in zip(ranking, reference):
+        assert {field: row[field] for field in COMPARED_FIELDS} == {field: expected[field] for field in COMPARED_FIELDS}
+        assert row["overall_score"] == pytest.approx(expected["overall_score"])
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_ranking_matches_reference(run_db, seed):
+    async def scenario():
+        await _seed(random.Random(seed), users=60)
+        ranking = await database.get_ranking()
+        reference = await data_manager.calculate_overall_score_and_rank_reference()
+        _assert_same_ranking(ranking, reference)
+
+        # В данных действительно есть равные очки, в том числе с бонусом за время
+        scores = [row["overall_score"] for row in reference]
+        assert len(set(scores)) < len(scores)
+
+        # Полная перестройка leaderboard дает тот же рейтинг, что и инкрементальные обновления
+        await database.rebuild_leaderboard()
+        _assert_same_ranking(await database.get_ranking(), reference)
+
+    run_db(scenario)
+
+
+def test_ranking_tie_order_by_user_id(run_db):
+    async def scenario():
+        for user_id in (5, 2, 9):
+            await database.add_user(user_id, f"Ученик {user_id}")
+            await database.save_test_result(user_id, 4, 10)
+            await database.update_game_stats(user_id, "recall_typing", True, datetime.datetime.now().isoformat(), 2.0)
+        await database.flush_game_stats()
+
+        ranking = await database.get_ranking()
+        reference = await data_manager.calculate_overall_score_and_rank_reference()
+        assert [row["user_id"] for row in ranking] == [2, 5, 9]
+        assert [row["rank"] for row in ranking] == [1, 2, 3]
+        _assert_same_ranking(ranking, reference)
+
+    run_db(scenario)
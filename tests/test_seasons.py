@@ -0,0 +1,108 @@
+"""Новый сезон не переписывает leaderboard, а постраничный рейтинг совпадает с полным."""
+import datetime
+import random
+
+import database
+from utils import data_manager
+
+RANKING_FIELDS = ["user_id", "rank", "overall_score", "total_correct_answers", "total_game_correct", "best_test_score"]
+
+
+def _rows(ranking: list[dict]) -> list[dict]:
+    return [{field: row[field] for field in RANKING_FIELDS} for row in ranking]
+
+
+async def _seed(rng: random.Random, users: int):
+    now = datetime.datetime.now().isoformat()
+    for user_id in rng.sample(range(1, users * 3), users):
+        await database.add_user(user_id, f"Ученик {user_id} {'2В' if user_id % 2 else '3А'}")
+        kind = user_id % 5
+        if kind == 0:
+            continue # 0 очков
+        if kind == 1:
+            await database.save_test_result(user_id, 5, 10) # Равные очки
+        else:
+            await database.save_test_result(user_id, rng.randint(0, 10), 10)
+            await database.update_game_stats(user_id, "build_word", rng.random() < 0.5, now)
+    await database.flush_game_stats()
+
+
+async def _leaderboard_rows(season_id: int) -> int:
+    async with database.db_pool.reader() as db:
+        cursor = await db.execute("SELECT COUNT(*) FROM leaderboard WHERE season_id = ?", (season_id,))
+        return (await cursor.fetchone())[0]
+
+
+async def _pages_forward(name_filter=None, batch_size=3) -> list[dict]:
+    rows = []
+    async for batch in database.iter_ranking_pages(name_filter=name_filter, batch_size=batch_size):
+        rows.extend(batch)
+    return rows
+
+
+async def _pages_backward(last_row: dict, name_filter=None, limit=4) -> list[dict]:
+    rows = [last_row]
+    page = {"has_prev": True}
+    while page["has_prev"]:
+        page = await database.get_ranking_page(limit, before=(rows[0]["overall_score"], rows[0]["user_id"]),
+                                               name_filter=name_filter)
+        rows = page["rows"] + rows
+    return rows
+
+
+def test_new_season_does_not_rewrite_leaderboard(run_db):
+    async def scenario():
+        await _seed(random.Random(1), users=20)
+        old_season = database.current_season_id
+
+        season_id = await database.start_new_season()
+        assert await _leaderboard_rows(season_id) == 0
+        assert await _leaderboard_rows(old_season) == 20
+
+        # Все пользователи в рейтинге с 0 очков, места - по user_id
+        ranking = await database.get_ranking()
+        user_ids = sorted(row["user_id"] for row in ranking)
+        assert [row["user_id"] for row in ranking] == user_ids
+        assert all(row["overall_score"] == 0 and row["total_correct_answers"] == 0 for row in ranking)
+        for row in ranking:
+            assert database.leaderboard.get_rank(row["user_id"]) == row["rank"]
+
+        # Первый результат нового сезона создает строку leaderboard только этого пользователя
+        await database.save_test_result(user_ids[-1], 7, 10)
+        assert await _leaderboard_rows(season_id) == 1
+        ranking = await database.get_ranking()
+        assert ranking[0]["user_id"] == user_ids[-1] and ranking[0]["overall_score"] == 14
+        assert _rows(ranking) == _rows(await data_manager.calculate_overall_score_and_rank_reference())
+        assert _rows(await _pages_forward()) == _rows(ranking)
+
+        # После перезапуска рейтинг строится заново и не меняется
+        await database.rebuild_leaderboard()
+        assert _rows(await database.get_ranking()) == _rows(ranking)
+
+    run_db(scenario)
+
+
+def test_ranking_pages_match_full_ranking(run_db):
+    async def scenario():
+        await _seed(random.Random(2), users=25)
+        # Пользователь без строки leaderboard в сезоне (зарегистрирован до него) и пользователь со строкой и 0 очков
+        await database.start_new_season()
+        user_ids = sorted(row["user_id"] for row in await database.get_ranking())
+        await database.add_user(1000, "Новый ученик 2В")
+        for user_id in user_ids[2:5]:
+            await database.save_test_result(user_id, 4, 10)
+        await database.update_game_stats(user_ids[4], "recall_typing", True, datetime.datetime.now().isoformat(), 2.0)
+        await database.flush_game_stats()
+
+        ranking = await database.get_ranking()
+        assert len(ranking) == 26
+        forward = await _pages_forward()
+        assert _rows(forward) == _rows(ranking)
+        assert _rows(await _pages_backward(forward[-1])) == _rows(ranking)
+
+        # Фильтр по имени сохраняет порядок и места полного рейтинга
+        filtered = [row for row in ranking if "2В" in row["registered_name"]]
+        assert _rows(await _pages_forward(name_filter="2в")) == _rows(filtered)
+        assert _rows(await _pages_backward(filtered[-1], name_filter="2в")) == _rows(filtered)
+
+    run_db(scenario)
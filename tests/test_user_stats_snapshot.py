@@ -0,0 +1,52 @@
+"""get_user_stats_snapshot во время записи game_stats_buffer: ответы не теряются и не считаются дважды."""
+import asyncio
+import datetime
+
+import database
+
+USER_ID = 42
+
+
+def _played(snapshot: dict) -> int:
+    return sum(game_stats["played"] for game_stats in snapshot["games_stats"].values())
+
+
+def test_snapshot_consistent_with_concurrent_flushes(run_db):
+    async def scenario():
+        await database.add_user(USER_ID, "Ученик")
+        answered = 0
+        stop = asyncio.Event()
+
+        async def answer_and_flush():
+            nonlocal answered
+            for index in range(400):
+                await database.update_game_stats(USER_ID, "build_word", index % 3 == 0,
+                                                 datetime.datetime.now().isoformat(), word_set_name=f"set_{index % 2}.json")
+                answered += 1
+                if index % 7 == 0:
+                    await database.flush_game_stats()
+                await asyncio.sleep(0)
+            stop.set()
+
+        async def read_stats():
+            reads = 0
+            while not stop.is_set():
+                answered_before = answered
+                snapshot = await database.get_user_stats_snapshot(USER_ID)
+                # Ответы, данные во время чтения, могут попасть или не попасть в снимок, остальные - ровно один раз
+                assert answered_before <= _played(snapshot) <= answered
+                reads += 1
+                # Чтение из кэша не уступает циклу событий - уступаем сами
+                await asyncio.sleep(0)
+            return reads
+
+        results = await asyncio.gather(answer_and_flush(), read_stats(), read_stats())
+        assert min(results[1:]) > 0
+        assert database.game_stats_buffer.stats["flushes"] > 1
+
+        await database.flush_game_stats()
+        snapshot = await database.get_user_stats_snapshot(USER_ID)
+        assert _played(snapshot) == answered == 400
+        assert snapshot["games_stats"]["build_word"]["correct"] == 134
+
+    run_db(scenario)
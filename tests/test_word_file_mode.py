@@ -0,0 +1,43 @@
+"""Атомарная запись словаря и его .wset не меняет права файла."""
+import json
+import os
+import stat
+
+from utils import compiled_word_set
+from utils import word_manager as word_manager_module
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_atomic_write_keeps_existing_mode(tmp_path):
+    path = tmp_path / "food.json"
+    path.write_text("[]", encoding="utf-8")
+    os.chmod(path, 0o664)
+
+    word_manager_module._write_json_atomic(str(path), [{"en": "apple", "ru": "яблоко"}])
+
+    assert _mode(path) == 0o664
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"en": "apple", "ru": "яблоко"}]
+
+
+def test_atomic_write_new_file_is_not_owner_only(tmp_path):
+    path = tmp_path / "new.json"
+
+    word_manager_module._write_json_atomic(str(path), [])
+
+    assert _mode(path) == 0o644 & ~word_manager_module._UMASK
+
+
+def test_compiled_word_set_mode(tmp_path):
+    json_path = tmp_path / "food.json"
+    json_path.write_text(json.dumps([{"en": "apple", "ru": "яблоко"}]), encoding="utf-8")
+    compiled_path = tmp_path / "compiled" / "food.wset"
+
+    compiled_word_set.compile_word_set(str(json_path), str(compiled_path))
+    assert _mode(compiled_path) == 0o644 & ~compiled_word_set._UMASK
+
+    os.chmod(compiled_path, 0o664)
+    compiled_word_set.compile_word_set(str(json_path), str(compiled_path))
+    assert _mode(compiled_path) == 0o664
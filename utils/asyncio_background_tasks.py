@@ -6,6 +6,8 @@ import config
 from aiogram import Bot # Импортируем Bot для отправки сообщений
 # import aioschedule as schedule # Удаляем aioschedule
 from database import reset_all_user_statistics # Импортируем функцию сброса статистики
+from database import db_pool, checkpoint_wal, compact_old_seasons, compact_answer_events, refresh_analytics_snapshot
+from utils.word_set_watcher import word_set_watcher
 
 async def check_and_rotate_logs():
     """
@@ -144,7 +146,103 @@ async def monthly_reset_loop(bot: Bot):
         await asyncio.sleep(1)
 
 
+async def wal_checkpoint_loop():
+    """
+    Periodically checkpoints the SQLite WAL file, but only while the bot is idle
+    (no database writes for DB_CHECKPOINT_IDLE_SECONDS), so students' answers are never delayed.
+    """
+    while True:
+        await asyncio.sleep(config.DB_CHECKPOINT_INTERVAL_SECONDS)
+
+        if db_pool.idle_seconds() < config.DB_CHECKPOINT_IDLE_SECONDS:
+            continue
+        if db_pool.wal_size_bytes() == 0:
+            continue
+
+        try:
+            stats = await checkpoint_wal("TRUNCATE")
+            print(f"Чекпоинт WAL выполнен за {stats['last_ms']:.1f} мс: "
+                  f"{stats['wal_bytes_before']} -> {stats['wal_bytes_after']} байт, результат {stats['last_result']}.")
+        except Exception as e:
+            print(f"Ошибка при выполнении чекпоинта WAL: {e}")
+
+
+async def season_compaction_loop():
+    """
+    Daily at 4:30 AM folds finished seasons (older than SEASON_COMPACT_AFTER_DAYS) into per-user rollups,
+    so the monthly reset itself never has to delete results.
+    """
+    while True:
+        now = datetime.datetime.now()
+        next_run = now.replace(hour=4, minute=30, second=0, microsecond=0)
+        if now >= next_run:
+            next_run += datetime.timedelta(days=1)
+
+        wait_seconds = (next_run - now).total_seconds()
+        print(f"Следующее сворачивание прошлых сезонов запланировано на {next_run}. Ожидание {wait_seconds:.0f} секунд.")
+        await asyncio.sleep(wait_seconds)
+
+        try:
+            compacted = await compact_old_seasons(config.SEASON_COMPACT_AFTER_DAYS)
+            if compacted:
+                print(f"Свернуты сезоны статистики: {', '.join(map(str, compacted))}.")
+        except Exception as e:
+            print(f"Ошибка при сворачивании прошлых сезонов: {e}")
+
+
+async def answer_events_retention_loop():
+    """
+    Daily at 4:45 AM folds answer events older than ANSWER_EVENTS_RETENTION_DAYS (or beyond
+    ANSWER_EVENTS_MAX_ROWS) into per-word totals, so the answer_events table stays bounded.
+    """
+    while True:
+        now = datetime.datetime.now()
+        next_run = now.replace(hour=4, minute=45, second=0, microsecond=0)
+        if now >= next_run:
+            next_run += datetime.timedelta(days=1)
+
+        wait_seconds = (next_run - now).total_seconds()
+        print(f"Следующая очистка журнала ответов запланирована на {next_run}. Ожидание {wait_seconds:.0f} секунд.")
+        await asyncio.sleep(wait_seconds)
+
+        try:
+            deleted = await compact_answer_events(config.ANSWER_EVENTS_RETENTION_DAYS, config.ANSWER_EVENTS_MAX_ROWS)
+            print(f"Журнал ответов очищен: {deleted} событий свернуто в итоги по словам.")
+        except Exception as e:
+            print(f"Ошибка при очистке журнала ответов: {e}")
+
+
+async def analytics_snapshot_loop():
+    """
+    Refreshes the read-only database snapshot used by admin reports every ANALYTICS_SNAPSHOT_INTERVAL_SECONDS.
+    """
+    while True:
+        if config.ANALYTICS_SNAPSHOT_ENABLED:
+            try:
+                await refresh_analytics_snapshot()
+            except Exception as e:
+                print(f"Ошибка при обновлении снимка БД для отчетов: {e}")
+        await asyncio.sleep(config.ANALYTICS_SNAPSHOT_INTERVAL_SECONDS)
+
+
+async def word_set_watch_loop():
+    """
+    Polls data/words every WORD_SET_WATCH_INTERVAL_SECONDS and refreshes caches of added, changed and deleted word sets.
+    """
+    while True:
+        try:
+            await word_set_watcher.poll()
+        except Exception as e:
+            print(f"Ошибка при проверке файлов словарей: {e}")
+        await asyncio.sleep(config.WORD_SET_WATCH_INTERVAL_SECONDS)
+
+
 async def start_background_tasks(bot: Bot):
     asyncio.create_task(check_and_rotate_logs())
     asyncio.create_task(check_new_audio_for_admin_notification(bot))
     asyncio.create_task(monthly_reset_loop(bot)) # Запускаем пользовательский планировщик
+    asyncio.create_task(wal_checkpoint_loop()) # Чекпоинты WAL в периоды простоя
+    asyncio.create_task(season_compaction_loop()) # Итоги прошлых сезонов вместо сырых результатов
+    asyncio.create_task(answer_events_retention_loop()) # Ограничение размера журнала ответов
+    asyncio.create_task(analytics_snapshot_loop()) # Снимок БД для тяжелых админских отчетов
+    asyncio.create_task(word_set_watch_loop()) # Обновление кэшей словарей, измененных на диске
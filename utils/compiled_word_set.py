@@ -0,0 +1,152 @@
+"""Компилированный (бинарный) формат словаря для больших общих наборов слов.
+
+Файл <имя>.wset в data/words/compiled строится из JSON-словаря и открывается через mmap:
+пары слов разбираются только при обращении к ним, поэтому доступ по индексу и случайная
+выборка не создают список из всех слов.
+
+Формат (little-endian):
+    заголовок   magic b"WSET", версия u16, флаги u16, число слов u32,
+                st_mtime_ns и st_size исходного JSON (i64, i64) - по ним проверяется свежесть;
+    смещения    (2 * число слов + 1) x u32 - строка k занимает байты [off[k], off[k + 1])
+                таблицы строк; у слова i английское слово - строка 2i, перевод - строка 2i + 1;
+    строки      UTF-8 без разделителей.
+"""
+
+import json
+import mmap
+import os
+import random
+import stat
+import struct
+import tempfile
+from collections.abc import Sequence
+from typing import Dict, List, Optional
+
+MAGIC = b"WSET"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHIqq")
+OFFSET = struct.Struct("<I")
+
+# umask читается один раз при импорте: os.umask меняет его для всего процесса, а компиляция идет в потоках
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _replacement_mode(path: str) -> int:
+    """Права для файла, который заменит path: как у текущего файла, для нового - 0o644 с учетом umask (mkstemp дает 0o600)."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o644 & ~_UMASK
+
+
+def source_key(json_path: str) -> tuple[int, int]:
+    """Ключ свежести исходного JSON: (st_mtime_ns, st_size)."""
+    stat = os.stat(json_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CompiledWordSet(Sequence):
+    """Словарь из .wset только для чтения. Элементы - словари {"en", "ru"}, как в JSON-файле."""
+
+    def __init__(self, compiled_path: str):
+        with open(compiled_path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, mtime_ns, size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{compiled_path} is not a compiled word set (version {FORMAT_VERSION})")
+        self.path = compiled_path
+        self.source_key = (mtime_ns, size)
+        self._count = count
+        self._strings_start = HEADER.size + OFFSET.size * (2 * count + 1)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _string(self, string_index: int) -> str:
+        start, end = struct.unpack_from("<II", self._mm, HEADER.size + OFFSET.size * string_index)
+        return self._mm[self._strings_start + start:self._strings_start + end].decode('utf-8')
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("word index out of range")
+        return {"en": self._string(2 * index), "ru": self._string(2 * index + 1)}
+
+    def sample(self, k: int, rng: random.Random = random) -> List[Dict[str, str]]:
+        """k случайных разных слов; читаются только выбранные."""
+        return [self[i] for i in rng.sample(range(self._count), k)]
+
+    def random_word(self, rng: random.Random = random) -> Dict[str, str]:
+        return self[rng.randrange(self._count)]
+
+    def to_list(self) -> List[Dict[str, str]]:
+        return self[:]
+
+
+def compile_word_set(json_path: str, compiled_path: str) -> int:
+    """Строит .wset из JSON-словаря (атомарно, через временный файл). Возвращает число слов.
+
+    ValueError, если в словаре есть что-то кроме пар строк {"en", "ru"} - такой файл не компилируется.
+    """
+    # Ключ берем до чтения: если JSON поменяется во время компиляции, результат сразу окажется устаревшим
+    mtime_ns, size = source_key(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        words = json.load(f)
+    if not isinstance(words, list):
+        raise ValueError(f"{json_path}: expected a list of words")
+
+    offsets = [0]
+    strings = bytearray()
+    for word_pair in words:
+        if not isinstance(word_pair, dict) or word_pair.keys() != {"en", "ru"}:
+            raise ValueError(f"{json_path}: unsupported word entry {word_pair!r}")
+        for value in (word_pair["en"], word_pair["ru"]):
+            if not isinstance(value, str):
+                raise ValueError(f"{json_path}: unsupported word entry {word_pair!r}")
+            strings += value.encode('utf-8')
+            offsets.append(len(strings))
+    if len(strings) > 0xFFFFFFFF:
+        raise ValueError(f"{json_path}: word set is too large to compile")
+
+    directory = os.path.dirname(os.path.abspath(compiled_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(words), mtime_ns, size))
+            f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+            f.write(strings)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _replacement_mode(compiled_path))
+        os.replace(tmp_path, compiled_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return len(words)
+
+
+def open_if_fresh(json_path: str, compiled_path: str, current: Optional[CompiledWordSet] = None) -> Optional[CompiledWordSet]:
+    """Открытый .wset, если он построен из текущей версии JSON, иначе None.
+
+    current - уже открытый словарь этого файла; возвращается без повторного открытия, если все еще свежий.
+    """
+    try:
+        key = source_key(json_path)
+    except FileNotFoundError:
+        return None
+    if current is not None and current.source_key == key:
+        return current
+    try:
+        compiled = CompiledWordSet(compiled_path)
+    except (FileNotFoundError, ValueError, struct.error):
+        return None
+    return compiled if compiled.source_key == key else None
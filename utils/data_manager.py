@@ -1,4 +1,5 @@
 import os
+import datetime
 import aiofiles
 from typing import Dict, Any
 import logging
@@ -16,6 +17,15 @@ async def update_user_profile_data(user_id: str,
     await database.update_user_profile_data(user_id_int, registered_name, first_name, last_name, username)
 
 async def calculate_overall_score_and_rank() -> list[Dict[str, Any]]:
+    """Рейтинг всех пользователей, посчитанный в SQL (database.get_ranking)."""
+    return await database.get_ranking()
+
+async def get_user_rank(user_id: int) -> Dict[str, Any] | None:
+    """Место и очки одного пользователя из инкрементального рейтинга (database.get_user_rank)."""
+    return await database.get_user_rank(int(user_id))
+
+async def calculate_overall_score_and_rank_reference() -> list[Dict[str, Any]]:
+    """Эталонный расчет рейтинга в Python. Используется только для проверки эквивалентности с database.get_ranking."""
     all_users_data = await database.get_all_users_for_ranking()
     user_scores = []
 
@@ -31,13 +41,13 @@ async def calculate_overall_score_and_rank() -> list[Dict[str, Any]]:
         
         # Define the scoring mechanism
         # Example: total_correct_answers + (correct_game_answers * 0.5) + best_test_score
-        overall_score = total_correct_answers + (total_game_correct * 0.5) + best_test_score
+        overall_score = total_correct_answers + (total_game_correct * database.GAME_CORRECT_WEIGHT) + best_test_score
 
         # Add bonus for best time in 'recall_typing' game
         if 'games_stats' in user_data and "recall_typing" in user_data['games_stats']:
             recall_typing_stats = user_data['games_stats']["recall_typing"]
             if 'best_time' in recall_typing_stats and recall_typing_stats['best_time'] is not None and recall_typing_stats['best_time'] > 0:
-                time_bonus_multiplier = 100 # Adjust this value to change the impact of time
+                time_bonus_multiplier = database.RECALL_TYPING_TIME_BONUS # Adjust this value to change the impact of time
                 overall_score += (1 / recall_typing_stats['best_time']) * time_bonus_multiplier
         
         user_scores.append({
@@ -48,6 +58,7 @@ async def calculate_overall_score_and_rank() -> list[Dict[str, Any]]:
             'last_name': user_data.get('last_name'),
             'username': user_data.get('username'),
             'total_correct_answers': total_correct_answers,
+            'total_game_correct': total_game_correct,
             'best_test_score': best_test_score,
             'best_test_time': user_data.get('best_test_time', float('inf')),
             'last_activity_date': user_data.get('last_active', 'N/A')
@@ -69,9 +80,20 @@ async def update_game_stats(user_id: str, game_type: str, is_correct: bool, last
     user_id_int = int(user_id)
     await database.update_game_stats(user_id_int, game_type, is_correct, last_activity_date, time_taken, word_set_name)
 
+async def record_answer_event(user_id: str, word: str, game_type: str, word_set_name: str, is_correct: bool,
+                              question_sent_at: str = None):
+    """Записывает отдельный ответ в журнал answer_events; question_sent_at - ISO-время показа вопроса."""
+    latency_ms = None
+    if question_sent_at:
+        latency_ms = int((datetime.datetime.now() - datetime.datetime.fromisoformat(question_sent_at)).total_seconds() * 1000)
+    await database.log_answer_event(int(user_id), word, game_type, word_set_name, is_correct, latency_ms)
+
 async def get_banned_users() -> list[int]:
     return await database.get_banned_users()
 
+async def is_user_banned(user_id: int) -> bool:
+    return await database.is_user_banned(int(user_id))
+
 async def add_banned_user(user_id: int) -> bool:
     return await database.add_banned_user(user_id)
 
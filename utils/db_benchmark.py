@@ -0,0 +1,365 @@
+"""
+Нагрузочный бенчмарк функций database.py и utils/data_manager.py.
+
+Создает временную БД заданного масштаба, замеряет каждую публичную функцию
+(p50/p95/p99 и число SQL-запросов на вызов) и пишет JSON-отчет, чтобы изменения
+пула соединений, индексов и пакетной записи можно было сравнивать по цифрам.
+
+Запуск из корня проекта (нужна папка migrations):
+    python -m utils.db_benchmark --users 50000 --results 2000000 --games 500000 --output bench_report.json
+"""
+import argparse
+import asyncio
+import datetime
+import inspect
+import json
+import math
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+import config
+import database
+from utils import data_manager
+
+GAME_TYPES = ["guess_word", "choose_translation", "build_word", "find_missing_letter", "recall_typing"]
+SEED_BATCH_SIZE = 50000
+
+
+class QueryCounter:
+    """Считает SQL-операторы, выполненные соединениями пула (через sqlite3 trace callback)."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement: str):
+        self.count += 1
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    """Перцентиль методом ближайшего ранга."""
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def _batched(rows, size: int = SEED_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def seed_database(db_path: str, users: int, results: int, games: int, events: int, word_sets: int, rng: random.Random):
+    """Заполняет уже мигрированную БД синтетическими данными напрямую через sqlite3 (без пула)."""
+    set_names = [f"set_{index}.json" for index in range(word_sets)]
+    start = datetime.datetime.now() - datetime.timedelta(days=30)
+
+    def timestamp(offset_seconds: float) -> str:
+        return (start + datetime.timedelta(seconds=offset_seconds)).isoformat()
+
+    connection = sqlite3.connect(db_path)
+    connection.execute("PRAGMA synchronous = OFF")
+    try:
+        with connection:
+            connection.executemany(
+                "INSERT INTO users (user_id, name, registered_at, last_active, first_name, last_name, username) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((user_id, f"Ученик {user_id} {rng.randint(1, 11)}{rng.choice('АБВГ')}", timestamp(0),
+                  timestamp(rng.uniform(0, 30 * 86400)), f"First{user_id}", None, f"user{user_id}")
+                 for user_id in range(1, users + 1))
+            )
+            connection.executemany(
+                "INSERT INTO user_data (user_id, best_test_time, best_test_score, season_id) VALUES (?, ?, ?, 1)",
+                ((user_id, rng.uniform(20, 300), rng.randint(0, config.TEST_QUESTIONS_COUNT)) for user_id in range(1, users + 1))
+            )
+            connection.executemany(
+                "INSERT INTO user_word_sets (user_id, filename, display_name, updated_at) VALUES (?, ?, ?, ?)",
+                ((user_id, rng.choice(set_names), f"First{user_id}", timestamp(0)) for user_id in range(1, users + 1))
+            )
+
+        for batch in _batched(
+            (rng.randint(1, users), rng.randint(0, config.TEST_QUESTIONS_COUNT), config.TEST_QUESTIONS_COUNT,
+             timestamp(index * 30 * 86400 / max(1, results)), rng.choice(set_names))
+            for index in range(results)
+        ):
+            with connection:
+                connection.executemany(
+                    "INSERT INTO results (season_id, user_id, score, total, date, word_set_name) VALUES (1, ?, ?, ?, ?, ?)",
+                    batch
+                )
+
+        # Строка games_stats уникальна по (сезон, пользователь, игра, словарь): перебираем комбинации по порядку
+        combinations_per_user = len(GAME_TYPES) * len(set_names)
+        games = min(games, users * combinations_per_user)
+        for batch in _batched(
+            (index % users + 1, GAME_TYPES[(index // users) % len(GAME_TYPES)], set_names[(index // users) // len(GAME_TYPES)],
+             played, correct, played - correct,
+             rng.uniform(0.5, 10) if GAME_TYPES[(index // users) % len(GAME_TYPES)] == "recall_typing" else None)
+            for index in range(games)
+            for played in [rng.randint(1, 200)]
+            for correct in [rng.randint(0, played)]
+        ):
+            with connection:
+                connection.executemany(
+                    "INSERT INTO games_stats (season_id, user_id, game_type, word_set_name, played, correct, incorrect, best_time) "
+                    "VALUES (1, ?, ?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+
+        for batch in _batched(
+            (rng.randint(1, users), f"word{rng.randint(1, 2000)}", rng.choice(GAME_TYPES + ["test"]), rng.choice(set_names),
+             rng.randint(0, 1), rng.randint(500, 15000), timestamp(index * 30 * 86400 / max(1, events)))
+            for index in range(events)
+        ):
+            with connection:
+                connection.executemany(database.ANSWER_EVENT_INSERT_QUERY, batch)
+
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+
+
+async def _time_case(name: str, call, iterations: int, counter: QueryCounter, setup=None) -> dict:
+    durations = []
+    queries = 0
+    for _ in range(iterations):
+        if setup is not None:
+            await setup()
+        counter.count = 0
+        started = time.perf_counter()
+        await call()
+        durations.append((time.perf_counter() - started) * 1000)
+        queries += counter.count
+
+    durations.sort()
+    return {
+        "iterations": iterations,
+        "mean_ms": sum(durations) / len(durations),
+        "min_ms": durations[0],
+        "p50_ms": _percentile(durations, 50),
+        "p95_ms": _percentile(durations, 95),
+        "p99_ms": _percentile(durations, 99),
+        "max_ms": durations[-1],
+        "queries_per_call": queries / iterations,
+    }
+
+
+def _benchmark_cases(users: int, iterations: int, rng: random.Random) -> list[tuple]:
+    """(имя, корутина-фабрика, число итераций, setup или None). Порядок важен: разрушающие операции - в конце."""
+    heavy = max(3, iterations // 20)
+    once = 1
+
+    def user() -> int:
+        return rng.randint(1, users)
+
+    # Удаляемые пользователи берутся с конца диапазона, чтобы не мешать остальным замерам
+    deletable = iter(range(users, 0, -1))
+    now = datetime.datetime.now().isoformat()
+
+    async def buffer_answers():
+        for _ in range(config.GAME_STATS_FLUSH_MAX_EVENTS - 1):
+            database.game_stats_buffer.add(user(), rng.choice(GAME_TYPES), "set_0.json", rng.random() < 0.7, now, rng.uniform(1, 5))
+
+    async def first_ranking_page(name_filter=None):
+        async for rows in database.iter_ranking_pages(name_filter=name_filter, batch_size=config.ADMIN_STATS_PAGE_SIZE):
+            return rows
+
+    async def buffer_answer_events():
+        for _ in range(config.ANSWER_EVENTS_BATCH_SIZE):
+            database.answer_event_log.log(user(), "word", "test", "set_0.json", True, 1000)
+
+    new_user_ids = iter(range(users + 1, users + 1 + iterations * 2))
+
+    return [
+        # Чтение: профиль и статистика
+        ("database.get_user", lambda: database.get_user(user()), iterations, None),
+        ("database.get_user_stats", lambda: database.get_user_stats(user()), iterations, None),
+        ("database.get_user_stats_snapshot", lambda: database.get_user_stats_snapshot(user()), iterations, None),
+        ("database.get_game_stats_by_word_set", lambda: database.get_game_stats_by_word_set(user()), iterations, None),
+        ("database.get_test_stats_by_word_set", lambda: database.get_test_stats_by_word_set(user()), iterations, None),
+        ("database.get_user_display_name", lambda: database.get_user_display_name(user()), iterations, None),
+        ("database.get_user_mute_status", lambda: database.get_user_mute_status(user()), iterations, None),
+        ("database.is_user_banned", lambda: database.is_user_banned(user()), iterations, None),
+        ("database.get_banned_users", database.get_banned_users, iterations, None),
+        ("database.get_schema_version", database.get_schema_version, iterations, None),
+        ("database.get_all_user_word_sets", database.get_all_user_word_sets, heavy, None),
+        ("database.get_db_performance_report", database.get_db_performance_report, iterations, None),
+        # Рейтинг
+        ("database.get_user_rank", lambda: database.get_user_rank(user()), iterations, None),
+        ("database.get_ranking_page", lambda: database.get_ranking_page(config.ADMIN_STATS_PAGE_SIZE), iterations, None),
+        ("database.get_ranking_page[name_filter]",
+         lambda: database.get_ranking_page(config.ADMIN_STATS_PAGE_SIZE, name_filter=" 5А"), iterations, None),
+        ("database.iter_ranking_pages", first_ranking_page, iterations, None),
+        ("database.get_game_stats_by_word_set_for_users",
+         lambda: database.get_game_stats_by_word_set_for_users([user() for _ in range(config.ADMIN_STATS_PAGE_SIZE)]), iterations, None),
+        ("database.get_ranking", database.get_ranking, heavy, None),
+        ("database.get_all_users_for_ranking", database.get_all_users_for_ranking, heavy, None),
+        ("database.get_all_users", database.get_all_users, heavy, None),
+        ("database.get_all_users[from_snapshot]", lambda: database.get_all_users(from_snapshot=True), heavy, None),
+        ("database.explain_query_plans", database.explain_query_plans, heavy, None),
+        ("data_manager.calculate_overall_score_and_rank", data_manager.calculate_overall_score_and_rank, heavy, None),
+        ("data_manager.calculate_overall_score_and_rank_reference", data_manager.calculate_overall_score_and_rank_reference, heavy, None),
+        ("data_manager.get_user_rank", lambda: data_manager.get_user_rank(user()), iterations, None),
+        ("data_manager.get_banned_users", data_manager.get_banned_users, iterations, None),
+        ("data_manager.is_user_banned", lambda: data_manager.is_user_banned(user()), iterations, None),
+        ("data_manager.get_image_filepath", lambda: data_manager.get_image_filepath(f"word{user()}"), iterations, None),
+        ("data_manager.get_audio_filepath", lambda: data_manager.get_audio_filepath(f"word{user()}"), iterations, None),
+        # Запись
+        ("database.add_user", lambda: database.add_user(next(new_user_ids), "Новый ученик 1А"), iterations, None),
+        ("database.update_user_profile_data",
+         lambda: database.update_user_profile_data(user(), "Ученик 2Б", "First", None, "user"), iterations, None),
+        ("data_manager.update_user_profile_data",
+         lambda: data_manager.update_user_profile_data(str(user()), "Ученик 2Б", "First", None, "user"), iterations, None),
+        ("database.update_last_active", lambda: database.update_last_active(user()), iterations, None),
+        ("database.set_user_word_set", lambda: database.set_user_word_set(user(), "set_0.json", "First"), iterations, None),
+        ("database.import_user_word_sets",
+         lambda: database.import_user_word_sets({user(): {"filename": "set_1.json", "display_name": "First"} for _ in range(100)}),
+         heavy, None),
+        ("database.save_test_result",
+         lambda: database.save_test_result(user(), rng.randint(0, config.TEST_QUESTIONS_COUNT), config.TEST_QUESTIONS_COUNT, "set_0.json"),
+         iterations, None),
+        ("database.update_user_best_test_time", lambda: database.update_user_best_test_time(user(), rng.uniform(20, 300)), iterations, None),
+        ("database.update_game_stats",
+         lambda: database.update_game_stats(user(), rng.choice(GAME_TYPES), True, now, 2.5, "set_0.json"), iterations, None),
+        ("data_manager.update_game_stats",
+         lambda: data_manager.update_game_stats(str(user()), rng.choice(GAME_TYPES), False, now, None, "set_0.json"), iterations, None),
+        ("database.flush_game_stats[100 answers]", database.flush_game_stats, heavy, buffer_answers),
+        ("database.log_answer_event", lambda: database.log_answer_event(user(), "word", "test", "set_0.json", True, 1200), iterations, None),
+        ("data_manager.record_answer_event",
+         lambda: data_manager.record_answer_event(str(user()), "word", "build_word", "set_0.json", False, now), iterations, None),
+        ("AnswerEventLog.flush[batch]", database.answer_event_log.flush, heavy, buffer_answer_events),
+        ("database.mute_user", lambda: database.mute_user(user(), 1), iterations, None),
+        ("database.unmute_user", lambda: database.unmute_user(user()), iterations, None),
+        ("database.add_banned_user", lambda: database.add_banned_user(user()), heavy, None),
+        ("database.remove_banned_user", lambda: database.remove_banned_user(user()), heavy, None),
+        ("data_manager.add_banned_user", lambda: data_manager.add_banned_user(user()), heavy, None),
+        ("data_manager.remove_banned_user", lambda: data_manager.remove_banned_user(user()), heavy, None),
+        ("database.checkpoint_wal", lambda: database.checkpoint_wal("PASSIVE"), heavy, None),
+        # Обслуживание и разрушающие операции
+        ("database.reset_user_word_sets_for_file", lambda: database.reset_user_word_sets_for_file("set_1.json"), once, None),
+        ("database.delete_user_from_db", lambda: database.delete_user_from_db(next(deletable)), heavy, None),
+        ("data_manager.delete_user_stats_entry", lambda: data_manager.delete_user_stats_entry(str(next(deletable))), heavy, None),
+        ("database.refresh_analytics_snapshot", database.refresh_analytics_snapshot, heavy, None),
+        ("database.migrate_db", database.migrate_db, heavy, None),
+        ("database.rebuild_leaderboard", database.rebuild_leaderboard, heavy, None),
+        ("database.compact_answer_events", lambda: database.compact_answer_events(0, 0), once, None),
+        ("database.start_new_season", database.start_new_season, once, None),
+        ("database.reset_all_user_statistics", database.reset_all_user_statistics, once, None),
+        ("database.compact_old_seasons", database.compact_old_seasons, once, None),
+    ]
+
+
+# Функции жизненного цикла пула и обертки над уже замеренными функциями
+NOT_TIMED = {
+    "database.open_db_pool", "database.close_db_pool", "database.init_db",
+}
+
+
+def _public_coroutines(module, prefix: str) -> set[str]:
+    return {
+        f"{prefix}.{name}"
+        for name, value in vars(module).items()
+        if not name.startswith("_") and inspect.iscoroutinefunction(value) and value.__module__ == module.__name__
+    }
+
+
+async def run_benchmark(args) -> dict:
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix="db_benchmark_")
+    db_path = os.path.join(work_dir, "bench.db")
+    database.db_pool.db_path = db_path
+    database.analytics_snapshot.source_path = db_path
+    database.analytics_snapshot.snapshot_path = os.path.join(work_dir, "bench_snapshot.db")
+
+    try:
+        await database.open_db_pool()
+        await database.migrate_db()
+        await database.close_db_pool()
+
+        print(f"Заполнение БД: {args.users} пользователей, {args.results} результатов, {args.games} строк games_stats, "
+              f"{args.events} событий ответов...")
+        started = time.perf_counter()
+        await asyncio.to_thread(seed_database, db_path, args.users, args.results, args.games, args.events, args.word_sets, rng)
+        seed_seconds = time.perf_counter() - started
+
+        await database.open_db_pool()
+        started = time.perf_counter()
+        await database.init_db()
+        init_seconds = time.perf_counter() - started
+
+        counter = QueryCounter()
+        await database.db_pool.set_trace_callback(counter)
+
+        results = {}
+        for name, call, iterations, setup in _benchmark_cases(args.users, args.iterations, rng):
+            if args.only and not any(part in name for part in args.only):
+                continue
+            results[name] = await _time_case(name, call, iterations, counter, setup)
+            stats = results[name]
+            print(f"{name:60} p50 {stats['p50_ms']:9.2f} мс  p95 {stats['p95_ms']:9.2f} мс  "
+                  f"p99 {stats['p99_ms']:9.2f} мс  запросов {stats['queries_per_call']:.1f}")
+
+        await database.db_pool.set_trace_callback(None)
+        db_size_bytes = os.path.getsize(db_path)
+        await database.close_db_pool()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    covered = {name.split("[")[0] for name in results} | NOT_TIMED
+    available = _public_coroutines(database, "database") | _public_coroutines(data_manager, "data_manager")
+    return {
+        "generated_at": datetime.datetime.now().isoformat(),
+        "scale": {
+            "users": args.users,
+            "results": args.results,
+            "games_stats": args.games,
+            "answer_events": args.events,
+            "word_sets": args.word_sets,
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "config": {
+            "db_performance_profile": config.DB_PERFORMANCE_PROFILE,
+            "db_reader_connections": config.DB_READER_CONNECTIONS,
+            "game_stats_flush_max_events": config.GAME_STATS_FLUSH_MAX_EVENTS,
+            "answer_events_batch_size": config.ANSWER_EVENTS_BATCH_SIZE,
+            "user_stats_cache_size": config.USER_STATS_CACHE_SIZE,
+            "sqlite_version": sqlite3.sqlite_version,
+        },
+        "seed_seconds": seed_seconds,
+        "init_db_seconds": init_seconds,
+        "db_size_bytes": db_size_bytes,
+        "results": results,
+        "not_benchmarked": sorted(available - covered) if not args.only else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк функций database.py и utils/data_manager.py на временной БД.")
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--results", type=int, default=2000000)
+    parser.add_argument("--games", type=int, default=500000, help="строк games_stats")
+    parser.add_argument("--events", type=int, default=0, help="строк answer_events")
+    parser.add_argument("--word-sets", type=int, default=2, help="число словарей в синтетических данных")
+    parser.add_argument("--iterations", type=int, default=200, help="вызовов на функцию (тяжелые функции - в 20 раз меньше)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--only", nargs="*", help="замерить только функции, имя которых содержит одну из подстрок")
+    parser.add_argument("--output", default="bench_report.json", help="путь JSON-отчета")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчет записан в {args.output}")
+    if report["not_benchmarked"]:
+        print("Без замера: " + ", ".join(report["not_benchmarked"]))
+
+
+if __name__ == "__main__":
+    main()
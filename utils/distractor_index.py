@@ -0,0 +1,133 @@
+"""Индекс "трудных" вариантов ответа: для каждого перевода словаря - похожие на него переводы.
+
+Похожесть считается по длине, общему началу/окончанию и расстоянию Левенштейна. Кандидаты
+берутся не из всего словаря, а из корзин по началу, окончанию и длине слова, поэтому построение
+стоит O(слов x CANDIDATES_PER_WORD). Индекс новой версии словаря строится из индекса предыдущей:
+пересчитываются только добавленные слова и слова, у которых пропали соседи.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+CANDIDATES_PER_WORD = 40 # Сколько кандидатов брать из корзин для одного слова
+SCORED_PER_WORD = 12 # Сколько лучших по дешевой оценке кандидатов сравнивать по расстоянию Левенштейна
+REBUILD_CHANGE_SHARE = 0.5 # При такой доле изменившихся слов индекс строится заново, а не дополняется
+
+
+def _bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """Расстояние Левенштейна, но не больше limit (дальше считать незачем)."""
+    if abs(len(a) - len(b)) >= limit:
+        return limit
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        row_min = i
+        for j, char_b in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            current.append(value)
+            row_min = min(row_min, value)
+        if row_min >= limit:
+            return limit
+        previous = current
+    return min(previous[-1], limit)
+
+
+def _common_affix(a: str, b: str, reverse: bool = False) -> int:
+    if reverse:
+        a, b = a[::-1], b[::-1]
+    length = 0
+    for char_a, char_b in zip(a, b):
+        if char_a != char_b:
+            break
+        length += 1
+    return length
+
+
+def _quick_score(a_folded: str, b_folded: str) -> float:
+    """Дешевая оценка для отбора кандидатов: разница длины и общее начало/окончание."""
+    affix = min(_common_affix(a_folded, b_folded), 3) + min(_common_affix(a_folded, b_folded, reverse=True), 3)
+    return abs(len(a_folded) - len(b_folded)) - affix
+
+
+def confusion_score(a: str, b: str) -> float:
+    """Чем меньше, тем сильнее b похоже на a."""
+    a_folded, b_folded = a.casefold(), b.casefold()
+    limit = max(len(a_folded), len(b_folded), 1)
+    distance = _bounded_levenshtein(a_folded, b_folded, limit)
+    affix = min(_common_affix(a_folded, b_folded), 3) + min(_common_affix(a_folded, b_folded, reverse=True), 3)
+    return distance / limit + 0.1 * abs(len(a_folded) - len(b_folded)) - 0.1 * affix
+
+
+def _bucket_keys(text: str) -> List[tuple]:
+    folded = text.casefold()
+    # Сначала самые узкие корзины: их кандидаты правдоподобнее
+    return [("p3", folded[:3]), ("s3", folded[-3:]), ("p2", folded[:2]), ("s2", folded[-2:]), ("len", len(folded))]
+
+
+class ConfuserIndex:
+    """Неизменяемый после построения индекс: перевод -> до per_word похожих переводов (самые похожие первыми)."""
+
+    def __init__(self, translations: Iterable[str], per_word: int, previous: Optional["ConfuserIndex"] = None):
+        self.translations = list(translations)
+        self.per_word = per_word
+        self._buckets: Dict[tuple, List[str]] = {}
+        for text in self.translations:
+            for key in _bucket_keys(text):
+                self._buckets.setdefault(key, []).append(text)
+        self._neighbours: Dict[str, List[tuple[float, str]]] = {}
+        self.stats = {"scored_words": 0, "incremental": False}
+
+        if previous is not None and previous.per_word == per_word:
+            current = set(self.translations)
+            old = set(previous.translations)
+            added = [text for text in self.translations if text not in old]
+            removed = old - current
+            if len(added) + len(removed) <= REBUILD_CHANGE_SHARE * max(len(self.translations), 1):
+                self._extend(previous, added, removed)
+                return
+        for text in self.translations:
+            self._neighbours[text] = self._score_neighbours(text)
+
+    def _candidates(self, text: str) -> List[str]:
+        seen = {text}
+        candidates = []
+        for key in _bucket_keys(text):
+            for other in self._buckets.get(key, ()):
+                if other not in seen:
+                    seen.add(other)
+                    candidates.append(other)
+                    if len(candidates) >= CANDIDATES_PER_WORD:
+                        return candidates
+        return candidates
+
+    def _score_neighbours(self, text: str) -> List[tuple[float, str]]:
+        self.stats["scored_words"] += 1
+        folded = text.casefold()
+        candidates = sorted(self._candidates(text), key=lambda other: _quick_score(folded, other.casefold()))
+        scored = sorted((confusion_score(text, other), other) for other in candidates[:SCORED_PER_WORD])
+        return scored[:self.per_word]
+
+    def _extend(self, previous: "ConfuserIndex", added: List[str], removed: set):
+        self.stats["incremental"] = True
+        for text in self.translations:
+            old_neighbours = previous._neighbours.get(text)
+            if old_neighbours is None:
+                continue
+            kept = [entry for entry in old_neighbours if entry[1] not in removed]
+            # Если сосед пропал, а замену без полного пересчета не найти - пересчитываем это слово
+            self._neighbours[text] = kept if len(kept) == len(old_neighbours) else self._score_neighbours(text)
+        added_set = set(added)
+        for text in added:
+            self._neighbours[text] = self._score_neighbours(text)
+            # Новое слово может оказаться ближайшим соседом уже проиндексированных слов
+            for other in self._candidates(text):
+                if other in added_set:
+                    continue
+                neighbours = self._neighbours[other]
+                score = confusion_score(other, text)
+                if len(neighbours) < self.per_word or score < neighbours[-1][0]:
+                    neighbours = sorted(neighbours + [(score, text)])[:self.per_word]
+                    self._neighbours[other] = neighbours
+
+    def get(self, text: str) -> List[str]:
+        """Похожие переводы, самые похожие первыми (пустой список для неизвестного перевода)."""
+        return [other for _, other in self._neighbours.get(text, ())]
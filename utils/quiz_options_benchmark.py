@@ -0,0 +1,76 @@
+"""
+Микро-бенчмарк выбора вариантов ответа (utils.utils.get_quiz_options).
+
+Сравнивает прежнюю реализацию (get_quiz_options_reference: список всех остальных переводов
+и shuffle на каждый вопрос) с выборкой из заранее построенного TranslationPool на словаре
+из неизменяемого снимка реестра. Заодно проверяет, что варианты всегда различны.
+
+Запуск из корня проекта:
+    python -m utils.quiz_options_benchmark --words 10000 --iterations 10000 --output quiz_options_report.json
+"""
+import argparse
+import datetime
+import json
+import random
+import time
+
+from utils.utils import TranslationPool, get_quiz_options, get_quiz_options_reference
+
+
+def _time_calls(function, words, correct_words: list[str], num_options: int) -> tuple[float, int]:
+    """Среднее время вызова в микросекундах и число вопросов с повторяющимися вариантами."""
+    duplicates = 0
+    started = time.perf_counter()
+    for correct_word_ru in correct_words:
+        options = function(correct_word_ru, words, num_options)
+        if len(set(options)) != len(options):
+            duplicates += 1
+    return (time.perf_counter() - started) / len(correct_words) * 1e6, duplicates
+
+
+def run(args) -> dict:
+    rng = random.Random(args.seed)
+    # Часть переводов повторяется, как в реальных словарях (синонимы)
+    translations = [f"перевод{index}" for index in range(max(1, int(args.words * (1 - args.duplicate_share))))]
+    words = tuple({"en": f"word{index}", "ru": rng.choice(translations)} for index in range(args.words))
+    correct_words = [rng.choice(words)["ru"] for _ in range(args.iterations)]
+
+    started = time.perf_counter()
+    TranslationPool(words)
+    pool_build_ms = (time.perf_counter() - started) * 1000
+
+    reference_us, reference_duplicates = _time_calls(get_quiz_options_reference, list(words), correct_words, args.options)
+    pool_us, pool_duplicates = _time_calls(get_quiz_options, words, correct_words, args.options)
+    print(f"Словарь {args.words} слов, {args.iterations} вопросов по {args.options} варианта")
+    print(f"get_quiz_options_reference {reference_us:10.2f} мкс на вопрос, вопросов с повторами {reference_duplicates}")
+    print(f"get_quiz_options           {pool_us:10.2f} мкс на вопрос, вопросов с повторами {pool_duplicates} "
+          f"(построение TranslationPool {pool_build_ms:.2f} мс, один раз на версию словаря)")
+    print(f"Ускорение: x{reference_us / pool_us:.1f}")
+    return {
+        "generated_at": datetime.datetime.now().isoformat(),
+        "scale": {"words": args.words, "iterations": args.iterations, "options": args.options,
+                  "duplicate_share": args.duplicate_share},
+        "reference": {"us_per_call": reference_us, "questions_with_duplicates": reference_duplicates},
+        "translation_pool": {"us_per_call": pool_us, "questions_with_duplicates": pool_duplicates,
+                             "pool_build_ms": pool_build_ms},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Микро-бенчмарк get_quiz_options")
+    parser.add_argument("--words", type=int, default=10000, help="Размер словаря")
+    parser.add_argument("--iterations", type=int, default=10000, help="Сколько вопросов сгенерировать")
+    parser.add_argument("--options", type=int, default=4, help="Вариантов ответа в вопросе")
+    parser.add_argument("--duplicate-share", type=float, default=0.1, help="Доля слов с повторяющимся переводом")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="quiz_options_report.json", help="Куда записать JSON-отчет")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчет записан в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Бенчмарк памяти данных FSM для одновременных игр и тестов.
+
+Сравнивает две схемы при N одновременных сессиях в MemoryStorage:
+    copied_lists     - как раньше: в данные FSM копируется весь словарь (all_words) и слова теста (test_words);
+    registry_indices - сейчас: в данных FSM только word_set_id, word_set_version и индексы вопросов,
+                       слова берутся из общего word_manager.word_set_registry.
+
+Для каждой схемы замеряется память, которую удерживают сессии (tracemalloc), и размер данных
+одной сессии после pickle (столько занимала бы сессия во внешнем хранилище FSM, например Redis).
+
+Запуск из корня проекта:
+    python -m utils.session_memory_benchmark --sessions 1000 --words 5000 --output session_memory_report.json
+"""
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import tracemalloc
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+import config
+from utils.word_manager import WordManager
+
+SET_ID = "bench_words.json"
+
+
+async def _start_copied_lists(state: FSMContext, manager: WordManager, questions: int):
+    words = manager.load_words_from_file(os.path.join(manager.data_dir, "words", SET_ID))
+    await state.update_data(user_id=state.key.user_id, all_words=words, test_words=random.sample(words, questions),
+                            question_num=0, correct_answers=0, num_questions=questions)
+
+
+async def _start_registry_indices(state: FSMContext, manager: WordManager, questions: int):
+    word_set_version, words = manager.word_set_registry.current(SET_ID)
+    await state.update_data(user_id=state.key.user_id, word_set_id=SET_ID, word_set_version=word_set_version,
+                            test_word_indices=random.sample(range(len(words)), questions),
+                            question_num=0, correct_answers=0, num_questions=questions)
+
+
+SCHEMES = {
+    "copied_lists": _start_copied_lists,
+    "registry_indices": _start_registry_indices,
+}
+
+
+async def _measure(scheme: str, manager: WordManager, sessions: int, questions: int) -> dict:
+    storage = MemoryStorage()
+    start_session = SCHEMES[scheme]
+    # Словарь уже загружен в кэш: замеряется только то, что добавляют сами сессии
+    manager.word_set_registry.current(SET_ID)
+    manager.load_words_from_file(os.path.join(manager.data_dir, "words", SET_ID))
+
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for user_id in range(1, sessions + 1):
+        state = FSMContext(bot=None, storage=storage, key=StorageKey(bot_id=0, chat_id=user_id, user_id=user_id))
+        await start_session(state, manager, questions)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sample_data = await storage.get_data(bot=None, key=StorageKey(bot_id=0, chat_id=1, user_id=1))
+    await storage.close()
+    return {
+        "retained_bytes": retained - baseline,
+        "retained_bytes_per_session": (retained - baseline) / sessions,
+        "peak_bytes": peak - baseline,
+        "pickled_bytes_per_session": len(pickle.dumps(sample_data)),
+    }
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    data_dir = tempfile.mkdtemp(prefix="session_bench_")
+    try:
+        manager = WordManager(data_dir=data_dir)
+        words = [{"en": f"word{index}", "ru": f"слово{index}"} for index in range(args.words)]
+        manager.save_words_to_file(words, os.path.join(data_dir, "words", SET_ID))
+
+        results = {}
+        for scheme in SCHEMES:
+            results[scheme] = await _measure(scheme, manager, args.sessions, min(args.questions, args.words))
+            print(f"{scheme:<20} удерживается {results[scheme]['retained_bytes'] / 1024 / 1024:8.2f} МБ "
+                  f"({results[scheme]['retained_bytes_per_session'] / 1024:8.1f} КБ на сессию), "
+                  f"pickle {results[scheme]['pickled_bytes_per_session'] / 1024:8.1f} КБ на сессию")
+        return {
+            "generated_at": datetime.datetime.now().isoformat(),
+            "scale": {"sessions": args.sessions, "words": args.words, "questions": args.questions},
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк памяти данных FSM игровых сессий")
+    parser.add_argument("--sessions", type=int, default=1000, help="Число одновременных сессий")
+    parser.add_argument("--words", type=int, default=5000, help="Размер словаря")
+    parser.add_argument("--questions", type=int, default=config.TEST_QUESTIONS_COUNT, help="Вопросов в тесте")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="session_memory_report.json", help="Куда записать JSON-отчет")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчет записан в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 import random
 import json
+import asyncio
+import logging
+from collections import OrderedDict
+from collections.abc import Sequence
 from .word_manager import word_manager
+from .compiled_word_set import CompiledWordSet
+from .distractor_index import ConfuserIndex
+import config
 import os
 
+logger = logging.getLogger(__name__)
+
+QUIZ_DIFFICULTY_NORMAL = "normal"
+QUIZ_DIFFICULTY_HARD = "hard"
+
+# Translation pools of immutable word sets (registry snapshots), keyed by id() of the word set.
+# The word set itself is kept in the entry so its id() cannot be reused while the entry exists.
+TRANSLATION_POOL_CACHE_SIZE = 64
+_translation_pools: "OrderedDict[int, tuple[Sequence, TranslationPool]]" = OrderedDict()
+
 def shuffle_word(word: str) -> str:
     """Shuffles the letters of a word."""
     word_list = list(word)
@@ -13,8 +30,136 @@ def get_random_word(words: list):
     """Returns a random word from the loaded words."""
     return random.choice(words)
 
-def get_quiz_options(correct_word_ru: str, all_words: list, num_options: int = 4) -> list:
-    """Generates a list of quiz options including the correct answer and incorrect ones."""
+class TranslationPool:
+    """Unique translations of a word set, precomputed once so distractors are sampled in O(k)."""
+
+    def __init__(self, words: Sequence):
+        self.translations: list[str] = list(dict.fromkeys(w["ru"] for w in words))
+        self.positions: dict[str, int] = {ru: index for index, ru in enumerate(self.translations)}
+
+    def __len__(self) -> int:
+        return len(self.translations)
+
+    def sample_distractors(self, correct_word_ru: str, k: int, rng: random.Random = random,
+                           exclude: frozenset[str] = frozenset()) -> list[str]:
+        """Up to k distinct translations other than correct_word_ru and exclude (fewer only if the set has fewer)."""
+        excluded = {self.positions[ru] for ru in exclude | {correct_word_ru} if ru in self.positions}
+        available = len(self.translations) - len(excluded)
+        k = min(k, available)
+        if k <= 0:
+            return []
+        if available <= 2 * k:
+            # Small pool: rejection sampling would mostly hit taken slots, pick from the whole pool
+            candidates = [ru for index, ru in enumerate(self.translations) if index not in excluded]
+            return rng.sample(candidates, k)
+        chosen: set[int] = set()
+        while len(chosen) < k:
+            index = rng.randrange(len(self.translations))
+            if index not in excluded:
+                chosen.add(index)
+        return [self.translations[index] for index in chosen]
+
+
+def get_translation_pool(all_words: Sequence) -> TranslationPool:
+    """TranslationPool for a word set; cached for immutable sets (tuples and compiled sets from the registry)."""
+    if not isinstance(all_words, (tuple, CompiledWordSet)):
+        return TranslationPool(all_words)
+    entry = _translation_pools.get(id(all_words))
+    if entry is not None and entry[0] is all_words:
+        _translation_pools.move_to_end(id(all_words))
+        return entry[1]
+    pool = TranslationPool(all_words)
+    _translation_pools[id(all_words)] = (all_words, pool)
+    while len(_translation_pools) > TRANSLATION_POOL_CACHE_SIZE:
+        _translation_pools.popitem(last=False)
+    return pool
+
+# Latest ConfuserIndex per word set id; the index of the previous version seeds the next one
+_confuser_indexes: dict[str, ConfuserIndex] = {}
+_confuser_index_pools: dict[str, TranslationPool] = {}
+_confuser_index_builds: dict[str, asyncio.Task] = {}
+
+def _build_confuser_index(set_id: str, pool: TranslationPool) -> ConfuserIndex:
+    return ConfuserIndex(pool.translations, config.HARD_DISTRACTORS_PER_WORD, previous=_confuser_indexes.get(set_id))
+
+def _store_confuser_index(set_id: str, pool: TranslationPool, index: ConfuserIndex):
+    _confuser_indexes[set_id] = index
+    _confuser_index_pools[set_id] = pool
+    logger.info(f"[confuser_index] Built for {set_id}: {len(pool)} translations, "
+                f"{index.stats['scored_words']} scored, incremental={index.stats['incremental']}")
+
+async def _build_confuser_index_in_background(set_id: str, pool: TranslationPool):
+    try:
+        index = await asyncio.to_thread(_build_confuser_index, set_id, pool)
+        # A newer version of the set may have started its own build meanwhile
+        if _confuser_index_builds.get(set_id) is asyncio.current_task():
+            _store_confuser_index(set_id, pool, index)
+    except Exception as e:
+        logger.error(f"[confuser_index] Error building index for {set_id}: {e}")
+    finally:
+        if _confuser_index_builds.get(set_id) is asyncio.current_task():
+            del _confuser_index_builds[set_id]
+
+def get_confuser_index(set_id: str, pool: TranslationPool) -> ConfuserIndex | None:
+    """ConfuserIndex for the current version of a word set.
+
+    Small sets are indexed on the spot; larger ones in a background thread, and until that finishes
+    the index of the previous version (or None) is returned.
+    """
+    if _confuser_index_pools.get(set_id) is pool:
+        return _confuser_indexes[set_id]
+    if len(pool) <= config.HARD_DISTRACTORS_SYNC_MAX_WORDS:
+        _store_confuser_index(set_id, pool, _build_confuser_index(set_id, pool))
+        return _confuser_indexes[set_id]
+    building = _confuser_index_builds.get(set_id)
+    if building is None or building.get_name() != str(id(pool)):
+        try:
+            task = asyncio.get_running_loop().create_task(_build_confuser_index_in_background(set_id, pool), name=str(id(pool)))
+            _confuser_index_builds[set_id] = task
+        except RuntimeError: # No running loop (scripts, benchmarks)
+            _store_confuser_index(set_id, pool, _build_confuser_index(set_id, pool))
+    return _confuser_indexes.get(set_id)
+
+def refresh_confuser_index(set_id: str, words: Sequence) -> bool:
+    """Starts rebuilding the index of a changed word set, if the set was indexed before.
+
+    Sets nobody has played in hard mode are left alone: their index is built on first use.
+    """
+    if set_id not in _confuser_indexes and set_id not in _confuser_index_builds:
+        return False
+    get_confuser_index(set_id, get_translation_pool(words))
+    return True
+
+def drop_confuser_index(set_id: str):
+    """Forgets the index of a deleted word set."""
+    _confuser_indexes.pop(set_id, None)
+    _confuser_index_pools.pop(set_id, None)
+    building = _confuser_index_builds.pop(set_id, None)
+    if building is not None:
+        building.cancel()
+
+def get_quiz_options(correct_word_ru: str, all_words: Sequence, num_options: int = 4,
+                     difficulty: str = QUIZ_DIFFICULTY_NORMAL, set_id: str | None = None) -> list:
+    """Generates a list of distinct quiz options: the correct answer and up to num_options - 1 other translations.
+
+    difficulty="hard" takes distractors among translations similar to the correct one (see utils.distractor_index);
+    it needs set_id (the word set file name) and falls back to random distractors while the index is not ready.
+    """
+    pool = get_translation_pool(all_words)
+    hard: list[str] = []
+    if difficulty == QUIZ_DIFFICULTY_HARD and set_id is not None:
+        index = get_confuser_index(set_id, pool)
+        if index is not None:
+            # Index of a previous version may still mention removed translations
+            neighbours = [ru for ru in index.get(correct_word_ru) if ru in pool.positions and ru != correct_word_ru]
+            hard = random.sample(neighbours, min(num_options - 1, len(neighbours)))
+    options = [correct_word_ru] + hard
+    options.extend(pool.sample_distractors(correct_word_ru, num_options - len(options), exclude=frozenset(hard)))
+    random.shuffle(options)
+    return options
+
+def get_quiz_options_reference(correct_word_ru: str, all_words: list, num_options: int = 4) -> list:
+    """Previous O(n) implementation (shuffles every other translation). Kept for the quiz options benchmark."""
     options = [correct_word_ru]
     incorrect_words = [w["ru"] for w in all_words if w["ru"] != correct_word_ru]
     random.shuffle(incorrect_words)
@@ -27,7 +172,7 @@ def get_quiz_options(correct_word_ru: str, all_words: list, num_options: int = 4
 
 async def add_word(new_word: dict, filename: str = "all_words.json") -> bool:
     """Adds a new word to the specified file."""
-    return word_manager.add_word_to_file(filename, new_word)
+    return await word_manager.add_word_to_file_async(filename, new_word)
 
 async def get_words_alphabetical(filename: str = "all_words.json") -> list[dict]:
     """Loads words from the specified file and returns them sorted alphabetically by English word."""
@@ -38,4 +183,4 @@ async def get_words_alphabetical(filename: str = "all_words.json") -> list[dict]
 
 async def delete_word(word_to_delete_en: str, filename: str = "all_words.json") -> bool:
     """Deletes a word from the specified file by its English representation."""
-    return word_manager.delete_word_from_file(filename, word_to_delete_en)
+    return await word_manager.delete_word_from_file_async(filename, word_to_delete_en)
@@ -0,0 +1,129 @@
+"""Потоковый импорт слов в словарь из CSV, TSV и JSONL (команда /import_words).
+
+Файл читается построчно в отдельном потоке порциями по IMPORT_CHUNK_ROWS строк, поэтому память
+не зависит от размера файла: держится только текущая порция и принятые новые слова. Каждая
+строка проверяется (две непустые строки en/ru), сверяется с индексом словаря (WordSet) и уже
+принятыми строками файла и со списком запрещенных слов. Принятые слова добавляются в словарь
+одной правкой - JSON перезаписывается атомарно один раз в конце.
+
+Форматы:
+    .csv / .tsv  две колонки "английское слово", "перевод"; строка заголовка en,ru пропускается;
+    .jsonl       по объекту {"en": ..., "ru": ...} в строке.
+"""
+
+import asyncio
+import csv
+import itertools
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from .bad_words import is_bad_word
+from .word_manager import WordManager
+
+SUPPORTED_FORMATS = {".csv": ",", ".tsv": "\t", ".jsonl": None} # Расширение -> разделитель колонок
+IMPORT_CHUNK_ROWS = 2000 # Сколько строк разбирать в потоке за один раз
+MAX_ERROR_EXAMPLES = 5 # Сколько примеров ошибочных строк показать в отчете
+HEADER_ROWS = {("en", "ru"), ("english", "russian")}
+
+
+def detect_format(document_name: str) -> Optional[str]:
+    """Расширение поддерживаемого формата ('.csv', '.tsv', '.jsonl') или None."""
+    extension = os.path.splitext(document_name or "")[1].lower()
+    return extension if extension in SUPPORTED_FORMATS else None
+
+
+def normalize_word(text: str) -> str:
+    """Как в /add: пробелы схлопываются, регистр нижний."""
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+
+def _parse_columns(columns: List[str]) -> tuple[str, str]:
+    while columns and not columns[-1].strip():
+        columns = columns[:-1]
+    if len(columns) != 2:
+        raise ValueError(f"ожидалось 2 колонки, а не {len(columns)}")
+    return columns[0], columns[1]
+
+
+def _parse_json_line(line: str) -> tuple[str, str]:
+    try:
+        word_pair = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"некорректный JSON ({e.msg})")
+    if not isinstance(word_pair, dict) or not isinstance(word_pair.get("en"), str) or not isinstance(word_pair.get("ru"), str):
+        raise ValueError('ожидался объект {"en": "...", "ru": "..."}')
+    return word_pair["en"], word_pair["ru"]
+
+
+def iter_rows(source_path: str, file_format: str) -> Iterator[tuple[int, Optional[Dict[str, str]], Optional[str]]]:
+    """Строки файла по одной: (номер строки, пара слов или None, описание ошибки или None). Пустые строки пропускаются."""
+    delimiter = SUPPORTED_FORMATS[file_format]
+    # utf-8-sig: CSV из Excel начинается с BOM
+    with open(source_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if delimiter is None:
+            rows = ((line_number, line) for line_number, line in enumerate(f, 1) if line.strip())
+        else:
+            reader = csv.reader(f, delimiter=delimiter)
+            rows = ((reader.line_num, columns) for columns in reader if any(column.strip() for column in columns))
+        first = True
+        for line_number, row in rows:
+            try:
+                en_word, ru_word = _parse_json_line(row) if delimiter is None else _parse_columns(row)
+                en_word, ru_word = normalize_word(en_word), normalize_word(ru_word)
+                if first and (en_word, ru_word) in HEADER_ROWS:
+                    continue
+                if not en_word or not ru_word:
+                    raise ValueError("пустое слово или перевод")
+                yield line_number, {"en": en_word, "ru": ru_word}, None
+            except ValueError as e:
+                yield line_number, None, str(e)
+            finally:
+                first = False
+
+
+async def import_words(manager: WordManager, filename: str, source_path: str, file_format: str,
+                       progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None) -> Dict[str, Any]:
+    """Импортирует слова из source_path в словарь filename (файл должен существовать).
+
+    progress(report) вызывается после каждой порции строк. Возвращает отчет: сколько строк прочитано,
+    добавлено, пропущено как дубликаты, ошибочных и запрещенных, плюс примеры ошибок.
+    """
+    word_set = manager.get_word_set(os.path.join(manager.data_dir, "words", filename))
+    report = {"lines": 0, "added": 0, "duplicates": 0, "invalid": 0, "bad_words": 0, "errors": [], "saved": True}
+    new_words: List[Dict[str, str]] = []
+    seen = set()
+    rows = iter_rows(source_path, file_format)
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(itertools.islice(rows, IMPORT_CHUNK_ROWS)))
+        if not chunk:
+            break
+        for line_number, word_pair, error in chunk:
+            report["lines"] = line_number
+            if word_pair is None:
+                report["invalid"] += 1
+                if len(report["errors"]) < MAX_ERROR_EXAMPLES:
+                    report["errors"].append(f"строка {line_number}: {error}")
+                continue
+            key = word_pair["en"].casefold()
+            if key in seen or word_pair["en"] in word_set:
+                report["duplicates"] += 1
+            elif is_bad_word(word_pair["en"]) or is_bad_word(word_pair["ru"]):
+                report["bad_words"] += 1
+            else:
+                seen.add(key)
+                new_words.append(word_pair)
+        if progress is not None:
+            report["added"] = len(new_words)
+            await progress(report)
+
+    report["added"] = 0
+    if new_words:
+        added = await manager.add_words_to_file_async(filename, new_words)
+        report["saved"] = added is not None
+        if report["saved"]:
+            report["added"] = added
+            # Слова, добавленные другими правками за время импорта, тоже дубликаты
+            report["duplicates"] += len(new_words) - added
+    return report
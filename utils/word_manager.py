@@ -7,21 +7,332 @@ import logging
 import datetime
 import re # Added import
 import asyncio # Added import
+import time
+import stat
+import tempfile
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, Sequence
 import database # Already present
 import config # Import config
+from utils.compiled_word_set import CompiledWordSet, compile_word_set, open_if_fresh
 
 logger = logging.getLogger(__name__)
 
+# umask читается один раз при импорте: os.umask меняет его для всего процесса, а запись идет в потоках
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def _replacement_mode(file_path: str) -> int:
+    """Права для файла, который заменит file_path: как у текущего файла, для нового - 0o644 с учетом umask.
+
+    tempfile.mkstemp создает файл с правами 0o600, без chmod словари после записи стали бы доступны только владельцу.
+    """
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        return 0o644 & ~_UMASK
+
+def _write_json_atomic(file_path: str, data: Any):
+    """Записывает JSON во временный файл рядом с целевым и атомарно подменяет его (os.replace).
+
+    При сбое посреди записи на диске остается либо старая, либо новая версия файла, но не обрезанная.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, _replacement_mode(file_path))
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class WordSet:
+    """Словарь в памяти: слова в исходном порядке плюс индекс по en (casefold) -> позиции.
+
+    Поиск, добавление, удаление слова и подсчет - O(1); удаление дубликатов проходит
+    только по словам, у которых есть дубликаты. to_list() возвращает слова в формате JSON-файла.
+    """
+
+    def __init__(self, words: Optional[Iterable[Dict[str, str]]] = None):
+        self._words: Dict[int, Dict[str, str]] = {} # Позиция -> пара слов; dict сохраняет порядок добавления
+        self._index: Dict[str, List[int]] = {} # en (casefold) -> позиции, несколько - если есть дубликаты
+        self._duplicate_keys: set[str] = set()
+        self._next_position = 0
+        if words:
+            for word_pair in words:
+                self.add(word_pair)
+
+    @staticmethod
+    def _key(en_word: str) -> str:
+        return en_word.casefold()
+
+    def __len__(self) -> int:
+        return len(self._words)
+
+    def __contains__(self, en_word: str) -> bool:
+        return self._key(en_word) in self._index
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        return iter(self._words.values())
+
+    @property
+    def duplicates_count(self) -> int:
+        return sum(len(self._index[key]) - 1 for key in self._duplicate_keys)
+
+    def get(self, en_word: str) -> Optional[Dict[str, str]]:
+        """Первая пара слов с таким английским словом или None."""
+        positions = self._index.get(self._key(en_word))
+        return self._words[positions[0]] if positions else None
+
+    def add(self, word_pair: Dict[str, str]):
+        """Добавляет пару слов в конец (дубликаты допускаются, как и в JSON-файле)."""
+        key = self._key(word_pair['en'])
+        position = self._next_position
+        self._next_position += 1
+        self._words[position] = word_pair
+        positions = self._index.setdefault(key, [])
+        positions.append(position)
+        if len(positions) > 1:
+            self._duplicate_keys.add(key)
+
+    def remove(self, en_word: str) -> int:
+        """Удаляет все пары с таким английским словом. Возвращает количество удаленных."""
+        key = self._key(en_word)
+        positions = self._index.pop(key, [])
+        for position in positions:
+            del self._words[position]
+        self._duplicate_keys.discard(key)
+        return len(positions)
+
+    def remove_duplicates(self) -> int:
+        """Оставляет для каждого английского слова первую пару. Возвращает количество удаленных."""
+        removed = 0
+        for key in self._duplicate_keys:
+            positions = self._index[key]
+            for position in positions[1:]:
+                del self._words[position]
+            removed += len(positions) - 1
+            self._index[key] = positions[:1]
+        self._duplicate_keys.clear()
+        return removed
+
+    def replace(self, words: Iterable[Dict[str, str]]):
+        """Заменяет содержимое целиком."""
+        self._words.clear()
+        self._index.clear()
+        self._duplicate_keys.clear()
+        for word_pair in words:
+            self.add(word_pair)
+
+    def to_list(self) -> List[Dict[str, str]]:
+        return list(self._words.values())
+
+
+class WordSetCache:
+    """Кэш разобранных файлов словарей в памяти процесса.
+
+    Ключ - абсолютный путь, запись действительна, пока у файла те же (mtime, size, inode):
+    любое изменение файла, в том числе вручную или другим процессом, приводит к перечитыванию.
+    Вытеснение LRU по суммарному числу слов во всех записях (max_words).
+    """
+
+    def __init__(self, max_words: int):
+        self.max_words = max(1, max_words)
+        # path -> (ключ файла, словарь, число слов на момент сохранения в кэш)
+        self._entries: OrderedDict[str, tuple[tuple[int, int, int], WordSet, int]] = OrderedDict()
+        self._total_words = 0
+        self.stats: Dict[str, Any] = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_ms_total": 0.0,
+            "last_load_ms": None,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def _file_key(file_path: str) -> tuple[int, int, int]:
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _remove(self, path: str):
+        entry = self._entries.pop(path, None)
+        if entry is not None:
+            self._total_words -= entry[2]
+
+    def _store(self, path: str, key: tuple[int, int, int], word_set: WordSet):
+        self._remove(path)
+        self._entries[path] = (key, word_set, len(word_set))
+        self._total_words += len(word_set)
+        # Последнюю запись не вытесняем, даже если один словарь больше max_words
+        while self._total_words > self.max_words and len(self._entries) > 1:
+            _, (_, _, evicted_count) = self._entries.popitem(last=False)
+            self._total_words -= evicted_count
+            self.stats["evictions"] += 1
+
+    def get_word_set(self, file_path: str) -> WordSet:
+        """Разобранный словарь файла. Объект общий - менять его можно только через WordManager.
+        Ошибки чтения пробрасываются."""
+        path = os.path.abspath(file_path)
+        try:
+            key = self._file_key(path)
+        except FileNotFoundError:
+            self._remove(path)
+            raise
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            self._entries.move_to_end(path)
+            self.stats["hits"] += 1
+            return entry[1]
+
+        self.stats["misses"] += 1
+        started = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            word_set = WordSet(json.load(f))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.stats["loads"] += 1
+        self.stats["load_ms_total"] += elapsed_ms
+        self.stats["last_load_ms"] = elapsed_ms
+        self._store(path, key, word_set)
+        return word_set
+
+    @classmethod
+    def read_file(cls, file_path: str) -> tuple[tuple[int, int, int], WordSet]:
+        """Читает и разбирает файл без обращения к кэшу (можно вызывать из другого потока)."""
+        key = cls._file_key(file_path)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return key, WordSet(json.load(f))
+
+    def cached_key(self, file_path: str) -> Optional[tuple[int, int, int]]:
+        """Ключ (mtime, size, inode), с которым файл лежит в кэше, или None."""
+        entry = self._entries.get(os.path.abspath(file_path))
+        return entry[0] if entry is not None else None
+
+    def store(self, file_path: str, key: tuple[int, int, int], word_set: WordSet):
+        """Кладет в кэш словарь, прочитанный read_file."""
+        self._store(os.path.abspath(file_path), key, word_set)
+
+    def get(self, file_path: str) -> List[Dict[str, str]]:
+        """Слова из файла (копия списка - вызывающий код может его сортировать и дополнять). Ошибки чтения пробрасываются."""
+        return self.get_word_set(file_path).to_list()
+
+    def put(self, file_path: str, words: "List[Dict[str, str]] | WordSet"):
+        """Обновляет запись после записи файла этим процессом, без повторного чтения."""
+        path = os.path.abspath(file_path)
+        try:
+            key = self._file_key(path)
+        except FileNotFoundError:
+            self._remove(path)
+            return
+        self._store(path, key, words if isinstance(words, WordSet) else WordSet(words))
+
+    def invalidate(self, file_path: str):
+        self._remove(os.path.abspath(file_path))
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else None,
+            "entries": len(self._entries),
+            "words": self._total_words,
+        }
+
+
+class WordSetRegistry:
+    """Общие неизменяемые снимки словарей для игр и тестов.
+
+    В данных FSM хранятся только имя файла (set_id), номер версии и индексы слов; сами слова
+    берутся отсюда. Новая версия появляется, когда меняется файл словаря (или его компилированная
+    версия). Старые версии живут, пока к ним обращаются начатые сессии, и удаляются через ttl секунд
+    без обращений; для неизвестной версии возвращается текущая.
+    """
+
+    def __init__(self, manager: "WordManager", ttl: float):
+        self._manager = manager
+        self.ttl = ttl
+        # set_id -> {версия: [ключ файла, слова, время последнего обращения]}, последняя версия - текущая
+        self._versions: Dict[str, OrderedDict[int, list]] = {}
+        self._next_version = 1
+
+    def current(self, set_id: str) -> tuple[int, Sequence[Dict[str, str]]]:
+        """Текущая версия словаря: (номер версии, слова только для чтения)."""
+        now = time.monotonic()
+        versions = self._versions.setdefault(set_id, OrderedDict())
+        file_path = os.path.join(self._manager.data_dir, "words", set_id)
+        compiled = self._manager.get_compiled_word_set(file_path)
+        if compiled is not None:
+            key = ("compiled",) + compiled.source_key
+        else:
+            try:
+                key = WordSetCache._file_key(file_path)
+            except FileNotFoundError:
+                key = None
+        if versions:
+            version, entry = next(reversed(versions.items()))
+            if entry[0] == key:
+                entry[2] = now
+                return version, entry[1]
+
+        if compiled is not None:
+            words = compiled
+        elif key is None:
+            words = ()
+        else:
+            words = tuple(self._manager.get_word_set(file_path))
+        version = self._next_version
+        self._next_version += 1
+        versions[version] = [key, words, now]
+        # Старые версии, к которым давно не обращались, больше никому не нужны
+        for old_version in [v for v, entry in versions.items() if v != version and now - entry[2] > self.ttl]:
+            del versions[old_version]
+        return version, words
+
+    def is_tracked(self, set_id: str) -> bool:
+        """Есть ли у словаря версии (он используется в играх или тестах)."""
+        return bool(self._versions.get(set_id))
+
+    def get(self, set_id: str, version: int) -> Sequence[Dict[str, str]]:
+        """Слова указанной версии (или текущей, если эта версия уже удалена)."""
+        versions = self._versions.get(set_id)
+        entry = versions.get(version) if versions else None
+        if entry is None:
+            return self.current(set_id)[1]
+        entry[2] = time.monotonic()
+        return entry[1]
+
+
 class WordManager:
     """Класс для управления файлами слов и переключения между ними."""
     
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
+        # Старый файл с активными словарями пользователей; переносится в БД в load_user_current_files
         self.config_file_path = os.path.join(self.data_dir, "config", "config.json")
-        # Словарь для хранения выбранных файлов и display_name для каждого пользователя
+        # Выбранные файлы и display_name для каждого пользователя (копия таблицы user_word_sets в памяти)
         self.user_current_files: Dict[int, Dict[str, str]] = {} 
+        self.word_set_cache = WordSetCache(config.WORD_SET_CACHE_MAX_WORDS)
+        # Асинхронная запись словарей: правки одного файла сериализуются и склеиваются в одну запись
+        self._write_locks: Dict[str, asyncio.Lock] = {}
+        self._latest_words: Dict[str, WordSet] = {} # Версия словаря с еще не записанными правками
+        self._dirty_paths: set[str] = set()
+        self._write_waiters: Dict[str, List[asyncio.Future]] = {}
+        self._write_tasks: Dict[str, asyncio.Task] = {}
+        self.write_stats: Dict[str, int] = {"edits": 0, "writes": 0, "failures": 0}
+        # Открытые компилированные словари (utils/compiled_word_set.py): путь к JSON -> CompiledWordSet
+        self._compiled: Dict[str, CompiledWordSet] = {}
+        self.word_set_registry = WordSetRegistry(self, config.WORD_SET_REGISTRY_TTL_SECONDS)
+        # Каталог файлов для /files: имя файла -> ключ файла, число слов и размер (без разбора файла при каждом запросе)
+        self.file_catalog: Dict[str, Dict[str, Any]] = {}
         self._ensure_data_dir()
-        self._load_config() # Загружаем конфигурацию при инициализации
     
     def _ensure_data_dir(self):
         """Создает директории данных, если они не существуют."""
@@ -32,8 +343,9 @@ class WordManager:
         images_dir = os.path.join(main_data_dir, "images")
         temp_audio_dir = os.path.join(sounds_dir, "temp_audio") # Moved temp_audio inside sounds_dir
         db_dir = os.path.join(main_data_dir, "db")
+        compiled_words_dir = os.path.join(words_dir, "compiled")
         
-        for d in [main_data_dir, words_dir, config_dir, sounds_dir, images_dir, temp_audio_dir, db_dir]:
+        for d in [main_data_dir, words_dir, config_dir, sounds_dir, images_dir, temp_audio_dir, db_dir, compiled_words_dir]:
             if not os.path.exists(d):
                 os.makedirs(d)
                 logger.debug(f"[_ensure_data_dir] Created directory: {d}")
@@ -48,55 +360,49 @@ class WordManager:
         sanitized_display_name = self._get_sanitized_name(display_name)
         return f"{user_id}_{sanitized_display_name}"
 
-    def _load_config(self):
-        """Загружает текущие активные файлы для пользователей из конфига."""
+    def _read_legacy_config(self) -> Optional[Dict[int, Dict[str, str]]]:
+        """Читает активные файлы пользователей из старого config.json. None, если файла нет или он поврежден."""
         try:
             with open(self.config_file_path, 'r', encoding='utf-8') as f:
                 config = json.load(f)
-                if 'user_current_files' in config and isinstance(config['user_current_files'], dict):
-                    temp_user_files: Dict[int, Dict[str, str]] = {} 
-                    for key_str, filename in config['user_current_files'].items():
-                        try:
-                            user_id_int = int(key_str) # Attempt to parse as old format (int user ID)
-                            # If old format, store with a placeholder display_name, it will be updated by set_user_current_file
-                            temp_user_files[user_id_int] = {"filename": filename, "display_name": "Unknown User"}
-                            logger.info(f"[_load_config] Loaded old config key for user {user_id_int} with filename {filename}.")
-                        except ValueError: # New format key (user_id_display_name)
-                            parts = key_str.split('_', 1) # Split only on first underscore
-                            if parts and parts[0].isdigit():
-                                user_id_int = int(parts[0])
-                                # Extract display name from the key, removing user_id_ prefix
-                                display_name_from_key = parts[1].replace('_', ' ') if len(parts) > 1 else "Unknown User"
-                                temp_user_files[user_id_int] = {"filename": filename, "display_name": display_name_from_key}
-                                logger.info(f"[_load_config] Loaded new config key for user {user_id_int} with filename {filename} and display name {display_name_from_key}.")
-                            else:
-                                logger.warning(f"[_load_config] Invalid key format in config file: {key_str}. Skipping.")
-
-                    self.user_current_files = temp_user_files
-                    logger.info(f"[_load_config] Final loaded user_current_files: {self.user_current_files}")
-                else:
-                    logger.warning(f"[_load_config] 'user_current_files' key not found or invalid in {self.config_file_path}. Initializing empty.")
         except FileNotFoundError:
-            logger.info(f"[_load_config] Configuration file {self.config_file_path} not found. Initializing empty user_current_files.")
-            self.user_current_files = {}
+            return None
         except json.JSONDecodeError as e:
-            logger.error(f"[_load_config] Error decoding JSON from {self.config_file_path}: {e}")
-            self.user_current_files = {}
+            logger.error(f"[_read_legacy_config] Error decoding JSON from {self.config_file_path}: {e}")
+            return None
 
-    def _save_config(self):
-        """Сохраняет текущие активные файлы для пользователей в конфиг."""
-        try:
-            with open(self.config_file_path, 'w', encoding='utf-8') as f:
-                saved_files: Dict[str, str] = {} # type: ignore
-                for user_id, user_data in self.user_current_files.items():
-                    # Generate descriptive key for JSON based on current user_id and stored display_name
-                    descriptive_key = self._get_descriptive_key_for_json(user_id, user_data.get("display_name", "Unknown User"))
-                    saved_files[descriptive_key] = user_data["filename"]
-
-                json.dump({'user_current_files': saved_files}, f, ensure_ascii=False, indent=4)
-            logger.info(f"[_save_config] Saved user_current_files: {saved_files}") # Log saved_files, not self.user_current_files
-        except Exception as e:
-            logger.error(f"[_save_config] Error saving configuration {self.config_file_path}: {e}")
+        user_files: Dict[int, Dict[str, str]] = {}
+        if 'user_current_files' not in config or not isinstance(config['user_current_files'], dict):
+            logger.warning(f"[_read_legacy_config] 'user_current_files' key not found or invalid in {self.config_file_path}.")
+            return user_files
+        for key_str, filename in config['user_current_files'].items():
+            try:
+                user_id_int = int(key_str) # Old format (int user ID)
+                user_files[user_id_int] = {"filename": filename, "display_name": "Unknown User"}
+            except ValueError: # New format key (user_id_display_name)
+                parts = key_str.split('_', 1) # Split only on first underscore
+                if parts and parts[0].isdigit():
+                    user_id_int = int(parts[0])
+                    # Extract display name from the key, removing user_id_ prefix
+                    display_name_from_key = parts[1].replace('_', ' ') if len(parts) > 1 else "Unknown User"
+                    user_files[user_id_int] = {"filename": filename, "display_name": display_name_from_key}
+                else:
+                    logger.warning(f"[_read_legacy_config] Invalid key format in config file: {key_str}. Skipping.")
+        return user_files
+
+    async def load_user_current_files(self):
+        """Загружает активные файлы пользователей из БД (вызывается после init_db).
+
+        Если остался старый config.json, его содержимое один раз переносится в таблицу user_word_sets
+        (значения, уже записанные в БД, важнее), а файл переименовывается в config.json.imported.
+        """
+        legacy_user_files = self._read_legacy_config()
+        if legacy_user_files is not None:
+            imported = await database.import_user_word_sets(legacy_user_files)
+            os.replace(self.config_file_path, self.config_file_path + ".imported")
+            logger.info(f"[load_user_current_files] Imported {imported} of {len(legacy_user_files)} user word sets from {self.config_file_path}")
+        self.user_current_files = await database.get_all_user_word_sets()
+        logger.info(f"[load_user_current_files] Loaded word sets for {len(self.user_current_files)} users")
     
     def get_available_files(self) -> List[str]:
         """Возвращает список доступных файлов со словами."""
@@ -114,23 +420,32 @@ class WordManager:
         """Возвращает имя текущего файла для конкретного пользователя."""
         user_data = self.user_current_files.get(user_id)
         filename = user_data['filename'] if user_data else config.DEFAULT_WORD_SET
-        logger.info(f"[get_user_current_file] For user {user_id}, returning filename: {filename}")
+        logger.debug(f"[get_user_current_file] For user {user_id}, returning filename: {filename}")
         return filename
     
-    def set_user_current_file(self, user_id: int, filename: str, user_display_name: str) -> bool:
-        """Устанавливает текущий файл слов для конкретного пользователя, обновляя его display_name."""
+    async def set_user_current_file(self, user_id: int, filename: str, user_display_name: str) -> bool:
+        """Устанавливает текущий файл слов для конкретного пользователя, обновляя его display_name.
+        В БД пишет, только если файл или display_name изменились."""
         if not filename.endswith('.json'):
             filename += '.json'
         
         file_path = os.path.join(self.data_dir, "words", filename)
-        if os.path.exists(file_path):
-            self.user_current_files[user_id] = {"filename": filename, "display_name": user_display_name}
-            self._save_config() # Сохраняем изменение в конфиг
-            logger.info(f"[set_user_current_file] User {user_id} ({user_display_name}) set current file to: {filename}")
+        if not os.path.exists(file_path):
+            logger.warning(f"[set_user_current_file] File not found, cannot set current file for user {user_id} ({user_display_name}): {filename}")
+            return False
+
+        user_data = {"filename": filename, "display_name": user_display_name}
+        if self.user_current_files.get(user_id) == user_data:
             return True
-        logger.warning(f"[set_user_current_file] File not found, cannot set current file for user {user_id} ({user_display_name}): {filename}")
-        return False
+        await database.set_user_word_set(user_id, filename, user_display_name)
+        self.user_current_files[user_id] = user_data
+        logger.info(f"[set_user_current_file] User {user_id} ({user_display_name}) set current file to: {filename}")
+        return True
     
+    def discard_user(self, user_id: int):
+        """Забывает активный файл удаленного пользователя (строку в БД удаляет delete_user_from_db)."""
+        self.user_current_files.pop(user_id, None)
+
     def get_current_file_path(self, user_id: int = None) -> str:
         """Возвращает полный путь к текущему файлу. Если user_id не указан, использует общий 'all_words.json'."""
         if user_id is not None:
@@ -148,15 +463,64 @@ class WordManager:
         return self.load_words_from_file(file_path)
     
     def load_words_from_file(self, file_path: str) -> List[Dict[str, str]]:
-        """Загружает слова из указанного файла."""
+        """Загружает слова из указанного файла (через word_set_cache - файл читается, только если он изменился)."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                words = json.load(f)
+            words = self.word_set_cache.get(file_path)
             logger.debug(f"[load_words_from_file] Successfully loaded {len(words)} words from: {file_path}")
             return words
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logger.error(f"[load_words_from_file] Error loading file {file_path}: {e}")
             return []
+
+    def _compiled_path(self, file_path: str) -> str:
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self.data_dir, "words", "compiled", f"{name}.wset")
+
+    def get_compiled_word_set(self, file_path: str) -> Optional[CompiledWordSet]:
+        """Компилированная версия словаря, если она есть и построена из текущего JSON, иначе None."""
+        path = os.path.abspath(file_path)
+        if not config.WORD_SET_COMPILED_ENABLED or path in self._latest_words:
+            return None
+        compiled = open_if_fresh(path, self._compiled_path(path), self._compiled.get(path))
+        if compiled is None:
+            self._compiled.pop(path, None)
+        else:
+            self._compiled[path] = compiled
+        return compiled
+
+    def get_words_view(self, file_path: str) -> Sequence[Dict[str, str]]:
+        """Слова файла для чтения по индексу: компилированный словарь без разбора всего файла,
+        если он свежий, иначе список из JSON (как load_words_from_file)."""
+        compiled = self.get_compiled_word_set(file_path)
+        if compiled is not None:
+            return compiled
+        return self.load_words_from_file(file_path)
+
+    def load_words_view(self, user_id: int = None) -> Sequence[Dict[str, str]]:
+        """get_words_view для текущего файла пользователя."""
+        return self.get_words_view(self.get_current_file_path(user_id))
+
+    def compile_file(self, filename: str) -> int:
+        """Строит компилированную версию словаря. Возвращает число слов; ValueError, если формат файла не подходит."""
+        if not filename.endswith('.json'):
+            filename += '.json'
+        file_path = os.path.abspath(os.path.join(self.data_dir, "words", filename))
+        count = compile_word_set(file_path, self._compiled_path(file_path))
+        self._compiled.pop(file_path, None)
+        logger.info(f"[compile_file] Compiled {count} words from: {file_path}")
+        return count
+
+    def get_word_set(self, file_path: str) -> WordSet:
+        """Текущая версия словаря (с учетом еще не записанных правок) для проверок и подсчета без копирования.
+        Объект только для чтения; для отсутствующего или поврежденного файла возвращается пустой WordSet."""
+        path = os.path.abspath(file_path)
+        if path in self._latest_words:
+            return self._latest_words[path]
+        try:
+            return self.word_set_cache.get_word_set(path)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            logger.error(f"[get_word_set] Error loading file {file_path}: {e}")
+            return WordSet()
     
     def save_words(self, words: List[Dict[str, str]], user_id: int = None) -> bool:
         """Сохраняет слова в текущий файл для пользователя или общий файл."""
@@ -165,32 +529,116 @@ class WordManager:
         return self.save_words_to_file(words, file_path)
     
     def save_words_to_file(self, words: List[Dict[str, str]], file_path: str) -> bool:
-        """Сохраняет слова в указанный файл."""
+        """Сохраняет слова в указанный файл (атомарно, через временный файл)."""
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(words, f, ensure_ascii=False)
+            _write_json_atomic(file_path, words)
+            self.word_set_cache.put(file_path, words)
             logger.debug(f"[save_words_to_file] Successfully saved {len(words)} words from: {file_path}")
             return True
         except Exception as e:
             logger.error(f"[save_words_to_file] Error saving file {file_path}: {e}")
             return False
     
-    def add_word_to_file(self, filename: str, word_pair: Dict[str, str]) -> bool:
-        """Добавляет слово в указанный файл."""
+    async def _modify_words_file(self, file_path: str, mutate: Callable[[WordSet], bool]) -> bool:
+        """Применяет mutate к словарю файла и дожидается записи, в которую попала эта правка.
+
+        mutate меняет WordSet на месте (текущая версия с учетом еще не записанных правок)
+        и возвращает False, если менять нечего. Возвращает True, если правка записана на диск.
+        """
+        path = os.path.abspath(file_path)
+        lock = self._write_locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            word_set = self.get_word_set(path)
+            if not mutate(word_set):
+                return False
+            self._latest_words[path] = word_set
+            self._dirty_paths.add(path)
+            self.write_stats["edits"] += 1
+            written = asyncio.get_running_loop().create_future()
+            self._write_waiters.setdefault(path, []).append(written)
+            if path not in self._write_tasks:
+                self._write_tasks[path] = asyncio.create_task(self._write_loop(path))
+        return await written
+
+    async def _write_loop(self, path: str):
+        """Записывает последнюю версию словаря, пока для него есть незаписанные правки."""
+        try:
+            while path in self._dirty_paths:
+                # Даем набежать остальным правкам из пачки - они попадут в эту же запись
+                await asyncio.sleep(config.WORD_SET_WRITE_COALESCE_SECONDS)
+                self._dirty_paths.discard(path)
+                word_set = self._latest_words[path]
+                # Снимок в потоке цикла событий: WordSet продолжает меняться, пока файл пишется
+                words = word_set.to_list()
+                waiters = self._write_waiters.pop(path, [])
+                try:
+                    await asyncio.to_thread(_write_json_atomic, path, words)
+                    self.word_set_cache.put(path, word_set)
+                    self.write_stats["writes"] += 1
+                    logger.debug(f"[_write_loop] Saved {len(words)} words ({len(waiters)} edits) to: {path}")
+                    saved = True
+                except Exception as e:
+                    self.write_stats["failures"] += 1
+                    logger.error(f"[_write_loop] Error saving file {path}: {e}")
+                    # В кэше мог остаться измененный на месте WordSet - дальше читаем файл заново
+                    self.word_set_cache.invalidate(path)
+                    saved = False
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(saved)
+                if saved and os.path.exists(self._compiled_path(path)):
+                    await self._recompile(path)
+        finally:
+            self._write_tasks.pop(path, None)
+            if path not in self._dirty_paths:
+                # Файл совпадает с последней версией (или запись не удалась) - дальше читаем с диска
+                self._latest_words.pop(path, None)
+
+    async def _recompile(self, path: str):
+        """Обновляет уже существующую компилированную версию после записи JSON."""
+        try:
+            await asyncio.to_thread(compile_word_set, path, self._compiled_path(path))
+            self._compiled.pop(path, None)
+        except Exception as e:
+            # Устаревший .wset не используется (проверка по mtime/size), словарь читается из JSON
+            logger.error(f"[_recompile] Error compiling {path}: {e}")
+
+    def _discard_pending_writes(self, file_path: str):
+        """Отменяет незаписанные правки удаленного файла, чтобы запись не создала его заново."""
+        path = os.path.abspath(file_path)
+        self._dirty_paths.discard(path)
+        self._latest_words.pop(path, None)
+        for waiter in self._write_waiters.pop(path, []):
+            if not waiter.done():
+                waiter.set_result(False)
+
+    async def flush_pending_writes(self):
+        """Дожидается записи всех отложенных правок словарей (при остановке бота)."""
+        while self._write_tasks:
+            await asyncio.gather(*self._write_tasks.values(), return_exceptions=True)
+
+    async def save_words_to_file_async(self, words: List[Dict[str, str]], file_path: str) -> bool:
+        """Асинхронная версия save_words_to_file: запись в потоке, в очереди с остальными правками файла."""
+        def mutate(word_set: WordSet) -> bool:
+            word_set.replace(words)
+            return True
+
+        return await self._modify_words_file(file_path, mutate)
+
+    async def add_word_to_file_async(self, filename: str, word_pair: Dict[str, str]) -> bool:
+        """Добавляет слово в указанный файл (запись в очереди с остальными правками файла)."""
         file_path = os.path.join(self.data_dir, "words", filename)
-        words = self.load_words_from_file(file_path)
-        words.append(word_pair)
-        return self.save_words_to_file(words, file_path)
-    
-    def delete_word_from_file(self, filename: str, en_word: str) -> bool:
-        """Удаляет слово из указанного файла."""
+
+        def mutate(word_set: WordSet) -> bool:
+            word_set.add(word_pair)
+            return True
+
+        return await self._modify_words_file(file_path, mutate)
+
+    async def delete_word_from_file_async(self, filename: str, en_word: str) -> bool:
+        """Удаляет слово из указанного файла. Возвращает False, если слова в файле нет."""
         file_path = os.path.join(self.data_dir, "words", filename)
-        words = self.load_words_from_file(file_path)
-        initial_len = len(words)
-        words = [word for word in words if word['en'].lower() != en_word.lower()]
-        if len(words) < initial_len:
-            return self.save_words_to_file(words, file_path)
-        return False
+        return await self._modify_words_file(file_path, lambda word_set: word_set.remove(en_word) > 0)
     
     def _generate_dynamic_filename_suffix(self) -> str:
         """Генерирует динамическую часть имени файла (случайные буквы + дата)."""
@@ -219,7 +667,7 @@ class WordManager:
         base_filename = f"{prefix}{suffix_id}"
         return base_filename
 
-    def create_new_file(self, user_id: int, user_display_name: str, words: List[Dict[str, str]] = None) -> Optional[str]:
+    async def create_new_file(self, user_id: int, user_display_name: str, words: List[Dict[str, str]] = None) -> Optional[str]:
         """Создает новый файл со словами с динамическим именем, устанавливает его как текущий для пользователя и возвращает полное имя файла."""
         base_filename = self.get_user_custom_filename(user_id, user_display_name)
         dynamic_suffix = self._generate_dynamic_filename_suffix()
@@ -238,16 +686,15 @@ class WordManager:
             return None  # Файл уже существует
 
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(words or [], f, ensure_ascii=False)
+            _write_json_atomic(file_path, words or [])
             logger.info(f"[create_new_file] Successfully created new file: {final_filename}")
-            self.set_user_current_file(user_id, final_filename, user_display_name) # Устанавливаем новый файл как текущий
+            await self.set_user_current_file(user_id, final_filename, user_display_name) # Устанавливаем новый файл как текущий
             return final_filename
         except Exception as e:
             logger.error(f"[create_new_file] Error creating file {final_filename}: {e}")
             return None
 
-    def delete_file(self, filename: str) -> bool:
+    async def delete_file(self, filename: str) -> bool:
         """Удаляет файл со словами."""
         if not filename.endswith('.json'):
             filename += '.json'
@@ -258,11 +705,15 @@ class WordManager:
         
         try:
             os.remove(file_path)
-            # Удаляем файл из user_current_files, если он был выбран
-            users_to_reset = [user_id for user_id, user_data in self.user_current_files.items() if user_data['filename'] == filename]
-            for user_id in users_to_reset:
-                del self.user_current_files[user_id]
-            self._save_config() # Сохраняем изменения в конфиг
+            self.word_set_cache.invalidate(file_path)
+            self.file_catalog.pop(filename, None)
+            self._compiled.pop(os.path.abspath(file_path), None)
+            if os.path.exists(self._compiled_path(file_path)):
+                os.remove(self._compiled_path(file_path))
+            self._discard_pending_writes(file_path)
+            # Сбрасываем файл у пользователей, которые его выбрали (они вернутся к словарю по умолчанию)
+            for user_id in await database.reset_user_word_sets_for_file(filename):
+                self.user_current_files.pop(user_id, None)
             return True
         except Exception as e:
             print(f"Ошибка удаления файла {file_path}: {e}")
@@ -274,45 +725,78 @@ class WordManager:
             filename += '.json'
         
         file_path = os.path.join(self.data_dir, "words", filename)
-        if not os.path.exists(file_path):
+        try:
+            key = WordSetCache._file_key(file_path)
+        except FileNotFoundError:
+            self.file_catalog.pop(filename, None)
             return None
-        
+
+        row = self.file_catalog.get(filename)
+        if row is not None and row['key'] == key:
+            return {'filename': filename, 'word_count': row['word_count'], 'file_size': row['file_size']}
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                words = json.load(f)
-            
-            file_size = os.path.getsize(file_path)
+            word_set = self.word_set_cache.get_word_set(file_path)
+            self.update_catalog(filename, key, len(word_set))
             return {
                 'filename': filename,
-                'word_count': len(words),
-                'file_size': file_size,
+                'word_count': len(word_set),
+                'file_size': key[1],
                 # 'is_current': filename == self.current_file # Удалено, т.к. теперь для каждого пользователя свой файл
             }
         except Exception as e:
             logger.error(f"[get_file_info] Error getting file info for {file_path}: {e}")
             return None
 
-    def remove_duplicates_from_file(self, filename: str) -> int:
+    def update_catalog(self, filename: str, key: tuple[int, int, int], word_count: int):
+        self.file_catalog[filename] = {'key': key, 'word_count': word_count, 'file_size': key[1]}
+
+    def refresh_file(self, filename: str, key: tuple[int, int, int], word_set: WordSet):
+        """Обновляет кэш и каталог словарем из файла, измененного на диске (см. utils/word_set_watcher.py)."""
+        file_path = os.path.abspath(os.path.join(self.data_dir, "words", filename))
+        # Пока есть незаписанные правки, в кэше лежит их версия - ее не подменяем
+        if file_path not in self._latest_words:
+            self.word_set_cache.store(file_path, key, word_set)
+        self.update_catalog(filename, key, len(word_set))
+
+    def forget_file(self, filename: str):
+        """Убирает из кэшей файл, удаленный с диска не через delete_file."""
+        file_path = os.path.abspath(os.path.join(self.data_dir, "words", filename))
+        self.word_set_cache.invalidate(file_path)
+        self.file_catalog.pop(filename, None)
+        self._compiled.pop(file_path, None)
+        if os.path.exists(self._compiled_path(file_path)):
+            os.remove(self._compiled_path(file_path))
+
+    async def add_words_to_file_async(self, filename: str, word_pairs: List[Dict[str, str]]) -> Optional[int]:
+        """Добавляет пары, английского слова которых еще нет в словаре, одной записью файла.
+        Возвращает количество добавленных или None, если записать файл не удалось."""
+        file_path = os.path.join(self.data_dir, "words", filename)
+        added = 0
+
+        def mutate(word_set: WordSet) -> bool:
+            nonlocal added
+            for word_pair in word_pairs:
+                if word_pair['en'] not in word_set:
+                    word_set.add(word_pair)
+                    added += 1
+            return added > 0
+
+        if not await self._modify_words_file(file_path, mutate) and added:
+            return None
+        return added
+
+    async def remove_duplicates_from_file_async(self, filename: str) -> int:
         """Удаляет дубликаты слов из указанного файла, основываясь на английском слове.
         Возвращает количество удаленных дубликатов."""
         file_path = os.path.join(self.data_dir, "words", filename)
-        words = self.load_words_from_file(file_path)
-
-        seen_en_words = set()
-        unique_words = []
         duplicates_count = 0
 
-        for word_pair in words:
-            en_word_lower = word_pair['en'].lower()
-            if en_word_lower not in seen_en_words:
-                unique_words.append(word_pair)
-                seen_en_words.add(en_word_lower)
-            else:
-                duplicates_count += 1
-        
-        if duplicates_count > 0:
-            self.save_words_to_file(unique_words, file_path)
-        
+        def mutate(word_set: WordSet) -> bool:
+            nonlocal duplicates_count
+            duplicates_count = word_set.remove_duplicates()
+            return duplicates_count > 0
+
+        await self._modify_words_file(file_path, mutate)
         return duplicates_count
 
 # Глобальный экземпляр менеджера слов
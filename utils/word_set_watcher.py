@@ -0,0 +1,129 @@
+"""Слежение за файлами словарей в data/words.
+
+Администраторы правят data/words/*.json и напрямую на диске, и через /add, /del, /deduplicate_words.
+WordSetWatcher раз в WORD_SET_WATCH_INTERVAL_SECONDS читает метаданные каталога (os.scandir, без
+чтения самих файлов) и сравнивает их с прошлым снимком. Для добавленных, измененных и удаленных
+файлов обновляется только то, что относится к этим файлам: кэш разобранных словарей, каталог
+/files, компилированная версия (.wset), версия в реестре для игр и тестов и индекс трудных вариантов.
+
+inotify не используется: в зависимостях бота нет библиотеки для него, а опрос метаданных
+нескольких десятков файлов стоит доли миллисекунды.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from .compiled_word_set import open_if_fresh
+from .utils import drop_confuser_index, refresh_confuser_index
+from .word_manager import WordManager, WordSetCache, word_manager
+
+logger = logging.getLogger(__name__)
+
+
+class WordSetWatcher:
+    def __init__(self, manager: WordManager):
+        self.manager = manager
+        self.words_dir = os.path.join(manager.data_dir, "words")
+        self._known: Optional[Dict[str, tuple[int, int, int]]] = None
+        self.stats = {
+            "scans": 0, "scan_ms_total": 0.0,
+            "added": 0, "changed": 0, "deleted": 0, "errors": 0,
+            "reloads": 0, "reload_ms_total": 0.0, "last_reload_ms": None, "max_reload_ms": 0.0,
+            # Задержка обнаружения: от изменения файла (mtime) до окончания обновления кэшей
+            "last_lag_ms": None, "max_lag_ms": 0.0,
+        }
+
+    def _scan(self) -> Dict[str, tuple[int, int, int]]:
+        snapshot = {}
+        with os.scandir(self.words_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json') and entry.is_file():
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return snapshot
+
+    async def poll(self) -> Dict[str, list]:
+        """Один проход: находит изменения с прошлого вызова и обновляет кэши. Возвращает имена по видам изменений."""
+        started = time.perf_counter()
+        snapshot = self._scan()
+        self.stats["scans"] += 1
+        self.stats["scan_ms_total"] += (time.perf_counter() - started) * 1000
+        changes = {"added": [], "changed": [], "deleted": []}
+        if self._known is None:
+            # Первый проход только запоминает состояние: кэши и так проверяют файлы при чтении
+            self._known = snapshot
+            return changes
+
+        for filename, key in snapshot.items():
+            old_key = self._known.get(filename)
+            if old_key is None:
+                changes["added"].append(filename)
+            elif old_key != key:
+                changes["changed"].append(filename)
+        changes["deleted"] = [filename for filename in self._known if filename not in snapshot]
+
+        for filename in changes["added"] + changes["changed"]:
+            if not await self._reload(filename, snapshot[filename]):
+                # Попробуем еще раз на следующем проходе (например, файл дописывается не атомарно)
+                if filename in self._known:
+                    snapshot[filename] = self._known[filename]
+                else:
+                    del snapshot[filename]
+        for filename in changes["deleted"]:
+            self._forget(filename)
+        for kind, filenames in changes.items():
+            self.stats[kind] += len(filenames)
+        self._known = snapshot
+        return changes
+
+    async def _reload(self, filename: str, key: tuple[int, int, int]) -> bool:
+        started = time.perf_counter()
+        file_path = os.path.abspath(os.path.join(self.words_dir, filename))
+        try:
+            # Свои записи WordManager уже положил в кэш - повторно файл не разбираем
+            if self.manager.word_set_cache.cached_key(file_path) != key:
+                key, word_set = await asyncio.to_thread(WordSetCache.read_file, file_path)
+                self.manager.refresh_file(filename, key, word_set)
+            else:
+                self.manager.update_catalog(filename, key, len(self.manager.word_set_cache.get_word_set(file_path)))
+
+            compiled_path = self.manager._compiled_path(file_path)
+            if os.path.exists(compiled_path) and open_if_fresh(file_path, compiled_path) is None:
+                await self.manager._recompile(file_path)
+
+            # Новая версия для игр и тестов нужна, только если словарь уже используется
+            registry = self.manager.word_set_registry
+            if registry.is_tracked(filename):
+                _, words = registry.current(filename)
+                refresh_confuser_index(filename, words)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"[word_set_watcher] Error reloading {filename}: {e}")
+            return False
+
+        reload_ms = (time.perf_counter() - started) * 1000
+        lag_ms = max(time.time_ns() - key[0], 0) / 1e6
+        self.stats["reloads"] += 1
+        self.stats["reload_ms_total"] += reload_ms
+        self.stats["last_reload_ms"] = reload_ms
+        self.stats["max_reload_ms"] = max(self.stats["max_reload_ms"], reload_ms)
+        self.stats["last_lag_ms"] = lag_ms
+        self.stats["max_lag_ms"] = max(self.stats["max_lag_ms"], lag_ms)
+        logger.info(f"[word_set_watcher] Reloaded {filename} in {reload_ms:.1f} ms (lag {lag_ms:.0f} ms)")
+        return True
+
+    def _forget(self, filename: str):
+        # Версии в реестре не трогаем: начатые игры и тесты доиграют на своей версии
+        try:
+            self.manager.forget_file(filename)
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"[word_set_watcher] Error forgetting {filename}: {e}")
+        drop_confuser_index(filename)
+        logger.info(f"[word_set_watcher] {filename} was deleted")
+
+
+word_set_watcher = WordSetWatcher(word_manager)